@@ -0,0 +1,287 @@
+"""Per-stage benchmark for the DataModel transfer stages
+
+Creates a synthetic environment (see synthetic_data.py) and times each stage separately:
+  load_deid_log                          parse the DeID log workbook (local mirror removed first)
+  load_deid_log_mirror                   load the DeID log from the up-to-date local mirror
+  check_if_session_info_already_exists   one duplicate check (averaged over --checks calls)
+  save_session_to_deid_log               reserve a deid and publish the workbook (and its backup)
+  copy_and_rename_files                  copy the .mff files to the backup and deid folders
+  save_deid_files                        copy the notes file to the deid folder
+  save_net_placement_photos              zip the net placement photos
+Each stage runs --repeats times, outputs of the previous run are removed before each run (not timed).
+Copy stages also report bytes and MB/s. Transfer settings come from transfer_config.json, use --set to change them.
+
+Source files are freshly written, so they are usually read from the OS cache. Put --workdir on the drives
+you want to measure (e.g. the backup drive) to include their write speed. Example:
+    python benchmarks/stage_benchmark.py --rows 5000 --signal-mb 500 --set copy_workers=8 --json stages.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from synthetic_data import MB, REPO_DIR, make_environment
+
+from eeg_backup import DataModel
+
+STAGES = [
+    "load_deid_log",
+    "load_deid_log_mirror",
+    "check_if_session_info_already_exists",
+    "save_session_to_deid_log",
+    "copy_and_rename_files",
+    "save_deid_files",
+    "save_net_placement_photos",
+]
+
+
+class BenchmarkDataModel(DataModel):
+    """DataModel that uses the synthetic environment and its own state folder instead of the lab configuration"""
+
+    def __init__(self, filepath_dict, state_dir, transfer_overrides):
+        self.benchmark_filepath_dict = filepath_dict
+        self.benchmark_state_dir = state_dir
+        self.benchmark_transfer_overrides = transfer_overrides
+        super().__init__(load_deid_log=False)
+
+    def load_file_paths(self):
+        return dict(self.benchmark_filepath_dict)
+
+    def load_transfer_config(self):
+        transfer_config = super().load_transfer_config()
+        transfer_config.update(self.benchmark_transfer_overrides)
+        transfer_config["state_dir"] = self.benchmark_state_dir
+        return transfer_config
+
+
+def parse_setting(setting):
+    """Parse KEY=VALUE of --set, VALUE is json (plain strings are allowed too)"""
+    key, _, value = setting.partition("=")
+    if key not in DataModel.TRANSFER_CONFIG_DEFAULTS:
+        raise argparse.ArgumentTypeError(f"unknown transfer setting {key!r}")
+    try:
+        return key, json.loads(value)
+    except json.JSONDecodeError:
+        return key, value
+
+
+def get_commit():
+    """Commit of the benchmarked code (with -dirty for uncommitted changes), None outside a git checkout"""
+    try:
+        result = subprocess.run(
+            ["git", "describe", "--always", "--dirty"], cwd=REPO_DIR, capture_output=True, text=True, timeout=10
+        )
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+
+def clear_folder(folder):
+    """Remove everything inside folder"""
+    for name in os.listdir(folder):
+        path = os.path.join(folder, name)
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+
+
+def time_stage(repeats, function, setup=None):
+    """Run function repeats times, returns the duration of each run and the bytes it reported per run"""
+    durations = []
+    reported_bytes = []
+    for _ in range(repeats):
+        if setup:
+            setup()
+        copied = []
+        start = time.perf_counter()
+        function(copied.append)
+        durations.append(time.perf_counter() - start)
+        reported_bytes.append(sum(copied))
+    return durations, reported_bytes
+
+
+def summarize(durations, reported_bytes=None, calls=1):
+    """Seconds per run (or per call) and throughput of a stage"""
+    per_call = [duration / calls for duration in durations]
+    summary = {
+        "runs": per_call,
+        "median_s": statistics.median(per_call),
+        "min_s": min(per_call),
+        "max_s": max(per_call),
+    }
+    if reported_bytes and reported_bytes[0]:
+        summary["bytes"] = reported_bytes[0]
+        summary["mb_per_s"] = reported_bytes[0] / MB / summary["median_s"]
+    if calls > 1:
+        summary["calls_per_run"] = calls
+    return summary
+
+
+def run_benchmark(args, root):
+    """Create the environment under root and time every stage, returns {stage: summary} and the transfer settings used"""
+    filepath_dict, session_files = make_environment(
+        root,
+        rows=args.rows,
+        used_rows=args.used_rows,
+        mff_files=args.mff_files,
+        signal_bytes=int(args.signal_mb * MB),
+        mov_bytes=int(args.mov_mb * MB),
+        photos=args.photos,
+        photo_bytes=int(args.photo_mb * MB),
+    )
+    data_model = BenchmarkDataModel(filepath_dict, os.path.join(root, "state"), dict(args.set))
+    deid_log_filepath = filepath_dict["deid_log_filepath"]
+    results = {}
+
+    def remove_mirror():
+        if os.path.exists(data_model.deid_log_mirror.mirror_path):
+            os.remove(data_model.deid_log_mirror.mirror_path)
+
+    results["load_deid_log"] = summarize(
+        *time_stage(args.repeats, lambda _: data_model.load_deid_log(deid_log_filepath), remove_mirror)
+    )
+    results["load_deid_log_mirror"] = summarize(
+        *time_stage(args.repeats, lambda _: data_model.load_deid_log(deid_log_filepath))
+    )
+
+    # half of the checks find an existing session, the others a new one
+    session_info = {
+        "study": "BIO",
+        "visit_number": "v1",
+        "subject_initials": "AB",
+        "date": "01-02-2026",
+        "location": "T19",
+        "net_serial_number": "4001",
+    }
+    data_model.load_session({"session_info": session_info, "eeg_file_info": []})
+    subject_ids = [str(1 + i % max(1, 2 * args.used_rows)) for i in range(args.checks)]
+
+    def check_sessions(_):
+        for subject_id in subject_ids:
+            data_model.session_info["subject_id"] = subject_id
+            data_model.check_if_session_info_already_exists()
+
+    durations, _ = time_stage(args.repeats, check_sessions)
+    results["check_if_session_info_already_exists"] = summarize(durations, calls=args.checks)
+
+    # every run saves a new session
+    new_subject_ids = iter(range(90000, 100000))
+
+    def load_new_session():
+        data_model.clear_session_data()
+        data_model.load_session(
+            {
+                "session_info": dict(session_info, subject_id=str(next(new_subject_ids))),
+                "eeg_file_info": [
+                    {"paradigm": os.path.basename(mff_file).split("_")[2], "audio_source": "none", "mff_file": mff_file}
+                    for mff_file in session_files["mff_files"]
+                ],
+                "notes_file": session_files["notes_file"],
+                "net_placement_photos": session_files["net_placement_photos"],
+            }
+        )
+
+    results["save_session_to_deid_log"] = summarize(
+        *time_stage(args.repeats, lambda _: data_model.save_session_to_deid_log(), load_new_session)
+    )
+
+    def clear_mff_outputs():
+        clear_folder(filepath_dict["mff_backup_dir"])
+        clear_folder(filepath_dict["mff_deid_dir"])
+        data_model.completed_copies = []
+
+    results["copy_and_rename_files"] = summarize(
+        *time_stage(args.repeats, data_model.copy_and_rename_files, clear_mff_outputs)
+    )
+
+    def clear_deid_notes():
+        for name in os.listdir(filepath_dict["mff_deid_dir"]):
+            if name.endswith("_notes.txt"):
+                os.remove(os.path.join(filepath_dict["mff_deid_dir"], name))
+
+    results["save_deid_files"] = summarize(
+        *time_stage(args.repeats, data_model.save_deid_files, clear_deid_notes)
+    )
+    results["save_net_placement_photos"] = summarize(
+        *time_stage(
+            args.repeats,
+            data_model.save_net_placement_photos,
+            lambda: clear_folder(filepath_dict["net_placement_photo_dir"]),
+        )
+    )
+    return results, data_model.transfer_config
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=3, help="runs of each stage")
+    parser.add_argument("--rows", type=int, default=2000, help="deids in the DeID log")
+    parser.add_argument("--used-rows", type=int, help="deids already in use (default half)")
+    parser.add_argument("--checks", type=int, default=10000, help="duplicate checks per run")
+    parser.add_argument("--mff-files", type=int, default=2, help=".mff bundles in the session")
+    parser.add_argument("--signal-mb", type=float, default=64, help="size of each signal1.bin")
+    parser.add_argument("--mov-mb", type=float, default=16, help="size of each video1.mov (0 for none)")
+    parser.add_argument("--photos", type=int, default=12, help="net placement photos in the session")
+    parser.add_argument("--photo-mb", type=float, default=4, help="size of each photo")
+    parser.add_argument(
+        "--set", type=parse_setting, action="append", default=[], metavar="KEY=VALUE",
+        help="override a transfer_config.json setting, e.g. copy_workers=8 (repeatable)",
+    )
+    parser.add_argument("--workdir", help="folder for the synthetic environment (default system temp folder)")
+    parser.add_argument("--keep", action="store_true", help="keep the synthetic environment")
+    parser.add_argument("--json", help="also save results to this json file")
+    args = parser.parse_args()
+    if args.used_rows is None:
+        args.used_rows = args.rows // 2
+    if args.used_rows + args.repeats > args.rows:
+        parser.error("the DeID log needs a free row for every save_session_to_deid_log run")
+
+    root = tempfile.mkdtemp(prefix="eeg_backup_bench_", dir=args.workdir)
+    try:
+        results, transfer_config = run_benchmark(args, root)
+    finally:
+        if args.keep:
+            print(f"Synthetic environment kept in {root}")
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+
+    for stage in STAGES:
+        summary = results[stage]
+        line = (
+            f"{stage:<38} median {summary['median_s']:.4g} s  "
+            f"min {summary['min_s']:.4g}  max {summary['max_s']:.4g}"
+        )
+        if "mb_per_s" in summary:
+            line += f"  {summary['bytes'] / MB:,.1f} MB at {summary['mb_per_s']:,.1f} MB/s"
+        if "calls_per_run" in summary:
+            line += "  (per call)"
+        print(line)
+
+    if args.json:
+        parameters = {key: value for key, value in vars(args).items() if key not in ("json", "keep", "workdir")}
+        parameters["set"] = dict(args.set)
+        with open(args.json, "w") as outfile:
+            json.dump(
+                {
+                    "commit": get_commit(),
+                    "python": sys.version,
+                    "platform": platform.platform(),
+                    "parameters": parameters,
+                    "transfer_config": transfer_config,
+                    "stages": results,
+                },
+                outfile,
+                indent=4,
+            )
+
+
+if __name__ == "__main__":
+    main()
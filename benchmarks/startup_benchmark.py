@@ -0,0 +1,105 @@
+"""Startup benchmark for eeg_backup.py
+
+Starts the app in fresh python processes (Qt offscreen, nothing is shown) and measures
+  import_s        time to import eeg_backup
+  first_window_s  time until the main window is shown and painted
+  log_ready_s     time until the deid log is loaded and sessions can be confirmed
+All times are seconds since the child process started running python code.
+
+Uses the paths in filepath_config.json and the local deid log mirror, like the app does,
+so run it on a lab PC with the drives connected. Example:
+    python benchmarks/startup_benchmark.py --runs 5 --json startup.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+START = time.perf_counter()
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+METRICS = ["import_s", "first_window_s", "log_ready_s"]
+
+
+def run_child(timeout):
+    """Start app, wait until the deid log is ready and print the timings as json"""
+    os.environ["QT_QPA_PLATFORM"] = "offscreen"
+    sys.path.insert(0, REPO_DIR)
+
+    import eeg_backup
+
+    timings = {"import_s": time.perf_counter() - START}
+
+    from PyQt5.QtWidgets import QApplication
+
+    app = QApplication(sys.argv)
+    main_window = eeg_backup.MainWindow()
+
+    # pandas, openpyxl and ulid should not be needed to build the window (the deid log loader imports them)
+    timings["imported_before_window"] = sorted(
+        name for name in ("pandas", "openpyxl", "ulid") if name in sys.modules
+    )
+
+    main_window.show()
+    app.processEvents()
+    timings["first_window_s"] = time.perf_counter() - START
+
+    end = time.perf_counter() + timeout
+    while not main_window.deid_log_ready and time.perf_counter() < end:
+        app.processEvents()
+        time.sleep(0.001)
+    if not main_window.deid_log_ready:
+        raise TimeoutError(f"DeID log not loaded after {timeout} s")
+    timings["log_ready_s"] = time.perf_counter() - START
+    print(json.dumps(timings))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="number of app starts")
+    parser.add_argument("--timeout", type=float, default=300, help="seconds to wait for one start")
+    parser.add_argument("--json", help="also save results to this json file")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.timeout)
+        return
+
+    runs = []
+    for _ in range(args.runs):
+        result = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", "--timeout", str(args.timeout)],
+            capture_output=True,
+            text=True,
+            timeout=args.timeout + 30,
+        )
+        if result.returncode != 0:
+            sys.exit(f"App start failed:\n{result.stderr}")
+        runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+    summary = {
+        metric: {
+            "median": statistics.median(run[metric] for run in runs),
+            "min": min(run[metric] for run in runs),
+            "max": max(run[metric] for run in runs),
+        }
+        for metric in METRICS
+    }
+    for metric in METRICS:
+        print(
+            f"{metric:<16} median {summary[metric]['median']:.3f}  "
+            f"min {summary[metric]['min']:.3f}  max {summary[metric]['max']:.3f}"
+        )
+
+    if args.json:
+        with open(args.json, "w") as outfile:
+            json.dump({"python": sys.version, "runs": runs, "summary": summary}, outfile, indent=4)
+
+
+if __name__ == "__main__":
+    main()
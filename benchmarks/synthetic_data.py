@@ -0,0 +1,204 @@
+"""Synthetic inputs for eeg_backup.py benchmarks and manual testing
+
+Generates realistic stand-ins for what a recording session produces:
+  make_mff        .mff bundle with signal1.bin of a given size, the XML sidecars, a log file and a .mov video
+  make_deid_log   DeID log workbook with N rows in the column layout the app reads and writes
+  make_photos     net placement photos (JPEG and PNG)
+  make_environment  all of the above plus the folders of filepath_config.json
+Contents are random bytes from a seeded generator, so the same arguments give the same files.
+
+Can also be run to create an environment for trying the app by hand. Example:
+    python benchmarks/synthetic_data.py /tmp/eeg_env --rows 2000 --signal-mb 200
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from eeg_backup import DataModel  # noqa: E402
+
+CHUNK_SIZE = 4 * 1024 * 1024
+MB = 1024 * 1024
+
+# identifying .mff files plus the ones every recording has
+MFF_XML_FILES = DataModel.FILES_TO_DEIDENTIFY + ["info.xml", "info1.xml", "sensorLayout.xml", "coordinates.xml"]
+
+
+def write_random_file(path, size, rng, header=b""):
+    """Write size bytes (header followed by random bytes) in chunks, so large files need little memory"""
+    with open(path, "wb") as file:
+        file.write(header[:size])
+        remaining = size - len(header[:size])
+        while remaining > 0:
+            chunk_size = min(CHUNK_SIZE, remaining)
+            file.write(rng.randbytes(chunk_size))
+            remaining -= chunk_size
+
+
+def make_mff(directory, file_name, signal_bytes, mov_bytes=0, seed=0):
+    """Create an .mff bundle named file_name (without .mff), returns its path.
+    The XML sidecars, techNote.rtf and the log file contain the file name and participant id like real recordings."""
+    rng = random.Random(seed)
+    mff_path = os.path.join(directory, file_name + ".mff")
+    os.makedirs(mff_path)
+    participant_id = file_name.rsplit("_", 2)[0]
+
+    write_random_file(os.path.join(mff_path, "signal1.bin"), signal_bytes, rng)
+    for xml_file in MFF_XML_FILES:
+        if not xml_file.endswith(".xml"):
+            continue
+        with open(os.path.join(mff_path, xml_file), "w", encoding="utf-8") as file:
+            file.write('<?xml version="1.0" encoding="UTF-8"?>\n<root>\n')
+            for i in range(200):
+                file.write(f"  <entry n=\"{i}\"><name>{file_name}</name><id>{participant_id}</id></entry>\n")
+            file.write("</root>\n")
+    with open(os.path.join(mff_path, "techNote.rtf"), "w", encoding="utf-8") as file:
+        file.write(f"{{\\rtf1 {file_name} recorded for {participant_id}}}")
+    with open(os.path.join(mff_path, f"{file_name}_log.txt"), "w", encoding="utf-8") as file:
+        file.write(f"Recording {file_name}\n" * 100)
+    if mov_bytes:
+        write_random_file(os.path.join(mff_path, "video1.mov"), mov_bytes, rng, header=b"\x00\x00\x00\x14ftypqt  ")
+    return mff_path
+
+
+def get_deid_log_columns():
+    """Column names of the DeID log sheet: deid, session columns, one column per paradigm group, original file names"""
+    paradigm_columns = list(dict.fromkeys(DataModel.PARADIGM_TO_DEID_COLUMN_NAME.values()))
+    return (
+        ["DeID", "Study", "Subject ID", "Visit Num", "Visit Date", "Initials", "Location", "Net Serial Number", "Notes"]
+        + paradigm_columns
+        + ["original_file_names"]
+    )
+
+
+def make_deid_log(path, rows, used_rows, seed=0):
+    """Create a protected DeID log workbook with rows deids, the first used_rows of them already in use.
+    Unused rows are unlocked like in the real log, so only they can be edited in Excel."""
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Protection
+
+    rng = random.Random(seed)
+    columns = get_deid_log_columns()
+    paradigms = list(DataModel.PARADIGM_TO_DEID_COLUMN_NAME)
+
+    wb = Workbook(write_only=True)
+    sheet = wb.create_sheet("DeID Log")
+    sheet.protection.sheet = True
+    sheet.append(columns)
+    for deid in range(1, rows + 1):
+        row = [deid] + [None] * (len(columns) - 1)
+        if deid <= used_rows:
+            paradigm = rng.choice(paradigms)
+            file_name = f"BIO_v1_{paradigm}_{deid:05}_AB_20240101_120000.mff"
+            row[1:9] = ["BIO", deid, "v1", "01-01-2024", "AB", "T19", 4000 + deid % 50, ""]
+            row[columns.index(DataModel.PARADIGM_TO_DEID_COLUMN_NAME[paradigm])] = 1
+            row[-1] = file_name
+        else:
+            # in write-only mode only WriteOnlyCell objects can carry a style
+            row = [WriteOnlyCell(sheet, value=value) for value in row]
+            for cell in row[1:]:
+                cell.protection = Protection(locked=False)
+        sheet.append(row)
+    wb.save(path)
+    return path
+
+
+def make_photos(directory, count, photo_bytes, png_every=4, seed=0):
+    """Create count photos of about photo_bytes each, every png_every-th one a PNG and the others JPEGs.
+    Returns their paths. Both formats are already compressed, so the contents are random bytes."""
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    photos = []
+    for i in range(count):
+        if png_every and i % png_every == png_every - 1:
+            path = os.path.join(directory, f"net_{i:02}.png")
+            header = b"\x89PNG\r\n\x1a\n"
+        else:
+            path = os.path.join(directory, f"IMG_{1000 + i}.jpg")
+            header = b"\xff\xd8\xff\xe0\x00\x10JFIF\x00"
+        write_random_file(path, photo_bytes, rng, header=header)
+        photos.append(path)
+    return photos
+
+
+def make_environment(root, rows=2000, used_rows=None, mff_files=2, signal_bytes=64 * MB, mov_bytes=16 * MB,
+                     photos=12, photo_bytes=4 * MB):
+    """Create input files and output folders under root.
+    Returns the file paths (same keys as filepath_config.json) and the session inputs
+    ({"mff_files", "notes_file", "net_placement_photos"})."""
+    used_rows = rows // 2 if used_rows is None else used_rows
+    filepath_dict = {
+        "usb_input_dir": os.path.join(root, "usb"),
+        "mff_backup_dir": os.path.join(root, "backup"),
+        "mff_deid_dir": os.path.join(root, "deid"),
+        "net_placement_photo_dir": os.path.join(root, "photos"),
+        "deid_log_filepath": os.path.join(root, "onedrive", "deid_log.xlsx"),
+        "deid_log_local_backup_filepath": os.path.join(root, "local", "deid_log_backup.xlsx"),
+    }
+    for folder in ("usb_input_dir", "mff_backup_dir", "mff_deid_dir", "net_placement_photo_dir"):
+        os.makedirs(filepath_dict[folder], exist_ok=True)
+    for log_file in ("deid_log_filepath", "deid_log_local_backup_filepath"):
+        os.makedirs(os.path.dirname(filepath_dict[log_file]), exist_ok=True)
+
+    make_deid_log(filepath_dict["deid_log_filepath"], rows, used_rows)
+    shutil.copyfile(filepath_dict["deid_log_filepath"], filepath_dict["deid_log_local_backup_filepath"])
+
+    usb_dir = filepath_dict["usb_input_dir"]
+    paradigms = ["rest", "chirp", "ssct", "vdaudio"]
+    mff_paths = [
+        make_mff(
+            usb_dir,
+            f"BIO_v1_{paradigms[i % len(paradigms)]}_99999_AB_20240101_12{i:02}00",
+            signal_bytes,
+            mov_bytes,
+            seed=i,
+        )
+        for i in range(mff_files)
+    ]
+    notes_file = os.path.join(usb_dir, "notes.txt")
+    with open(notes_file, "w", encoding="utf-8") as file:
+        file.write("Impedances checked, participant calm.\n" * 20)
+    photo_paths = make_photos(os.path.join(usb_dir, "photos"), photos, photo_bytes)
+
+    return filepath_dict, {"mff_files": mff_paths, "notes_file": notes_file, "net_placement_photos": photo_paths}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("root", help="folder to create (must not exist)")
+    parser.add_argument("--rows", type=int, default=2000, help="deids in the DeID log")
+    parser.add_argument("--used-rows", type=int, help="deids already in use (default half)")
+    parser.add_argument("--mff-files", type=int, default=2, help=".mff bundles to create")
+    parser.add_argument("--signal-mb", type=float, default=64, help="size of each signal1.bin")
+    parser.add_argument("--mov-mb", type=float, default=16, help="size of each video1.mov (0 for none)")
+    parser.add_argument("--photos", type=int, default=12, help="net placement photos to create")
+    parser.add_argument("--photo-mb", type=float, default=4, help="size of each photo")
+    args = parser.parse_args()
+
+    if os.path.exists(args.root):
+        sys.exit(f"{args.root} already exists")
+    filepath_dict, session_files = make_environment(
+        os.path.abspath(args.root),
+        rows=args.rows,
+        used_rows=args.used_rows,
+        mff_files=args.mff_files,
+        signal_bytes=int(args.signal_mb * MB),
+        mov_bytes=int(args.mov_mb * MB),
+        photos=args.photos,
+        photo_bytes=int(args.photo_mb * MB),
+    )
+    print("filepath_config.json for this environment:")
+    print(json.dumps(filepath_dict, indent=4))
+    print("session files:")
+    print(json.dumps(session_files, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,33 @@
 import sys
+import argparse
+import copy
+import csv
 import json
 import re
 import os
+import platform
 import shutil
-import pandas as pd
-
-import ulid
-
+import stat
+import hashlib
+import io
+import queue
+import threading
+import time
+import sqlite3
+import tempfile
+
+# pandas, openpyxl and ulid are slow to import, they are imported where used so the window shows first
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import ExitStack, closing, contextmanager
 from datetime import datetime
+from fnmatch import fnmatch
+from functools import partial
+from xml.sax.saxutils import escape as xml_escape, unescape as xml_unescape
 
-from openpyxl import load_workbook
-from zipfile import ZipFile
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile, ZipInfo
 
-from PyQt5.QtCore import pyqtSignal, QDate, Qt
+from PyQt5.QtCore import pyqtSignal, QDate, Qt, QObject, QThread, QTimer
 from PyQt5.QtWidgets import (
     QApplication,
     QMainWindow,
@@ -34,7 +49,11 @@ from PyQt5.QtWidgets import (
     QSizePolicy,
     QAction,
     QProgressBar,
-    QDialog,
+    QStackedWidget,
+    QTableWidget,
+    QTableWidgetItem,
+    QHeaderView,
+    QAbstractItemView,
 )
 
 
@@ -49,10 +68,17 @@ class SessionInfoForm(QWidget):
         # Init data model
         self.data_model = data_model
 
-        # Inputs and indicator labels
+        # Inputs and indicator labels of the current preset
         self.inputs = {}
         self.indicators = {}
 
+        # Last validation result of each validated field, styles are only updated when it changes
+        self.field_valid = {}
+
+        # Forms of presets built so far (page, inputs, indicators, field_valid), see load_preset
+        self.preset_forms = {}
+        self.preset_forms_config = None
+
         # Layout setup
         self.layout = QVBoxLayout(self)
 
@@ -69,8 +95,8 @@ class SessionInfoForm(QWidget):
         self.scroll_area.setWidgetResizable(True)
         self.scroll_area.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
         self.scroll_area.setMinimumHeight(400)
-        self.scroll_content = QWidget()
-        self.scroll_area.setWidget(self.scroll_content)
+        self.preset_stack = QStackedWidget()
+        self.scroll_area.setWidget(self.preset_stack)
         self.layout.addWidget(self.scroll_area)
 
         # Lock filename button
@@ -99,6 +125,13 @@ class SessionInfoForm(QWidget):
 
     def reset_session_form(self):
         """Reset to default form and current study"""
+        # ui_config.json changed since the preset forms were built
+        if self.preset_forms_config is not self.data_model.config_dict:
+            self.clear_preset_forms()
+            self.preset_combo.blockSignals(True)
+            self.preset_combo.clear()
+            self.preset_combo.addItems(self.data_model.config_dict.keys())
+            self.preset_combo.blockSignals(False)
         self.preset_combo.setCurrentIndex(0)
         self.load_preset(self.get_current_study())
         self.update_session_info()  # should be blank
@@ -111,40 +144,49 @@ class SessionInfoForm(QWidget):
             self.data_model.session_info[key] = value
 
     def load_preset(self, preset):
-        """Clear and reset all form elements, clear input and indicators, then load UI elements of preset from configuration dict"""
-
-        # Clear all elements and indicators in form
-        if self.scroll_content.layout() is not None:
-            # Clear the existing layouts
-            for i in reversed(range(self.scroll_content.layout().count())):
-                layout = self.scroll_content.layout().itemAt(i).layout()
-                if layout is not None:
-                    for j in reversed(range(layout.rowCount())):
-                        layout.removeRow(j)
-            # Remove the column layouts
-            while self.scroll_content.layout().count() > 0:
-                item = self.scroll_content.layout().takeAt(0)
-                if item.layout():
-                    item.layout().setParent(None)
-        self.inputs.clear()
-        self.indicators.clear()
+        """Show form of preset (built from the configuration dict the first time) with all inputs reset to their defaults"""
+        if preset not in self.preset_forms:
+            self.preset_forms[preset] = self.build_preset_form(preset)
+            self.preset_forms_config = self.data_model.config_dict
+        preset_form = self.preset_forms[preset]
+        self.inputs = preset_form["inputs"]
+        self.indicators = preset_form["indicators"]
+        self.field_valid = preset_form["field_valid"]
+        self.preset_stack.setCurrentWidget(preset_form["page"])
+
+        # Reset inputs (changed fields revalidate themselves), then validate all fields
+        preset_config = self.data_model.config_dict[preset]
+        for field_name, input_dict in self.inputs.items():
+            self.reset_widget(input_dict["widget"], preset_config[field_name])
+        self.validate_all_fields()
+
+    def clear_preset_forms(self):
+        """Remove all built preset forms"""
+        for preset_form in self.preset_forms.values():
+            self.preset_stack.removeWidget(preset_form["page"])
+            preset_form["page"].deleteLater()
+        self.preset_forms.clear()
+        self.inputs = {}
+        self.indicators = {}
+        self.field_valid = {}
+
+    def build_preset_form(self, preset_name):
+        """Create form page with UI elements of preset from configuration dict and add it to the preset stack"""
+        preset_form = {"inputs": {}, "indicators": {}, "field_valid": {}}
 
         # Load preset from data model
-        preset = self.data_model.config_dict[preset]
+        preset = self.data_model.config_dict[preset_name]
 
-        # Create a new widget for the scroll area content
-        self.scroll_content = QWidget()
+        # Create a new widget for the preset page
+        page = QWidget()
 
         # Create a horizontal layout for two columns
-        columns_layout = QHBoxLayout(self.scroll_content)
+        columns_layout = QHBoxLayout(page)
         left_form = QFormLayout()
         right_form = QFormLayout()
         columns_layout.addLayout(left_form)
         columns_layout.addLayout(right_form)
 
-        # Set the new widget as the scroll area's widget
-        self.scroll_area.setWidget(self.scroll_content)
-
         total_fields = len(preset)
         fields_per_column = (total_fields + 1) // 2  # Round up division
         field_count = 0
@@ -153,7 +195,7 @@ class SessionInfoForm(QWidget):
             if field["type"] == "hidden":
                 continue  # Skip hidden fields
 
-            widget = self.create_widget(field)
+            widget = self.create_widget(field_name, field)
             row_layout = QVBoxLayout()  # Changed to QVBoxLayout
 
             # Add error label
@@ -169,7 +211,7 @@ class SessionInfoForm(QWidget):
             if field.get("editable", True):
                 indicator = QLabel("❌")  # Red X
                 indicator.setStyleSheet("color: red; font-size: 16px;")
-                self.indicators[field_name] = indicator
+                preset_form["indicators"][field_name] = indicator
                 widget_row.addWidget(indicator)
 
             row_layout.addLayout(widget_row)
@@ -179,18 +221,21 @@ class SessionInfoForm(QWidget):
             else:
                 right_form.addRow(field["label"], row_layout)
 
-            self.inputs[field_name] = {"widget": widget, "error_label": error_label}
+            preset_form["inputs"][field_name] = {"widget": widget, "error_label": error_label}
             field_count += 1
 
-        # Adjust the scroll content widget's layout
-        self.scroll_content.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
-        self.scroll_content.setLayout(columns_layout)
+        # Adjust the page's size policy and add it to the stack
+        page.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self.preset_stack.addWidget(page)
+        preset_form["page"] = page
+        return preset_form
 
-        # Validate all fields after loading
-        self.validate_all_fields()
+    def create_widget(self, field_name, field):
+        """Create widget and connect relevant signals to validate_field."""
+
+        def validate(*args):
+            self.validate_field(field_name)
 
-    def create_widget(self, field):
-        """Create widget and connect relevant signals to validate_all_fields."""
         if field["type"] == "text":
             widget = QLineEdit()
             widget.setMinimumHeight(30)
@@ -199,17 +244,13 @@ class SessionInfoForm(QWidget):
             if "editable" in field and not field["editable"]:
                 widget.setReadOnly(True)
             else:
-                widget.textChanged.connect(
-                    self.validate_all_fields
-                )  # Connect to validate_all_fields
+                widget.textChanged.connect(validate)
         elif field["type"] == "combo":
             widget = QComboBox()
             widget.setMinimumHeight(30)
             widget.addItems(field["options"])
             if field.get("editable", True):
-                widget.currentTextChanged.connect(
-                    self.validate_all_fields
-                )  # Connect to validate_all_fields
+                widget.currentTextChanged.connect(validate)
             else:
                 widget.setEnabled(False)
         elif field["type"] == "date":
@@ -218,9 +259,7 @@ class SessionInfoForm(QWidget):
             widget.setCalendarPopup(True)
             widget.setDate(QDate.currentDate())
             if field.get("editable", True):
-                widget.dateChanged.connect(
-                    self.validate_all_fields
-                )  # Connect to validate_all_fields
+                widget.dateChanged.connect(validate)
             else:
                 widget.setReadOnly(True)
         elif field["type"] == "spinbox":
@@ -229,9 +268,7 @@ class SessionInfoForm(QWidget):
             widget.setMinimum(0)
             widget.setMaximum(99999)
             if field.get("editable", True):
-                widget.valueChanged.connect(
-                    self.validate_all_fields
-                )  # Connect to validate_all_fields
+                widget.valueChanged.connect(validate)
             else:
                 widget.setReadOnly(True)
         elif field["type"] == "hidden":
@@ -240,6 +277,17 @@ class SessionInfoForm(QWidget):
 
         return widget
 
+    def reset_widget(self, widget, field):
+        """Set widget back to the value it is created with"""
+        if isinstance(widget, QLineEdit):
+            widget.setText(field.get("default", ""))
+        elif isinstance(widget, QComboBox):
+            widget.setCurrentIndex(0)
+        elif isinstance(widget, QDateEdit):
+            widget.setDate(QDate.currentDate())
+        elif isinstance(widget, QSpinBox):
+            widget.setValue(0)
+
     def update_indicator(self, field_name, is_valid):
         """Update form to reflect indicators"""
         if field_name in self.indicators:
@@ -262,40 +310,39 @@ class SessionInfoForm(QWidget):
         return ""
 
     def validate_all_fields(self):
-        """Validate all fields and update the overall UI state based on validation results."""
-        preset = self.data_model.config_dict[self.get_current_study()]
-        all_valid = True
+        """Validate all fields of the current preset, e.g. after loading it"""
+        for field_name in self.data_model.field_specs[self.get_current_study()]:
+            self.validate_field(field_name)
+        self.update_confirm_button()
+
+    def validate_field(self, field_name):
+        """Validate one field against its precompiled pattern, restyling it only if its valid state changed"""
+        field_spec = self.data_model.field_specs[self.get_current_study()].get(field_name)
+        if field_spec is None or field_name not in self.inputs:
+            return  # field without validation
+
+        is_valid = field_spec["pattern"].match(self.get_input_value(field_name)) is not None
+        if self.field_valid.get(field_name) == is_valid:
+            return
+        self.field_valid[field_name] = is_valid
 
-        # Loop over all fields in the preset
-        for field_name, field in preset.items():
-            if field["type"] == "hidden":
-                continue  # Skip hidden fields
+        widget = self.inputs[field_name]["widget"]
+        error_label = self.inputs[field_name]["error_label"]
+        if is_valid:
+            widget.setStyleSheet("border: 1px solid green;")
+            self.update_indicator(field_name, True)
+            error_label.setVisible(False)
+        else:
+            widget.setStyleSheet("border: 1px solid red;")
+            self.update_indicator(field_name, False)
+            error_label.setText(field_spec["error_message"])
+            error_label.setVisible(True)
 
-            # Get the current value of the field
-            value = self.get_input_value(field_name)
+        self.update_confirm_button()
 
-            # Get info from config dict for validation
-            widget = self.inputs[field_name]["widget"]
-            error_label = self.inputs[field_name]["error_label"]
-
-            # Check if the field's value matches the regex validation
-            if "validation" in field:
-                is_valid = re.match(field["validation"], value) is not None
-                if is_valid:
-                    widget.setStyleSheet("border: 1px solid green;")
-                    self.update_indicator(field_name, True)
-                    error_label.setVisible(False)
-                else:
-                    widget.setStyleSheet("border: 1px solid red;")
-                    self.update_indicator(field_name, False)
-                    error_label.setText(
-                        field.get("error_message", "This field is required")
-                    )
-                    error_label.setVisible(True)
-                    all_valid = False  # Mark form as invalid if any field is invalid
-
-        # Enable or disable the confirm button based on the overall validation result
-        self.confirm_session_button.setEnabled(all_valid)
+    def update_confirm_button(self):
+        """Enable the confirm button only if all validated fields are valid"""
+        self.confirm_session_button.setEnabled(all(self.field_valid.values()))
 
 
 class FileInputForm(QWidget):
@@ -371,7 +418,7 @@ class FileInputForm(QWidget):
         # New combo box row for audio source for each paradigm
         audio_combo = QComboBox()
         audio_combo.wheelEvent = lambda event: None
-        audio_combo.addItems(["none", "headphones", "speakers"])
+        audio_combo.addItems(self.data_model.AUDIO_SOURCES)
         audio_combo.currentIndexChanged.connect(self.check_form_completion)
         form_layout.addRow(
             QLabel("Audio source:"), audio_combo
@@ -457,8 +504,19 @@ class FileInputForm(QWidget):
                 QMessageBox.warning(
                     self, "WARNING", "The selected file is not a valid .mff file!"
                 )
+            self.update_mff_prefetches()
         self.check_form_completion()  # Check validity and update buttons
 
+    def update_mff_prefetches(self):
+        """Start reading newly selected .mff files in the background, stop reading replaced ones"""
+        self.data_model.update_mff_prefetches(
+            [
+                section["mff_label"].text()
+                for section in self.sections
+                if section["mff_label"].text() != "No file selected"
+            ]
+        )
+
     def upload_notes_file(self):
         """Open file dialog for user to select a notes file"""
         options = QFileDialog.Options()
@@ -514,6 +572,7 @@ class FileInputForm(QWidget):
         # Clear and re-init first section
         self.sections = []
         self.add_section()
+        self.update_mff_prefetches()
 
         # Reset buttons
         self.add_button.setEnabled(False)
@@ -543,8 +602,9 @@ class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
 
-        # Initialize data model
-        self.data_model = DataModel()
+        # Initialize data model, deid log is loaded once the window is shown (see start_deid_log_loader)
+        self.data_model = DataModel(load_deid_log=False)
+        self.deid_log_ready = False
 
         # Set stylesheet
         self.setStyleSheet(
@@ -627,6 +687,104 @@ class MainWindow(QMainWindow):
         # Slot for file info confirm signal
         self.file_upload_tab.confirm_file_info_signal.connect(self.process_files)
 
+        # Sessions are transferred in the background, shown in the transfers tab
+        self.transfer_queue = TransferQueue(
+            self.data_model.transfer_config["max_concurrent_transfers"], self
+        )
+        self.transfer_queue.job_finished.connect(self.on_transfer_finished)
+        self.transfer_queue.job_failed.connect(self.on_transfer_failed)
+        self.transfer_queue_tab = TransferQueueView(self.transfer_queue)
+        self.tab_widget.addTab(self.transfer_queue_tab, "Transfers")
+
+        # Load deid log in the background once the window is shown
+        QTimer.singleShot(0, self.start_deid_log_loader)
+
+    def start_deid_log_loader(self, reload=False):
+        """Load deid log (and pandas/openpyxl) on a worker thread so the window is usable while it loads.
+        With reload, only the deid log is reloaded if its workbook changed (see reset_app)."""
+        self.deid_log_ready = False
+        if not reload:
+            self.statusBar().showMessage("Checking drives and loading DeID log...")
+        self.deid_log_thread = QThread(self)
+        self.deid_log_loader = DeidLogLoader(self.data_model, reload)
+        self.deid_log_loader.moveToThread(self.deid_log_thread)
+        self.deid_log_thread.started.connect(self.deid_log_loader.run)
+        self.deid_log_loader.slow_paths.connect(self.on_slow_paths)
+        if reload:
+            self.deid_log_loader.finished.connect(self.on_deid_log_reloaded)
+            self.deid_log_loader.failed.connect(self.on_deid_log_reload_failed)
+        else:
+            self.deid_log_loader.finished.connect(self.on_deid_log_loaded)
+            self.deid_log_loader.failed.connect(self.on_deid_log_failed)
+        self.deid_log_loader.finished.connect(self.deid_log_thread.quit)
+        self.deid_log_loader.failed.connect(self.deid_log_thread.quit)
+        self.deid_log_thread.finished.connect(self.deid_log_loader.deleteLater)
+        self.deid_log_thread.finished.connect(self.deid_log_thread.deleteLater)
+        self.deid_log_thread.start()
+
+    def on_deid_log_loaded(self):
+        """Deid log is ready: allow confirming sessions and offer to resume interrupted transfers"""
+        self.deid_log_ready = True
+        self.statusBar().showMessage("DeID log loaded", 5000)
+        if self.data_model.invalid_deid_rows:
+            QMessageBox.warning(
+                self,
+                "DeID log",
+                "These rows of the DeID log have a DeID that is not a number and cannot be used: "
+                + ", ".join(map(str, self.data_model.invalid_deid_rows)),
+            )
+        self.check_pending_transfers()
+
+    def on_deid_log_reloaded(self):
+        """Deid log is up to date with its workbook again"""
+        self.deid_log_ready = True
+
+    def on_deid_log_reload_failed(self, error_message):
+        """The changed workbook could not be loaded, keep using the deid log loaded before"""
+        self.deid_log_ready = True
+        QMessageBox.warning(
+            self,
+            "WARNING",
+            f"{error_message}\n\nThe DeID log loaded before is still used, loading is retried after the next session.",
+        )
+
+    def on_slow_paths(self, paths):
+        """Show which configured paths have not responded yet"""
+        self.statusBar().showMessage("Waiting for: " + ", ".join(paths))
+
+    def on_deid_log_failed(self, error_message):
+        """A path is missing or the deid log could not be loaded, the app cannot allocate deids without it"""
+        QMessageBox.critical(self, "ERROR", error_message)
+        QApplication.exit(1)
+
+    def check_pending_transfers(self):
+        """Ask user to resume or discard each transfer that was interrupted before completing"""
+        for journal in self.data_model.load_pending_transfers():
+            self.ask_to_resume_transfer(journal)
+
+    def ask_to_resume_transfer(self, journal):
+        """Resume (queue) or discard an interrupted transfer"""
+        dat = journal["session_info"]
+        reply = QMessageBox.question(
+            self,
+            "Unfinished Transfer",
+            f"The file transfer for the following session was interrupted:\n\n"
+            f"{dat['study']} {dat['subject_id']} {dat['subject_initials']} {dat['visit_number']} (DeID {journal['deid']:04})\n\n"
+            "Yes: resume the transfer (the USB must be connected)\n"
+            "Discard: delete the partial copies (the DeID log entry is kept)\n"
+            "Cancel: ask again next time",
+            QMessageBox.StandardButton.Yes
+            | QMessageBox.StandardButton.Discard
+            | QMessageBox.StandardButton.Cancel,
+            QMessageBox.StandardButton.Yes,
+        )
+        if reply == QMessageBox.StandardButton.Yes:
+            session_model = self.data_model.detach_session()
+            session_model.restore_pending_transfer(journal)
+            self.transfer_queue.enqueue(session_model)
+        elif reply == QMessageBox.StandardButton.Discard:
+            self.data_model.discard_pending_transfer(journal)
+
     def init_menu(self):
         """Create menu bar with reset form and select output items"""
         menu_bar = self.menuBar()
@@ -639,7 +797,7 @@ class MainWindow(QMainWindow):
 
         # Quit application
         quit_action = QAction("Quit", self)
-        quit_action.triggered.connect(QApplication.quit)
+        quit_action.triggered.connect(self.close)
         file_menu.addAction(quit_action)
 
     def reset_app(self):
@@ -655,8 +813,20 @@ class MainWindow(QMainWindow):
         self.tab_widget.setTabEnabled(0, True)
         self.tab_widget.setCurrentIndex(0)
 
-        # Clear data amodel
-        self.data_model.clear_data()
+        # Clear data model and reload configuration files that changed
+        self.data_model.clear_session_data()
+        try:
+            self.data_model.refresh_config()
+        except Exception as e:
+            QMessageBox.warning(
+                self,
+                "WARNING",
+                f"The configuration could not be reloaded, the configuration loaded before is used:\n\n{e}",
+            )
+
+        # Reload deid log in the background if its workbook changed (left to the loader if it is still loading)
+        if self.deid_log_ready:
+            self.start_deid_log_loader(reload=True)
 
     def validate_session_and_swap_tabs(self):
         """When session confirm button is clicked: double check validity, update model, and swap to second tab"""
@@ -672,6 +842,15 @@ class MainWindow(QMainWindow):
             )
             return
 
+        # Duplicate check and deid allocation need the deid log
+        if not self.deid_log_ready:
+            QMessageBox.information(
+                self,
+                "Please wait",
+                "The DeID log is still loading. Try again in a moment.",
+            )
+            return
+
         # Update data model with session information
         self.session_info_tab.update_session_info()
 
@@ -734,38 +913,23 @@ class MainWindow(QMainWindow):
         if not self.ask_user_for_file_confirmation():
             return
 
-        # initialize progress dialog
-        progress_dialog = ProgressDialog(self)
-        progress_dialog.show()
-
         # update data model with file information
         self.file_upload_tab.update_file_info()
-        progress_dialog.update_progress(20)
-
-        # save session and file info to deid log
-        self.data_model.save_session_to_deid_log()
-        progress_dialog.update_progress(40)
-
-        # copy corrected files
-        self.data_model.copy_and_rename_files()
-        progress_dialog.update_progress(60)
-
-        # copy deid files
-        self.data_model.save_deid_files()
-        progress_dialog.update_progress(80)
 
-        # zip net placement photos
-        self.data_model.save_net_placement_photos()
-        progress_dialog.update_progress(100)
-
-        # save sidecar (not used currently)
-        # self.data_model.save_sidecar_files()
-
-        # close progress dialog
-        progress_dialog.accept()
+        # allocate deid by saving the session to the deid log
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            self.data_model.save_session()
+        except Exception as e:
+            QApplication.restoreOverrideCursor()
+            QMessageBox.critical(
+                self, "ERROR", f"The session could not be saved to the DeID log:\n\n{e}"
+            )
+            return
+        QApplication.restoreOverrideCursor()
 
-        # display deid and confirm file transfer
-        message = "File transfer complete.\n"
+        # display deid
+        message = "Session saved, the files are now copied in the background (see Transfers tab).\n"
         rand_num = datetime.now().microsecond % 100
         if 5 <= rand_num <= 19: 
             message += r"""Here is a lucky cat
@@ -784,37 +948,1629 @@ class MainWindow(QMainWindow):
         message += f"\n\nYour DeID is: {self.data_model.deid:04}"
         QMessageBox.information(self, "Success", message)
 
-        # reset for next file
+        # transfer files in the background and reset for next session
+        self.transfer_queue.enqueue(self.data_model.detach_session())
         self.reset_app()
 
+    def on_transfer_finished(self, job_index):
+        """Background transfer of a session is done"""
+
+        # save sidecar (not used currently)
+        # self.transfer_queue.jobs[job_index]["data_model"].save_sidecar_files()
+
+        job = self.transfer_queue.jobs[job_index]
+        self.statusBar().showMessage(
+            f"File transfer complete: {job['description']} (DeID {job['deid']:04})", 10000
+        )
+
+    def on_transfer_failed(self, job_index, error_message):
+        """Background transfer of a session failed, it stays journaled and can be resumed on next start"""
+        job = self.transfer_queue.jobs[job_index]
+        QMessageBox.critical(
+            self,
+            "ERROR",
+            f"File transfer failed for {job['description']}:\n\n{error_message}\n\n"
+            f"DeID {job['deid']:04} was already allocated in the DeID log for this session. "
+            "The transfer can be resumed the next time the app is started.",
+        )
+
+    def closeEvent(self, event):
+        """Do not quit while sessions are being transferred"""
+        if not self.transfer_queue.is_idle():
+            QMessageBox.warning(
+                self,
+                "WARNING",
+                "Files are still being copied. Wait until all transfers are complete (see Transfers tab) before quitting.",
+            )
+            event.ignore()
+            return
+        # stop reading the selected .mff files, their staged copies are deleted
+        self.data_model.update_mff_prefetches([])
+        event.accept()
+
+
+class DeidLogLoader(QObject):
+    """Checks the configured paths and loads the deid log on a worker thread so the main window can be shown first.
+    With reload, it only reloads the deid log if its workbook changed since it was loaded."""
+
+    slow_paths = pyqtSignal(list)
+    finished = pyqtSignal()
+    failed = pyqtSignal(str)
+
+    def __init__(self, data_model, reload=False, parent=None):
+        super().__init__(parent)
+        self.data_model = data_model
+        self.reload = reload
+
+    def run(self):
+        if self.reload:
+            # prefetches of the next session may already be staging, so their folder is left alone
+            try:
+                self.data_model.refresh_deid_log()
+            except Exception as e:
+                self.failed.emit(f"The DeID log could not be reloaded:\n\n{e}")
+                return
+            self.finished.emit()
+            return
+        try:
+            self.data_model.check_file_paths(self.slow_paths.emit)
+        except FileNotFoundError as e:
+            self.failed.emit(str(e))
+            return
+        try:
+            self.data_model.refresh_deid_log()
+        except Exception as e:
+            self.failed.emit(f"The DeID log could not be loaded:\n\n{e}")
+            return
+        # sessions can only be entered once the log is loaded, so no prefetch is running yet
+        self.data_model.remove_prefetch_staging()
+        self.finished.emit()
+
+
+class TransferWorker(QObject):
+    """Runs the data model transfer stages on a worker thread and reports progress through signals"""
+
+    stage_changed = pyqtSignal(str)
+    bytes_copied = pyqtSignal("qint64", "qint64")  # bytes copied, total bytes
+    finished = pyqtSignal()
+    failed = pyqtSignal(str)
+
+    def __init__(self, data_model, parent=None):
+        super().__init__(parent)
+        self.data_model = data_model
+        self.copied_bytes = 0
+        self.total_bytes = 0
+
+    def add_copied_bytes(self, num_bytes):
+        """Progress callback passed to the data model copy functions"""
+        self.copied_bytes += num_bytes
+        self.bytes_copied.emit(self.copied_bytes, self.total_bytes)
+
+    def run(self):
+        try:
+            self.total_bytes = self.data_model.get_total_transfer_bytes()
+            self.bytes_copied.emit(0, self.total_bytes)
+            self.data_model.run_transfer(self.stage_changed.emit, self.add_copied_bytes)
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        self.finished.emit()
 
-class ProgressDialog(QDialog):
-    def __init__(self, parent=None):
+
+class TransferQueue(QObject):
+    """Transfers queued sessions in the background, each with a TransferWorker on its own thread.
+    At most max_concurrent transfers run at the same time. Each queued session has its own data model (see DataModel.detach_session)."""
+
+    job_added = pyqtSignal(int)
+    job_changed = pyqtSignal(int)
+    job_finished = pyqtSignal(int)
+    job_failed = pyqtSignal(int, str)
+
+    def __init__(self, max_concurrent=1, parent=None):
         super().__init__(parent)
-        self.setWindowTitle("Progress")
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.jobs = []
+        self.running = {}  # job index: (thread, worker)
+
+    def enqueue(self, data_model):
+        """Queue transfer of the session in data_model"""
+        dat = data_model.session_info
+        self.jobs.append(
+            {
+                "data_model": data_model,
+                "description": f"{dat['study']} {dat['subject_id']} {dat['subject_initials']} {dat['visit_number']}",
+                "deid": int(data_model.deid),
+                "status": "Queued",
+                "stage": "",
+                "copied_bytes": 0,
+                "total_bytes": 0,
+                "error": None,
+            }
+        )
+        self.job_added.emit(len(self.jobs) - 1)
+        self.start_next()
 
-        # disable main window when active
-        self.setModal(True)
+    def is_idle(self):
+        return not any(job["status"] in ("Queued", "Running") for job in self.jobs)
+
+    def start_next(self):
+        """Start queued jobs while fewer than max_concurrent are running"""
+        for job_index, job in enumerate(self.jobs):
+            if len(self.running) >= self.max_concurrent:
+                return
+            if job["status"] == "Queued":
+                self.start_job(job_index)
+
+    def start_job(self, job_index):
+        """Run transfer stages of a queued session on a worker thread"""
+        self.jobs[job_index]["status"] = "Running"
+        thread = QThread(self)
+        worker = TransferWorker(self.jobs[job_index]["data_model"])
+        worker.moveToThread(thread)
+        thread.started.connect(worker.run)
+        worker.stage_changed.connect(partial(self.on_stage_changed, job_index))
+        worker.bytes_copied.connect(partial(self.on_bytes_copied, job_index))
+        worker.finished.connect(partial(self.on_job_done, job_index, None))
+        worker.failed.connect(partial(self.on_job_done, job_index))
+        worker.finished.connect(thread.quit)
+        worker.failed.connect(thread.quit)
+        thread.finished.connect(worker.deleteLater)
+        thread.finished.connect(thread.deleteLater)
+        self.running[job_index] = (thread, worker)
+        thread.start()
+        self.job_changed.emit(job_index)
+
+    def on_stage_changed(self, job_index, stage_name):
+        self.jobs[job_index]["stage"] = stage_name
+        self.job_changed.emit(job_index)
+
+    def on_bytes_copied(self, job_index, copied_bytes, total_bytes):
+        self.jobs[job_index]["copied_bytes"] = copied_bytes
+        self.jobs[job_index]["total_bytes"] = total_bytes
+        self.job_changed.emit(job_index)
+
+    def on_job_done(self, job_index, error_message):
+        """Worker finished (error_message None) or failed: update job and start next queued job"""
+        job = self.jobs[job_index]
+        self.running.pop(job_index, None)
+        if error_message is None:
+            job["status"] = "Done"
+            job["copied_bytes"] = job["total_bytes"]
+        else:
+            job["status"] = "Failed"
+            job["error"] = error_message
+        self.job_changed.emit(job_index)
+        if error_message is None:
+            self.job_finished.emit(job_index)
+        else:
+            self.job_failed.emit(job_index, error_message)
+        self.start_next()
 
-        # disable close button (wait until all transfer is complete)
-        self.setWindowFlags(Qt.Window | Qt.WindowTitleHint | Qt.CustomizeWindowHint)
+
+class TransferQueueView(QWidget):
+    """Table of queued, running and finished transfers with their progress"""
+
+    COLUMNS = ["Session", "DeID", "Status", "Progress"]
+
+    def __init__(self, transfer_queue, parent=None):
+        super().__init__(parent)
+        self.transfer_queue = transfer_queue
 
         self.layout = QVBoxLayout(self)
 
         self.warning_label = QLabel(
-            "FILES ARE BEING COPIED, DO NOT TOUCH ANYTHING\n\nUI MAY BECOME UNRESPONSIVE, THAT IS OKAY\n\n",
-            self,
+            "Do not remove the USB or external drive while transfers are running"
         )
         self.layout.addWidget(self.warning_label)
 
-        self.progress_bar = QProgressBar(self)
-        self.layout.addWidget(self.progress_bar)
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionMode(QAbstractItemView.NoSelection)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.layout.addWidget(self.table)
+
+        self.transfer_queue.job_added.connect(self.add_row)
+        self.transfer_queue.job_changed.connect(self.update_row)
+
+    def add_row(self, job_index):
+        job = self.transfer_queue.jobs[job_index]
+        self.table.insertRow(job_index)
+        self.table.setItem(job_index, 0, QTableWidgetItem(job["description"]))
+        self.table.setItem(job_index, 1, QTableWidgetItem(f"{job['deid']:04}"))
+        self.table.setItem(job_index, 2, QTableWidgetItem(""))
+        self.table.setCellWidget(job_index, 3, QProgressBar())
+        self.update_row(job_index)
+
+    def update_row(self, job_index):
+        """Show status and progress of a job"""
+        job = self.transfer_queue.jobs[job_index]
+        status_item = self.table.item(job_index, 2)
+        if job["status"] == "Running" and job["stage"]:
+            status_item.setText(job["stage"])
+        elif job["status"] == "Failed":
+            status_item.setText(f"Failed: {job['error']}")
+        else:
+            status_item.setText(job["status"])
+        status_item.setToolTip(job["error"] or "")
+
+        progress_bar = self.table.cellWidget(job_index, 3)
+        copied, total = job["copied_bytes"], job["total_bytes"]
+        progress_bar.setValue(int(100 * copied / total) if total else (100 if job["status"] == "Done" else 0))
+        progress_bar.setFormat(
+            f"%p%  ({copied / 1024 ** 2:,.1f} MB of {total / 1024 ** 2:,.1f} MB)"
+        )
+
+
+class MffCopyEngine:
+    """Copies .mff directories to one or more destinations, reading each source file only once.
+    Files are hashed while they are copied and a manifest is written next to each destination.
+    Completed files are recorded in a journal next to each destination so interrupted copies can be resumed.
+    Destinations on the same filesystem as an earlier destination are cloned (reflink) or hardlinked from it when possible."""
+
+    CHUNK_SIZE = 4 * 1024 * 1024
+
+    # Linux ioctl for copy-on-write file clones (btrfs, XFS, ...)
+    FICLONE = 0x40049409
+
+    def __init__(self, progress_callback=None, max_workers=1, hash_algorithm="sha256", io_callback=None):
+        self.progress_callback = progress_callback
+        # called with (operation, path, bytes, seconds) for every file read, written or linked (see TransferTelemetry)
+        self.io_callback = io_callback
+        self.max_workers = max(1, int(max_workers))
+        self.hash_algorithm = hash_algorithm
+        self.progress_lock = threading.Lock()
+        self.journal_lock = threading.Lock()
+
+    def report_progress(self, num_bytes):
+        """Forward copied bytes to the progress callback (called from several copy threads)"""
+        if self.progress_callback:
+            with self.progress_lock:
+                self.progress_callback(num_bytes)
+
+    def report_io(self, operation, path, num_bytes, seconds):
+        """Forward the time spent reading, writing or linking a file to the io callback"""
+        if self.io_callback:
+            self.io_callback(operation, path, num_bytes, seconds)
+
+    def copy_tree(self, src_dir, dst_dirs, dst_options=None, known_digests=None, keep_journals=False):
+        """Copy a directory tree to every destination like shutil.copytree, writing each chunk read to all destinations.
+        Destinations left partial by an interrupted copy are resumed, skipping files already completed.
+        With keep_journals, the journals are left next to the completed destinations until the caller has recorded
+        the copy and calls remove_journal, so a crash in between still finds them resumable.
+
+        dst_options maps a destination to its options:
+            allow_hardlinks: files may be hardlinked from another destination on the same filesystem
+            exclude: file name patterns (e.g. "*.mov") that are not copied to the destination
+            rewrite_files: file names whose content is rewritten with replacements while copying (see StreamRewriter)
+            replacements: {old: new} strings replaced in rewrite_files
+            renamed_files: {relative path: new relative path} of files saved under another name
+            store: ContentStore the copied files are deduplicated with
+        Rewritten and renamed files are always written, never linked from another destination.
+        known_digests maps relative paths to digests computed earlier (see MffPrefetch). Copied files must match
+        them (see copy_file), files whose content the store already holds are linked from it without copying.
+        """
+        dst_options = dst_options or {}
+        known_digests = known_digests or {}
+
+        # Start new destinations or load completed files of partial ones, keyed by relative path
+        completed_files = {dst_dir: self.start_destination(dst_dir) for dst_dir in dst_dirs}
+
+        # Pick copy strategy per destination: buffered copy, or clone/link from an earlier destination
+        strategies, link_sources = self.choose_strategies(dst_dirs, dst_options)
+
+        # Create directory structure and collect files to copy
+        file_jobs = []
+        for dirpath, dirnames, filenames in os.walk(src_dir, followlinks=True):
+            rel_dir = os.path.relpath(dirpath, src_dir)
+            for dirname in dirnames:
+                for dst_dir in dst_dirs:
+                    os.makedirs(os.path.join(dst_dir, rel_dir, dirname), exist_ok=True)
+            for filename in filenames:
+                src = os.path.join(dirpath, filename)
+                rel_path = os.path.normpath(os.path.join(rel_dir, filename))
+                file_dst_dirs = [
+                    dst_dir
+                    for dst_dir in dst_dirs
+                    if not self.is_excluded(
+                        filename, dst_options.get(dst_dir, {}).get("exclude", [])
+                    )
+                ]
+                if not file_dst_dirs:
+                    continue
+                size = os.path.getsize(src)
+                pending_dst_dirs = [
+                    dst_dir
+                    for dst_dir in file_dst_dirs
+                    if not self.is_file_complete(
+                        dst_dir,
+                        self.get_dst_rel_path(dst_options, dst_dir, rel_path),
+                        None if self.is_rewritten(dst_options, dst_dir, rel_path) else size,
+                        completed_files[dst_dir],
+                    )
+                ]
+                # Files already in every destination only count towards progress
+                self.report_progress(size * (len(file_dst_dirs) - len(pending_dst_dirs)))
+                if pending_dst_dirs:
+                    file_jobs.append((size, src, rel_path, pending_dst_dirs, file_dst_dirs))
+
+        # Start the large signal files first so small files fill the other workers
+        file_jobs.sort(key=lambda job: job[0], reverse=True)
+
+        def is_transformed(dst_dir, rel_path):
+            return self.is_rewritten(
+                dst_options, dst_dir, rel_path
+            ) or rel_path in dst_options.get(dst_dir, {}).get("renamed_files", {})
+
+        def copy_job(size, src, rel_path, pending_dst_dirs, file_dst_dirs):
+            # Destinations that are linked from another destination do not need the source bytes,
+            # unless the file is excluded from or transformed in that other destination
+            write_dst_dirs = [
+                dst_dir
+                for dst_dir in pending_dst_dirs
+                if strategies[dst_dir] == "copy"
+                or is_transformed(dst_dir, rel_path)
+                or link_sources[dst_dir] not in file_dst_dirs
+                or is_transformed(link_sources[dst_dir], rel_path)
+            ]
+            link_dst_dirs = [
+                dst_dir for dst_dir in pending_dst_dirs if dst_dir not in write_dst_dirs
+            ]
+            dst_rel_paths = {
+                dst_dir: self.get_dst_rel_path(dst_options, dst_dir, rel_path)
+                for dst_dir in pending_dst_dirs
+            }
+
+            # Content already in the store of a destination is linked from there, without reading the source
+            results = {}
+            if rel_path in known_digests:
+                for dst_dir in pending_dst_dirs:
+                    store = dst_options.get(dst_dir, {}).get("store")
+                    dst = os.path.join(dst_dir, dst_rel_paths[dst_dir])
+                    if not store or self.is_rewritten(dst_options, dst_dir, rel_path):
+                        continue
+                    start = time.perf_counter()
+                    if store.link(known_digests[rel_path], dst, size):
+                        self.report_io("link", dst, size, time.perf_counter() - start)
+                        self.report_progress(size)
+                        results[dst_dir] = (size, known_digests[rel_path])
+                write_dst_dirs = [dst_dir for dst_dir in write_dst_dirs if dst_dir not in results]
+                link_dst_dirs = [dst_dir for dst_dir in link_dst_dirs if dst_dir not in results]
+
+            if write_dst_dirs:
+                rewriters = {
+                    dst_dir: StreamRewriter(dst_options[dst_dir]["replacements"])
+                    for dst_dir in write_dst_dirs
+                    if self.is_rewritten(dst_options, dst_dir, rel_path)
+                }
+                size, digest, rewritten = self.copy_file(
+                    src,
+                    [
+                        os.path.join(dst_dir, dst_rel_paths[dst_dir])
+                        for dst_dir in write_dst_dirs
+                        if dst_dir not in rewriters
+                    ],
+                    {
+                        os.path.join(dst_dir, dst_rel_paths[dst_dir]): rewriter
+                        for dst_dir, rewriter in rewriters.items()
+                    },
+                    known_digests.get(rel_path),
+                )
+                for dst_dir in write_dst_dirs:
+                    results[dst_dir] = rewritten.get(
+                        os.path.join(dst_dir, dst_rel_paths[dst_dir]), (size, digest)
+                    )
+            elif link_dst_dirs:
+                # linked file was linked from the store or copied into its source destination by an earlier,
+                # interrupted copy
+                link_source = link_sources[link_dst_dirs[0]]
+                size, digest = results.get(link_source) or completed_files[link_source][rel_path]
+
+            for dst_dir in link_dst_dirs:
+                start = time.perf_counter()
+                self.link_file(
+                    strategies[dst_dir],
+                    os.path.join(link_sources[dst_dir], rel_path),
+                    os.path.join(dst_dir, rel_path),
+                )
+                self.report_io(
+                    "link", os.path.join(dst_dir, rel_path), size, time.perf_counter() - start
+                )
+                self.report_progress(size)
+                results[dst_dir] = (size, digest)
+
+            for dst_dir in pending_dst_dirs:
+                store = dst_options.get(dst_dir, {}).get("store")
+                if store and results[dst_dir][0] > 0:
+                    store.add(os.path.join(dst_dir, dst_rel_paths[dst_dir]), results[dst_dir][1])
+                self.add_to_journal(dst_dir, dst_rel_paths[dst_dir], *results[dst_dir])
+                completed_files[dst_dir][dst_rel_paths[dst_dir]] = results[dst_dir]
+
+        if self.max_workers == 1 or len(file_jobs) < 2:
+            for file_job in file_jobs:
+                copy_job(*file_job)
+        else:
+            executor = ThreadPoolExecutor(max_workers=self.max_workers)
+            try:
+                futures = [executor.submit(copy_job, *file_job) for file_job in file_jobs]
+                for future in as_completed(futures):
+                    future.result()
+            finally:
+                # on error, do not start copying any remaining files
+                executor.shutdown(wait=True, cancel_futures=True)
+
+        # Copy directory metadata bottom up, after all files are written
+        for dirpath, _, _ in os.walk(src_dir, topdown=False, followlinks=True):
+            rel_dir = os.path.relpath(dirpath, src_dir)
+            for dst_dir in dst_dirs:
+                shutil.copystat(dirpath, os.path.normpath(os.path.join(dst_dir, rel_dir)))
+
+        # Write integrity manifest next to each destination, then mark it complete
+        for dst_dir in dst_dirs:
+            manifest_files = [
+                {
+                    "path": rel_path.replace(os.sep, "/"),
+                    "size": size,
+                    "digest": digest,
+                }
+                for rel_path, (size, digest) in sorted(completed_files[dst_dir].items())
+            ]
+            self.write_manifest(dst_dir, manifest_files)
+        if not keep_journals:
+            for dst_dir in dst_dirs:
+                self.remove_journal(dst_dir)
+
+    def copy_file(self, src, dsts, rewriters=None, digest=None):
+        """Copy a single file to every destination with metadata (like shutil.copy2).
+        rewriters maps further destinations to a StreamRewriter that rewrites the bytes written to them.
+        The copied bytes are always hashed. If digest (e.g. from MffPrefetch) is given, it must match them,
+        otherwise the source changed since it was hashed and OSError is raised.
+        Returns size and digest of the copied bytes and {rewritten destination: (size, digest)}."""
+        rewriters = rewriters or {}
+        file_hash = hashlib.new(self.hash_algorithm)
+        size = 0
+        rewritten_hashes = {dst: hashlib.new(self.hash_algorithm) for dst in rewriters}
+        rewritten_sizes = {dst: 0 for dst in rewriters}
+        # time spent waiting for the source and each destination
+        read_seconds = 0.0
+        write_seconds = dict.fromkeys(list(dsts) + list(rewriters), 0.0)
+        for dst in list(dsts) + list(rewriters):
+            # left by an interrupted copy, it may be linked to a store object or another destination
+            if os.path.exists(dst):
+                self.remove_file(dst)
+        with ExitStack() as stack:
+            fsrc = stack.enter_context(open(src, "rb"))
+            fdsts = {dst: stack.enter_context(open(dst, "wb")) for dst in dsts}
+            frewritten = {dst: stack.enter_context(open(dst, "wb")) for dst in rewriters}
+
+            def write_rewritten(dst, data):
+                rewritten_hashes[dst].update(data)
+                rewritten_sizes[dst] += len(data)
+                start = time.perf_counter()
+                frewritten[dst].write(data)
+                write_seconds[dst] += time.perf_counter() - start
+
+            while True:
+                start = time.perf_counter()
+                chunk = fsrc.read(self.CHUNK_SIZE)
+                read_seconds += time.perf_counter() - start
+                if not chunk:
+                    break
+                file_hash.update(chunk)
+                size += len(chunk)
+                for dst, fdst in fdsts.items():
+                    start = time.perf_counter()
+                    fdst.write(chunk)
+                    write_seconds[dst] += time.perf_counter() - start
+                for dst, rewriter in rewriters.items():
+                    write_rewritten(dst, rewriter.feed(chunk))
+                self.report_progress(len(chunk) * (len(fdsts) + len(frewritten)))
+            for dst, rewriter in rewriters.items():
+                write_rewritten(dst, rewriter.flush())
+
+        if digest is not None and file_hash.hexdigest() != digest:
+            raise OSError(f"'{src}' changed since it was prefetched, copy the session again")
+        for dst in list(dsts) + list(rewriters):
+            shutil.copystat(src, dst)
+
+        self.report_io("read", src, size, read_seconds)
+        for dst in dsts:
+            self.report_io("write", dst, size, write_seconds[dst])
+        for dst in rewriters:
+            self.report_io("write", dst, rewritten_sizes[dst], write_seconds[dst])
+
+        rewritten = {
+            dst: (rewritten_sizes[dst], rewritten_hashes[dst].hexdigest())
+            for dst in rewriters
+        }
+        return size, file_hash.hexdigest(), rewritten
+
+    @staticmethod
+    def is_rewritten(dst_options, dst_dir, rel_path):
+        """Check if the content of a file is rewritten in dst_dir"""
+        options = dst_options.get(dst_dir, {})
+        return bool(options.get("replacements")) and os.path.basename(
+            rel_path
+        ) in options.get("rewrite_files", [])
+
+    @staticmethod
+    def get_dst_rel_path(dst_options, dst_dir, rel_path):
+        """Relative path a file is saved under in dst_dir"""
+        return os.path.normpath(
+            dst_options.get(dst_dir, {}).get("renamed_files", {}).get(rel_path, rel_path)
+        )
+
+    #################################################
+    ############ SAME FILESYSTEM COPIES #############
+    #################################################
+
+    def choose_strategies(self, dst_dirs, dst_options):
+        """Choose "copy", "reflink" or "hardlink" for every destination.
+        Destinations with "reflink" or "hardlink" are linked from the destination in link_sources."""
+        strategies = {}
+        link_sources = {}
+        copy_dst_dirs = []
+        for dst_dir in dst_dirs:
+            allow_hardlinks = dst_options.get(dst_dir, {}).get("allow_hardlinks", False)
+            for copy_dst_dir in copy_dst_dirs:
+                strategy = self.probe_link_strategy(copy_dst_dir, dst_dir, allow_hardlinks)
+                if strategy != "copy":
+                    strategies[dst_dir] = strategy
+                    link_sources[dst_dir] = copy_dst_dir
+                    break
+            else:
+                strategies[dst_dir] = "copy"
+                copy_dst_dirs.append(dst_dir)
+        return strategies, link_sources
+
+    def probe_link_strategy(self, src_dir, dst_dir, allow_hardlinks):
+        """Check if files in src_dir can be cloned or hardlinked into dst_dir, using a small probe file"""
+        if os.stat(src_dir).st_dev != os.stat(dst_dir).st_dev:
+            return "copy"
+
+        # probe next to the .mff directories so nothing is left inside them after a crash
+        probe_src = os.path.join(
+            os.path.dirname(os.path.normpath(src_dir)), f".{os.getpid()}_copy_probe_src"
+        )
+        probe_dst = os.path.join(
+            os.path.dirname(os.path.normpath(dst_dir)), f".{os.getpid()}_copy_probe_dst"
+        )
+        try:
+            with open(probe_src, "wb") as probe:
+                probe.write(b"probe")
+            if self.reflink(probe_src, probe_dst):
+                return "reflink"
+            if allow_hardlinks:
+                try:
+                    os.link(probe_src, probe_dst)
+                    return "hardlink"
+                except OSError:
+                    pass
+            return "copy"
+        finally:
+            for probe_path in (probe_src, probe_dst):
+                if os.path.exists(probe_path):
+                    os.remove(probe_path)
+
+    @classmethod
+    def reflink(cls, src, dst):
+        """Clone src to dst with a copy-on-write reflink. Returns False where not supported."""
+        try:
+            import fcntl
+        except ImportError:
+            return False  # not available on Windows
+        try:
+            with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+                fcntl.ioctl(fdst.fileno(), cls.FICLONE, fsrc.fileno())
+            return True
+        except OSError:
+            if os.path.exists(dst):
+                os.remove(dst)
+            return False
+
+    def link_file(self, strategy, src, dst):
+        """Create dst from the copy at src on the same filesystem, falling back to an in-kernel or buffered copy"""
+        if os.path.exists(dst):
+            self.remove_file(dst)  # left by an interrupted copy
+        if strategy == "hardlink":
+            try:
+                os.link(src, dst)
+                return
+            except OSError:
+                pass
+        elif strategy == "reflink" and self.reflink(src, dst):
+            shutil.copystat(src, dst)
+            return
+
+        # fallback: copy_file_range lets the kernel (or a network filesystem server) copy without user space buffers
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            try:
+                size = os.fstat(fsrc.fileno()).st_size
+                while size > 0:
+                    copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), size)
+                    if copied == 0:
+                        break
+                    size -= copied
+            except (AttributeError, OSError):
+                fsrc.seek(0)
+                fdst.seek(0)
+                fdst.truncate()
+                shutil.copyfileobj(fsrc, fdst, self.CHUNK_SIZE)
+        shutil.copystat(src, dst)
+
+    @staticmethod
+    def remove_file(path):
+        """Remove a file, also a read-only one (store objects and copies linked to them, see ContentStore).
+        Windows only deletes read-only files after they are made writable, which applies to all their links."""
+        try:
+            os.remove(path)
+        except PermissionError:
+            os.chmod(path, stat.S_IREAD | stat.S_IWRITE)
+            os.remove(path)
+
+    @staticmethod
+    def remove_read_only(function, path, exc_info):
+        """shutil.rmtree error handler that retries removing read-only files (see remove_file)"""
+        os.chmod(path, stat.S_IREAD | stat.S_IWRITE)
+        function(path)
+
+    @staticmethod
+    def is_excluded(file_name, patterns):
+        """Check if file name matches one of the exclusion patterns (case insensitive, e.g. "*.mov" matches "video1.MOV")"""
+        return any(fnmatch(file_name.lower(), pattern.lower()) for pattern in patterns)
+
+    @staticmethod
+    def get_manifest_path(dst_dir):
+        """Manifest for an .mff directory is saved next to it as <name>_manifest.json"""
+        return os.path.splitext(os.path.normpath(dst_dir))[0] + "_manifest.json"
+
+    def write_manifest(self, dst_dir, manifest_files):
+        """Save relative path, size and digest of every file copied into dst_dir"""
+        manifest = {
+            "mff_file": os.path.basename(os.path.normpath(dst_dir)),
+            "created": datetime.now().isoformat(),
+            "hash_algorithm": self.hash_algorithm,
+            "files": manifest_files,
+        }
+        # written under a temporary name, a manifest is only ever found complete
+        manifest_path = self.get_manifest_path(dst_dir)
+        with open(manifest_path + ".tmp", "w") as outfile:
+            json.dump(manifest, outfile, indent=4)
+        os.replace(manifest_path + ".tmp", manifest_path)
 
-        self.setLayout(self.layout)
+    #################################################
+    ################# COPY JOURNAL ##################
+    #################################################
 
-    def update_progress(self, value):
-        self.progress_bar.setValue(value)
-        QApplication.processEvents()
+    @staticmethod
+    def get_journal_path(dst_dir):
+        """Journal for an .mff directory being copied is saved next to it as <name>_journal.jsonl"""
+        return os.path.splitext(os.path.normpath(dst_dir))[0] + "_journal.jsonl"
+
+    @classmethod
+    def is_partial(cls, dst_dir):
+        """A destination with a journal was left behind by an interrupted copy"""
+        return os.path.exists(cls.get_journal_path(dst_dir))
+
+    @classmethod
+    def remove_partial(cls, dst_dir):
+        """Delete a partially copied destination and its journal. Complete destinations are never touched,
+        also not those whose journal was kept (see copy_tree), only their journal is removed."""
+        if not cls.is_partial(dst_dir):
+            return
+        if os.path.exists(dst_dir) and not os.path.exists(cls.get_manifest_path(dst_dir)):
+            shutil.rmtree(dst_dir, onerror=cls.remove_read_only)
+        cls.remove_journal(dst_dir)
+
+    @classmethod
+    def remove_journal(cls, dst_dir):
+        """Mark a destination complete by removing its journal"""
+        if os.path.exists(cls.get_journal_path(dst_dir)):
+            os.remove(cls.get_journal_path(dst_dir))
+
+    def start_destination(self, dst_dir):
+        """Create journal and directory for a new destination, or load the journal of a partial one"""
+        journal_path = self.get_journal_path(dst_dir)
+        if self.is_partial(dst_dir):
+            os.makedirs(dst_dir, exist_ok=True)
+            return self.load_journal(journal_path)
+
+        if os.path.exists(dst_dir):
+            raise FileExistsError(f"File '{dst_dir}' already exists.")
+
+        # journal is created first so a crash at any later point leaves a resumable destination
+        os.makedirs(os.path.dirname(journal_path), exist_ok=True)
+        with open(journal_path, "w") as journal:
+            journal.write(json.dumps({"hash_algorithm": self.hash_algorithm}) + "\n")
+        os.makedirs(dst_dir)
+        return {}
+
+    def load_journal(self, journal_path):
+        """Read completed files (relative path -> size, digest) from a journal"""
+        completed_files = {}
+        with open(journal_path, "r") as journal:
+            lines = journal.read().splitlines()
+        for line_number, line in enumerate(lines):
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                if line_number == 0:
+                    return {}
+                continue  # last line may be cut off by a crash
+            if line_number == 0:
+                # digests from a different algorithm cannot be reused
+                if entry.get("hash_algorithm") != self.hash_algorithm:
+                    return {}
+                continue
+            completed_files[os.path.normpath(entry["path"])] = (
+                entry["size"],
+                entry["digest"],
+            )
+        return completed_files
+
+    def add_to_journal(self, dst_dir, rel_path, size, digest):
+        """Record that a file has been completely copied into dst_dir"""
+        entry = {"path": rel_path.replace(os.sep, "/"), "size": size, "digest": digest}
+        with self.journal_lock:
+            with open(self.get_journal_path(dst_dir), "a") as journal:
+                journal.write(json.dumps(entry) + "\n")
+
+    @staticmethod
+    def is_file_complete(dst_dir, rel_path, size, completed_files):
+        """Check if a file was already copied into dst_dir by an earlier, interrupted copy.
+        size is the source size, None for rewritten files (their size is only known from the journal)."""
+        entry = completed_files.get(rel_path)
+        if entry is None or (size is not None and entry[0] != size):
+            return False
+        dst = os.path.join(dst_dir, rel_path)
+        return os.path.exists(dst) and os.path.getsize(dst) == entry[0]
+
+
+class MffPrefetch:
+    """Reads an .mff bundle ahead of its transfer, starting as soon as it is selected.
+    Lists and sizes its files, then reads and hashes them, which also fills the OS file cache for the transfer.
+    With a staging path, the bundle is also copied to fast local disk while it is read.
+    If the bundle did not change since, the transfer reuses the digests and copies from the staged copy.
+    Prefetches run one at a time on a shared background thread, so they never compete for the drive."""
+
+    CHUNK_SIZE = MffCopyEngine.CHUNK_SIZE
+
+    # shared by all prefetches, created with the first one
+    executor = None
+    executor_lock = threading.Lock()
+
+    def __init__(self, mff_path, hash_algorithm="sha256", staging_path=None):
+        self.mff_path = mff_path
+        self.hash_algorithm = hash_algorithm
+        # staged copy of the bundle, its parent folder belongs to this prefetch
+        self.staging_path = staging_path
+        self.staged = False
+        # {relative path: (size, mtime_ns, digest)} of every file once the prefetch is complete
+        self.files = {}
+        self.total_bytes = None
+        self.complete = False
+        self.error = None
+        self.cancelled = threading.Event()
+        self.finished = False
+        self.lock = threading.Lock()
+        with MffPrefetch.executor_lock:
+            if MffPrefetch.executor is None:
+                MffPrefetch.executor = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="mff_prefetch"
+                )
+        self.future = MffPrefetch.executor.submit(self.run)
+
+    def run(self):
+        try:
+            self.prefetch()
+        except Exception as e:
+            # prefetching is only an optimization, the transfer reads the bundle itself
+            self.error = e
+        finally:
+            with self.lock:
+                self.finished = True
+                cancelled = self.cancelled.is_set()
+            if cancelled or not self.complete:
+                self.remove_staged()
+
+    def prefetch(self):
+        """Size scan, then read, hash and optionally stage every file. Stops early once cancelled."""
+        scanned = {}
+        for dirpath, _, filenames in os.walk(self.mff_path, followlinks=True):
+            for filename in filenames:
+                src = os.path.join(dirpath, filename)
+                scanned[os.path.relpath(src, self.mff_path)] = os.stat(src)
+        self.total_bytes = sum(st.st_size for st in scanned.values())
+
+        # only stage if the local disk has room to spare
+        stage = self.staging_path is not None and (
+            shutil.disk_usage(os.path.dirname(self.staging_path)).free
+            > 2 * self.total_bytes
+        )
+
+        files = {}
+        for rel_path, st in scanned.items():
+            src = os.path.join(self.mff_path, rel_path)
+            file_hash = hashlib.new(self.hash_algorithm)
+            with ExitStack() as stack:
+                fsrc = stack.enter_context(open(src, "rb"))
+                fdst = None
+                if stage:
+                    dst = os.path.join(self.staging_path, rel_path)
+                    os.makedirs(os.path.dirname(dst), exist_ok=True)
+                    fdst = stack.enter_context(open(dst, "wb"))
+                while True:
+                    if self.cancelled.is_set():
+                        return
+                    chunk = fsrc.read(self.CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    file_hash.update(chunk)
+                    if fdst:
+                        fdst.write(chunk)
+            if stage:
+                shutil.copystat(src, dst)
+            files[rel_path] = (st.st_size, st.st_mtime_ns, file_hash.hexdigest())
+        if stage:
+            for dirpath, _, _ in os.walk(self.mff_path, topdown=False, followlinks=True):
+                rel_dir = os.path.relpath(dirpath, self.mff_path)
+                os.makedirs(os.path.join(self.staging_path, rel_dir), exist_ok=True)
+                shutil.copystat(dirpath, os.path.normpath(os.path.join(self.staging_path, rel_dir)))
+
+        self.files = files
+        self.staged = stage
+        self.complete = True
+
+    def cancel(self):
+        """Stop the prefetch and delete the staged copy (once the background thread stopped using it)"""
+        with self.lock:
+            self.cancelled.set()
+            finished = self.finished
+        # a prefetch that has not started yet is simply dropped, a running one cleans up when it stops
+        if finished or self.future.cancel():
+            self.remove_staged()
+
+    def remove_staged(self):
+        """Delete the staged copy with the folder created for it"""
+        if self.staging_path:
+            shutil.rmtree(os.path.dirname(self.staging_path), ignore_errors=True)
+        self.staged = False
+
+    def is_ready(self):
+        """Prefetch completed and the bundle was not changed since (same files, sizes and modification times)"""
+        if not self.complete or self.cancelled.is_set():
+            return False
+        current = {}
+        for dirpath, _, filenames in os.walk(self.mff_path, followlinks=True):
+            for filename in filenames:
+                st = os.stat(os.path.join(dirpath, filename))
+                current[os.path.relpath(os.path.join(dirpath, filename), self.mff_path)] = (
+                    st.st_size,
+                    st.st_mtime_ns,
+                )
+        return current == {
+            rel_path: (size, mtime_ns) for rel_path, (size, mtime_ns, _) in self.files.items()
+        }
+
+    def get_digests(self):
+        """{relative path: digest} of the prefetched files"""
+        return {rel_path: digest for rel_path, (_, _, digest) in self.files.items()}
+
+
+class ContentStore:
+    """Content-addressed store of backed up files, keyed by digest (see dedup_store_dir in transfer_config.json).
+    Copies are hardlinked to the store object holding their content, so content that is already backed up
+    (e.g. a recording uploaded again under a corrected session) takes up space only once.
+    Objects are read-only (see dedup_read_only), and their content is verified before another copy is linked to
+    them, so a changed copy never spreads to later backups.
+    The hardlink count of an object is its refcount: an object that is only linked from the store itself
+    is no longer used by any copy and is deleted by collect_garbage.
+    Only destinations on the same filesystem as the store can be deduplicated, and the filesystem must
+    support hardlinks (NTFS, ext4, APFS, ... but not exFAT or FAT32)."""
+
+    def __init__(self, store_dir, hash_algorithm="sha256", read_only=True):
+        self.store_dir = store_dir
+        self.hash_algorithm = hash_algorithm
+        self.read_only = read_only
+        self.objects_dir = os.path.join(store_dir, "objects", hash_algorithm)
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self.device = os.stat(self.objects_dir).st_dev
+        # copy threads adding the same content must not replace each other's object
+        self.lock = threading.Lock()
+        # {object path: (size, mtime_ns)} of objects added or hashed by this store, see verify
+        self.verified = {}
+
+    def get_object_path(self, digest):
+        """Objects are spread over subfolders by the first two digest characters"""
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def can_link(self, dst_dir):
+        """Files in dst_dir can be hardlinked to the store (same filesystem)"""
+        path = os.path.abspath(dst_dir)
+        while not os.path.exists(path):
+            path = os.path.dirname(path)
+        return os.stat(path).st_dev == self.device
+
+    def verify(self, object_path, size, digest):
+        """Check that an object exists and still holds the content of its digest.
+        Objects are read-only, but a copy linked to one can still be changed once it is made writable.
+        An object is only hashed once, after that it is trusted while its size and modification time stay the same."""
+        try:
+            st = os.stat(object_path)
+            if st.st_size != size:
+                return False
+            if self.verified.get(object_path) == (st.st_size, st.st_mtime_ns):
+                return True
+            file_hash = hashlib.new(self.hash_algorithm)
+            with open(object_path, "rb") as file:
+                for chunk in iter(partial(file.read, MffCopyEngine.CHUNK_SIZE), b""):
+                    file_hash.update(chunk)
+        except FileNotFoundError:
+            return False  # not in the store, or deleted by collect_garbage meanwhile
+        if file_hash.hexdigest() != digest:
+            return False
+        self.verified[object_path] = (st.st_size, st.st_mtime_ns)
+        return True
+
+    def link(self, digest, dst, size):
+        """Create dst as a link to the object with this digest and size,
+        returns False if the store does not hold that content (anymore)"""
+        object_path = self.get_object_path(digest)
+        with self.lock:
+            return self.verify(object_path, size, digest) and self.replace_with_link(object_path, dst)
+
+    def replace_with_link(self, src, dst):
+        """Replace dst (if it exists) by a link to src in one step, so dst is never missing.
+        Returns False, leaving dst as it is, if src no longer exists (e.g. deleted by collect_garbage meanwhile)."""
+        tmp_path = dst + ".link.tmp"
+        if os.path.exists(tmp_path):
+            MffCopyEngine.remove_file(tmp_path)
+        try:
+            os.link(src, tmp_path)
+        except FileNotFoundError:
+            return False
+        try:
+            os.replace(tmp_path, dst)
+        except PermissionError:
+            # Windows does not replace read-only files
+            MffCopyEngine.remove_file(dst)
+            os.replace(tmp_path, dst)
+        if self.read_only:
+            os.chmod(dst, 0o444)  # again, in case it was made writable to delete a link (see remove_file)
+        return True
+
+    def add(self, path, digest):
+        """Deduplicate a file that was just copied: add it as the object for its digest,
+        or replace it by a link to the object if the store already holds that content.
+        A changed object is replaced by the copy, copies linked to it before keep the changed content."""
+        object_path = self.get_object_path(digest)
+        if os.path.exists(object_path) and os.path.samefile(object_path, path):
+            return
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        with self.lock:
+            try:
+                os.link(path, object_path)
+            except FileExistsError:
+                if self.verify(object_path, os.path.getsize(path), digest) and self.replace_with_link(
+                    object_path, path
+                ):
+                    return
+                # the object changed, or was deleted by collect_garbage since it was found
+                self.replace_with_link(path, object_path)
+            if self.read_only:
+                os.chmod(object_path, 0o444)
+            # its content was hashed while it was copied
+            st = os.stat(object_path)
+            self.verified[object_path] = (st.st_size, st.st_mtime_ns)
+
+    def iter_objects(self):
+        """(path, stat) of every object"""
+        for dirpath, _, filenames in os.walk(self.objects_dir):
+            for filename in filenames:
+                if filename.endswith(".tmp"):
+                    continue  # link left by an interrupted replace_with_link
+                object_path = os.path.join(dirpath, filename)
+                yield object_path, os.stat(object_path)
+
+    def collect_garbage(self, min_age=24 * 3600, dry_run=False):
+        """Delete objects that are no longer linked from any copy. Objects are kept for min_age seconds after
+        st_ctime, so content added by a running transfer is never deleted before it is linked. st_ctime is the
+        last change of the links or mode on Linux and macOS, but the time the object was added on Windows.
+        A transfer that finds an object deleted meanwhile copies the file instead (see link).
+        Returns number and total size of the (with dry_run: deletable) objects."""
+        removed = 0
+        freed_bytes = 0
+        now = time.time()
+        for object_path, stat_result in self.iter_objects():
+            if stat_result.st_nlink > 1 or now - stat_result.st_ctime < min_age:
+                continue
+            if not dry_run:
+                MffCopyEngine.remove_file(object_path)
+                self.verified.pop(object_path, None)
+            removed += 1
+            freed_bytes += stat_result.st_size
+        return removed, freed_bytes
+
+    def get_stats(self):
+        """Objects, bytes stored and bytes saved by linking the same content more than once"""
+        stats = {"objects": 0, "unused_objects": 0, "stored_bytes": 0, "saved_bytes": 0}
+        for _, stat_result in self.iter_objects():
+            stats["objects"] += 1
+            stats["stored_bytes"] += stat_result.st_size
+            if stat_result.st_nlink == 1:
+                stats["unused_objects"] += 1
+            # one link is the store, one is the first copy
+            stats["saved_bytes"] += stat_result.st_size * max(0, stat_result.st_nlink - 2)
+        return stats
+
+
+class StreamRewriter:
+    """Replaces strings in a byte stream in a single pass with one compiled pattern, chunk by chunk.
+    The last (longest string - 1) bytes of each chunk are held back, so strings split across two chunks are found
+    and memory stays bounded by the chunk size."""
+
+    def __init__(self, replacements):
+        self.replacements = {
+            old.encode("utf-8"): new.encode("utf-8") for old, new in replacements.items()
+        }
+        # longest first, so a full file name wins over the id it starts with
+        olds = sorted(self.replacements, key=len, reverse=True)
+        self.pattern = re.compile(b"|".join(re.escape(old) for old in olds))
+        self.hold_back = len(olds[0]) - 1
+        self.tail = b""
+
+    def feed(self, chunk):
+        """Rewrite next chunk, returns the bytes that are final so far"""
+        return self.rewrite(self.tail + chunk, len(self.tail) + len(chunk) - self.hold_back)
+
+    def flush(self):
+        """Rewrite the held back end of the stream"""
+        return self.rewrite(self.tail, len(self.tail))
+
+    def rewrite(self, data, limit):
+        """Replace matches starting before limit (all of them can be seen completely), keep the rest as tail"""
+        parts = []
+        pos = 0
+        for match in self.pattern.finditer(data):
+            if match.start() >= limit:
+                break
+            parts.append(data[pos : match.start()])
+            parts.append(self.replacements[match.group()])
+            pos = match.end()
+        end = max(pos, limit)
+        parts.append(data[pos:end])
+        self.tail = data[end:]
+        return b"".join(parts)
+
+
+class PhotoZipPacker:
+    """Packs photos into a zip archive that is streamed straight to its destination.
+    JPEG photos are already compressed and are stored as they are, other formats (PNG, ...) are deflated.
+    Upcoming photos are read in parallel into small bounded buffers while the current one is written,
+    so memory stays bounded by max_workers * BUFFERED_CHUNKS * CHUNK_SIZE."""
+
+    CHUNK_SIZE = 1024 * 1024
+    BUFFERED_CHUNKS = 4
+    STORED_EXTENSIONS = (".jpg", ".jpeg")
+
+    def __init__(self, progress_callback=None, max_workers=1, io_callback=None):
+        self.progress_callback = progress_callback
+        # called with (operation, path, bytes, seconds) for every photo read and written (see TransferTelemetry)
+        self.io_callback = io_callback
+        self.max_workers = max(1, int(max_workers))
+
+    def pack(self, photos, zip_path):
+        """Write photos to a new zip archive at zip_path, in the given order"""
+        cancelled = threading.Event()
+        buffers = [queue.Queue(maxsize=self.BUFFERED_CHUNKS) for _ in photos]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            # readers are started in order, so the photo being written always has a running reader
+            for photo, buffer in zip(photos, buffers):
+                executor.submit(self.read_photo, photo, buffer, cancelled)
+            try:
+                with ZipFile(zip_path, "w") as zip_file:
+                    for photo, buffer in zip(photos, buffers):
+                        self.write_photo(zip_file, photo, buffer)
+            finally:
+                # stop readers that are still waiting for buffer space
+                cancelled.set()
+
+    def write_photo(self, zip_file, photo, buffer):
+        """Write one photo from its buffer as a zip entry"""
+        zinfo = ZipInfo.from_file(photo, os.path.basename(photo), strict_timestamps=False)
+        zinfo.compress_type = (
+            ZIP_STORED
+            if photo.lower().endswith(self.STORED_EXTENSIONS)
+            else ZIP_DEFLATED
+        )
+        write_seconds = 0.0
+        with zip_file.open(zinfo, "w") as entry:
+            while True:
+                chunk = buffer.get()
+                if isinstance(chunk, Exception):
+                    raise chunk
+                if not chunk:
+                    break
+                start = time.perf_counter()
+                entry.write(chunk)
+                write_seconds += time.perf_counter() - start
+                if self.progress_callback:
+                    self.progress_callback(len(chunk))
+        if self.io_callback:
+            self.io_callback("write", zip_file.filename, zinfo.compress_size, write_seconds)
+
+    def read_photo(self, photo, buffer, cancelled):
+        """Read photo chunk by chunk into its buffer, ending with an empty chunk (or the error)"""
+        try:
+            size = 0
+            read_seconds = 0.0
+            with open(photo, "rb") as file:
+                while True:
+                    start = time.perf_counter()
+                    chunk = file.read(self.CHUNK_SIZE)
+                    read_seconds += time.perf_counter() - start
+                    size += len(chunk)
+                    if not chunk and self.io_callback:
+                        self.io_callback("read", photo, size, read_seconds)
+                    if not self.put(buffer, chunk, cancelled) or not chunk:
+                        return
+        except Exception as e:
+            self.put(buffer, e, cancelled)
+
+    @staticmethod
+    def put(buffer, item, cancelled):
+        """Put item into the buffer once there is space, returns False if packing was cancelled"""
+        while not cancelled.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+
+class XlsxPatchError(Exception):
+    """Raised when an .xlsx package cannot be patched in place"""
+
+
+class XlsxRowInUseError(Exception):
+    """Raised when a row that is written already holds values (e.g. saved by another workstation)"""
+
+
+class XlsxRowPatcher:
+    """Rewrites a single row of the active sheet inside an .xlsx package. Only empty cells are written.
+    Only the sheet's XML (and styles.xml if a new number format is needed) is changed,
+    so other sheets, sheet protection and the styles of all other cells are kept as they are."""
+
+    @classmethod
+    def patch_row(cls, xlsx_path, sheet_row, row_values, number_formats=None):
+        """Set values of a row and return the patched package as bytes.
+        row_values and number_formats map 1-based column indices to a value or number format code.
+        Raises XlsxRowInUseError if one of the cells already holds a value."""
+        number_formats = number_formats or {}
+        with ZipFile(xlsx_path) as zin:
+            sheet_part = cls.get_active_sheet_part(zin)
+            sheet_xml = zin.read(sheet_part).decode("utf-8")
+            styles_xml = zin.read("xl/styles.xml").decode("utf-8")
+
+            sheet_xml, styles_xml = cls.patch_sheet_row(
+                sheet_xml, styles_xml, sheet_row, row_values, number_formats
+            )
+
+            # copy every other part of the package unchanged
+            patched = io.BytesIO()
+            with ZipFile(patched, "w") as zout:
+                for item in zin.infolist():
+                    if item.filename == sheet_part:
+                        data = sheet_xml.encode("utf-8")
+                    elif item.filename == "xl/styles.xml":
+                        data = styles_xml.encode("utf-8")
+                    else:
+                        data = zin.read(item.filename)
+                    zout.writestr(item, data)
+        return patched.getvalue()
+
+    @staticmethod
+    def get_active_sheet_part(zin):
+        """Get path of the active sheet's XML inside the package (same sheet as openpyxl's wb.active)"""
+        workbook_xml = zin.read("xl/workbook.xml").decode("utf-8")
+        active_tab = re.search(r'<workbookView\b[^>]*\bactiveTab="(\d+)"', workbook_xml)
+        active_tab = int(active_tab.group(1)) if active_tab else 0
+        sheet_tags = re.findall(r"<sheet\b[^>]*>", workbook_xml)
+        if active_tab >= len(sheet_tags):
+            raise XlsxPatchError("Active sheet not found in workbook")
+        rel_id = re.search(r'\b\w+:id="([^"]+)"', sheet_tags[active_tab])
+
+        rels_xml = zin.read("xl/_rels/workbook.xml.rels").decode("utf-8")
+        for rel_tag in re.findall(r"<Relationship\b[^>]*>", rels_xml):
+            if rel_id and f'Id="{rel_id.group(1)}"' in rel_tag:
+                target = re.search(r'Target="([^"]+)"', rel_tag).group(1)
+                return target.lstrip("/") if target.startswith("/") else "xl/" + target
+        raise XlsxPatchError("Active sheet part not found in workbook relationships")
+
+    @classmethod
+    def patch_sheet_row(cls, sheet_xml, styles_xml, sheet_row, row_values, number_formats):
+        """Replace cells of a row in the sheet XML"""
+        from openpyxl.utils import column_index_from_string, get_column_letter
+        row_tag = re.search(rf'<row\b[^>]*\br="{sheet_row}"[^>]*>', sheet_xml)
+        if row_tag is None:
+            raise XlsxPatchError(f"Row {sheet_row} not found in sheet")
+        if row_tag.group(0).endswith("/>"):
+            row_start = row_tag.group(0)[:-2].rstrip() + ">"
+            row_body = ""
+            row_end = row_tag.end()
+        else:
+            row_start = row_tag.group(0)
+            row_end = sheet_xml.index("</row>", row_tag.end())
+            row_body = sheet_xml[row_tag.end() : row_end]
+            row_end += len("</row>")
+
+        # existing cells by column index
+        cells = {}
+        for cell in re.finditer(r"<c\b[^>]*?(?:/>|>.*?</c>)", row_body, re.S):
+            ref = re.search(r'\br="([A-Z]+)\d+"', cell.group(0))
+            if ref is None:
+                raise XlsxPatchError("Cell without reference in sheet")
+            cells[column_index_from_string(ref.group(1))] = cell.group(0)
+
+        filled = [col_idx for col_idx in row_values if cls.has_value(cells.get(col_idx, ""))]
+        if filled:
+            raise XlsxRowInUseError(
+                f"Row {sheet_row} is not empty (column {', '.join(map(get_column_letter, filled))})"
+            )
+
+        # cells without their own style take the row style, like in Excel
+        row_style = re.search(r'\bs="(\d+)"', row_start)
+        if row_style and 'customFormat="1"' not in row_start:
+            row_style = None
+
+        for col_idx, value in row_values.items():
+            style = re.search(r'\bs="(\d+)"', cells.get(col_idx, ""))
+            style = style or row_style
+            style = int(style.group(1)) if style else None
+            if col_idx in number_formats:
+                styles_xml, style = cls.get_style_with_number_format(
+                    styles_xml, style or 0, number_formats[col_idx]
+                )
+            cells[col_idx] = cls.make_cell(
+                f"{get_column_letter(col_idx)}{sheet_row}", value, style
+            )
+
+        new_row = row_start + "".join(cells[col_idx] for col_idx in sorted(cells)) + "</row>"
+        return sheet_xml[: row_tag.start()] + new_row + sheet_xml[row_end:], styles_xml
+
+    @staticmethod
+    def has_value(cell):
+        """Check if cell XML holds a value or formula (cells with only a style are empty)"""
+        return bool(re.search(r"<f\b|<v>[^<]+</v>|<t\b[^>]*>[^<]+</t>", cell))
+
+    @staticmethod
+    def make_cell(ref, value, style):
+        """Cell XML for a value, strings are stored inline so the shared strings are left untouched"""
+        style_attr = f' s="{style}"' if style is not None else ""
+        if value is None or value == "":
+            return f'<c r="{ref}"{style_attr}/>'
+        if isinstance(value, bool):
+            return f'<c r="{ref}"{style_attr} t="b"><v>{int(value)}</v></c>'
+        if isinstance(value, (int, float)):
+            return f'<c r="{ref}"{style_attr}><v>{value}</v></c>'
+        text = xml_escape(str(value))
+        space = ' xml:space="preserve"' if text != text.strip() else ""
+        return f'<c r="{ref}"{style_attr} t="inlineStr"><is><t{space}>{text}</t></is></c>'
+
+    @staticmethod
+    def set_attribute(tag, name, value):
+        """Set attribute in an XML opening tag"""
+        if re.search(rf'\b{name}="[^"]*"', tag):
+            return re.sub(rf'\b{name}="[^"]*"', f'{name}="{value}"', tag, count=1)
+        return re.sub(r"\s*(/?>)$", rf' {name}="{value}"\1', tag, count=1)
+
+    @classmethod
+    def get_style_with_number_format(cls, styles_xml, base_style, format_code):
+        """Get index of a cell format that is base_style with the given number format, adding it to styles.xml if needed"""
+
+        # find or add number format (an empty list may be written as <numFmts count="0"/>)
+        styles_xml = re.sub(
+            r"<numFmts\b([^>]*?)\s*/>", r"<numFmts\1></numFmts>", styles_xml, count=1
+        )
+        num_fmts = re.search(r"(<numFmts\b[^>]*>)(.*?)(</numFmts>)", styles_xml, re.S)
+        num_fmt_ids = {}
+        if num_fmts:
+            for num_fmt in re.findall(r"<numFmt\b[^>]*>", num_fmts.group(2)):
+                num_fmt_id = int(re.search(r'numFmtId="(\d+)"', num_fmt).group(1))
+                code = xml_unescape(re.search(r'formatCode="([^"]*)"', num_fmt).group(1))
+                num_fmt_ids[code] = num_fmt_id
+        num_fmt_id = num_fmt_ids.get(format_code)
+        if num_fmt_id is None:
+            num_fmt_id = max([163] + list(num_fmt_ids.values())) + 1  # custom formats start at 164
+            new_num_fmt = f'<numFmt numFmtId="{num_fmt_id}" formatCode="{xml_escape(format_code, {chr(34): "&quot;"})}"/>'
+            if num_fmts:
+                start_tag = cls.set_attribute(num_fmts.group(1), "count", len(num_fmt_ids) + 1)
+                styles_xml = (
+                    styles_xml[: num_fmts.start()]
+                    + start_tag
+                    + num_fmts.group(2)
+                    + new_num_fmt
+                    + num_fmts.group(3)
+                    + styles_xml[num_fmts.end() :]
+                )
+            else:
+                # numFmts must be the first element of the style sheet
+                style_sheet = re.search(r"<styleSheet\b[^>]*>", styles_xml)
+                styles_xml = (
+                    styles_xml[: style_sheet.end()]
+                    + f'<numFmts count="1">{new_num_fmt}</numFmts>'
+                    + styles_xml[style_sheet.end() :]
+                )
+
+        # find or add cell format (xf) based on the cell's current format
+        cell_xfs = re.search(r"(<cellXfs\b[^>]*>)(.*?)(</cellXfs>)", styles_xml, re.S)
+        if cell_xfs is None:
+            raise XlsxPatchError("Cell formats not found in styles")
+        xfs = re.findall(r"<xf\b[^>]*?(?:/>|>.*?</xf>)", cell_xfs.group(2), re.S)
+        if base_style >= len(xfs):
+            raise XlsxPatchError(f"Cell format {base_style} not found in styles")
+        base_xf = xfs[base_style]
+        base_xf_tag = re.match(r"<xf\b[^>]*>", base_xf).group(0)
+        new_xf_tag = cls.set_attribute(
+            cls.set_attribute(base_xf_tag, "numFmtId", num_fmt_id), "applyNumberFormat", 1
+        )
+        new_xf = new_xf_tag + base_xf[len(base_xf_tag) :]  # keep alignment and protection
+        if new_xf in xfs:
+            return styles_xml, xfs.index(new_xf)
+        if base_xf == new_xf or re.search(rf'numFmtId="{num_fmt_id}"', base_xf_tag):
+            return styles_xml, base_style
+
+        start_tag = cls.set_attribute(cell_xfs.group(1), "count", len(xfs) + 1)
+        styles_xml = (
+            styles_xml[: cell_xfs.start()]
+            + start_tag
+            + cell_xfs.group(2)
+            + new_xf
+            + cell_xfs.group(3)
+            + styles_xml[cell_xfs.end() :]
+        )
+        return styles_xml, len(xfs)
+
+
+class DeidLogMirror:
+    """Local SQLite copy of the DeID log so the workbook is only parsed again after it changes.
+    The mirror is stamped with the workbook's path, modification time and size."""
+
+    def __init__(self, mirror_path):
+        self.mirror_path = mirror_path
+
+    def connect(self):
+        os.makedirs(os.path.dirname(self.mirror_path), exist_ok=True)
+        return closing(sqlite3.connect(self.mirror_path))
+
+    @staticmethod
+    def get_workbook_stamp(workbook_path):
+        """Identify workbook version by path, modification time and size"""
+        stat = os.stat(workbook_path)
+        return os.path.abspath(workbook_path), stat.st_mtime_ns, stat.st_size
+
+    @staticmethod
+    def quote(column_name):
+        return '"' + str(column_name).replace('"', '""') + '"'
+
+    @staticmethod
+    def to_sql_value(value):
+        """Convert pandas/numpy cell value to a value sqlite can store"""
+        import pandas as pd
+        if value is None or (not isinstance(value, str) and pd.isna(value)):
+            return None
+        if hasattr(value, "isoformat"):
+            return value.isoformat()
+        if hasattr(value, "item"):
+            return value.item()  # numpy scalar
+        return value
+
+    def is_current(self, workbook_path):
+        """Check if the mirror was synced with the current version of the workbook"""
+        if not os.path.exists(self.mirror_path):
+            return False
+        try:
+            with self.connect() as conn:
+                row = conn.execute(
+                    "SELECT workbook_path, mtime_ns, size FROM sync_stamp"
+                ).fetchone()
+        except sqlite3.Error:
+            return False
+        return row is not None and tuple(row) == self.get_workbook_stamp(workbook_path)
+
+    def get_columns(self, conn, table):
+        return [
+            row[0]
+            for row in conn.execute(
+                f"SELECT column_name FROM {table} ORDER BY column_index"
+            )
+        ]
+
+    def load(self):
+        """Read mirrored deid log into a dataframe (same layout as the parsed workbook) and the sheet's column names"""
+        import pandas as pd
+        with self.connect() as conn:
+            columns = self.get_columns(conn, "log_columns")
+            sheet_columns = self.get_columns(conn, "sheet_columns")
+            rows = conn.execute(
+                f"SELECT {', '.join(self.quote(c) for c in columns)} FROM deid_log ORDER BY row_index"
+            ).fetchall()
+        return pd.DataFrame.from_records(rows, columns=columns), sheet_columns
+
+    def replace(self, deid_log, sheet_columns, workbook_path):
+        """Replace mirror contents with a freshly parsed deid log"""
+        columns = list(deid_log.columns)
+        column_defs = ", ".join(self.quote(c) for c in columns)
+        with self.connect() as conn, conn:
+            for table in ("deid_log", "log_columns", "sheet_columns", "sync_stamp"):
+                conn.execute(f"DROP TABLE IF EXISTS {table}")
+            # columns are untyped so values keep the type they had in the workbook
+            conn.execute(f"CREATE TABLE deid_log (row_index INTEGER PRIMARY KEY, {column_defs})")
+            conn.execute("CREATE TABLE log_columns (column_index INTEGER, column_name TEXT)")
+            conn.execute("CREATE TABLE sheet_columns (column_index INTEGER, column_name TEXT)")
+            conn.execute("CREATE TABLE sync_stamp (workbook_path TEXT, mtime_ns INTEGER, size INTEGER)")
+            conn.executemany(
+                "INSERT INTO log_columns VALUES (?, ?)", list(enumerate(map(str, columns)))
+            )
+            conn.executemany(
+                "INSERT INTO sheet_columns VALUES (?, ?)", list(enumerate(sheet_columns))
+            )
+            conn.executemany(
+                f"INSERT INTO deid_log VALUES (?, {', '.join('?' * len(columns))})",
+                (
+                    [row_index] + [self.to_sql_value(value) for value in row]
+                    for row_index, row in zip(deid_log.index, deid_log.itertuples(index=False))
+                ),
+            )
+            conn.execute(
+                "INSERT INTO sync_stamp VALUES (?, ?, ?)", self.get_workbook_stamp(workbook_path)
+            )
+
+    def update_row(self, row_index, row_values, workbook_path):
+        """Write a single row after it was saved to the workbook and restamp the mirror.
+        Only call this if the workbook held exactly the mirrored rows before the row was saved."""
+        assignments = ", ".join(f"{self.quote(c)} = ?" for c in row_values)
+        with self.connect() as conn, conn:
+            conn.execute(
+                f"UPDATE deid_log SET {assignments} WHERE row_index = ?",
+                [self.to_sql_value(value) for value in row_values.values()] + [int(row_index)],
+            )
+            conn.execute("DELETE FROM sync_stamp")
+            conn.execute(
+                "INSERT INTO sync_stamp VALUES (?, ?, ?)", self.get_workbook_stamp(workbook_path)
+            )
+
+    def invalidate(self):
+        """Delete the mirror, so the workbook is parsed again on the next load"""
+        if os.path.exists(self.mirror_path):
+            os.remove(self.mirror_path)
+
+    def get_empty_row_index(self):
+        """Get index of the first row where every column except the deid is empty, or None"""
+        with self.connect() as conn:
+            row = conn.execute(
+                'SELECT row_index FROM deid_log WHERE NOT "_in_use" ORDER BY row_index LIMIT 1'
+            ).fetchone()
+        return None if row is None else row[0]
+
+
+class TransferTelemetry:
+    """Timing and throughput of the transfer stages of one session, saved as one JSON line per session in a
+    rotating local log (see DataModel.save_telemetry).
+    Every stage records start and end time, bytes moved, files and error details. Time spent reading, writing
+    and linking files is summed per path (and per operation), paths are recorded by their filepath_config.json
+    key (e.g. usb_input_dir, mff_backup_dir) so slow drives can be compared between sessions."""
+
+    # sessions transferred at the same time share the log
+    log_lock = threading.Lock()
+
+    def __init__(self, path_labels):
+        # {path: label} of the configured files and folders
+        self.path_labels = {
+            os.path.normcase(os.path.abspath(path)): label
+            for label, path in path_labels.items()
+            if isinstance(path, str) and path
+        }
+        self.lock = threading.Lock()
+        self.stages = []
+        self.current_stage = None
+        self.resumed = False
+
+    def get_path_label(self, path):
+        """Key of the configured file or folder containing path, "other" if there is none"""
+        path = os.path.normcase(os.path.abspath(path))
+        matches = [
+            root
+            for root in self.path_labels
+            if path == root or path.startswith(root.rstrip(os.sep) + os.sep)
+        ]
+        return self.path_labels[max(matches, key=len)] if matches else "other"
+
+    @contextmanager
+    def stage(self, stage_key):
+        """Record the stage run inside the with block, errors are recorded and raised again"""
+        self.current_stage = {
+            "stage": stage_key,
+            "start": datetime.now().isoformat(),
+            "bytes": 0,
+            "io": {},
+            "error": None,
+        }
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.current_stage["error"] = {"type": type(e).__name__, "message": str(e)}
+            raise
+        finally:
+            with self.lock:
+                stage = self.current_stage
+                self.current_stage = None
+            stage["end"] = datetime.now().isoformat()
+            stage["seconds"] = time.perf_counter() - start
+            stage["mb_per_s"] = self.get_mb_per_s(stage["bytes"], stage["seconds"])
+            stage["io"] = list(stage["io"].values())
+            for io in stage["io"]:
+                io["mb_per_s"] = self.get_mb_per_s(io["bytes"], io["seconds"])
+            stage["files"] = sum(io["files"] for io in stage["io"] if io["operation"] != "read")
+            self.stages.append(stage)
+
+    def add_bytes(self, num_bytes):
+        """Count bytes moved by the current stage (same bytes as the progress bar)"""
+        with self.lock:
+            if self.current_stage:
+                self.current_stage["bytes"] += num_bytes
+
+    def record_io(self, operation, path, num_bytes, seconds):
+        """Add time spent reading, writing or linking a file to the current stage (called from several copy threads)"""
+        label = self.get_path_label(path)
+        with self.lock:
+            if not self.current_stage:
+                return
+            io = self.current_stage["io"].setdefault(
+                (operation, label),
+                {"operation": operation, "path": label, "bytes": 0, "files": 0, "seconds": 0.0},
+            )
+            io["bytes"] += num_bytes
+            io["files"] += 1
+            io["seconds"] += seconds
+
+    @staticmethod
+    def get_mb_per_s(num_bytes, seconds):
+        """Throughput in MB/s, None if nothing was timed"""
+        return round(num_bytes / 1024**2 / seconds, 3) if seconds > 0 else None
+
+    def get_record(self):
+        """Log entry of the stages recorded so far"""
+        return {
+            "start": self.stages[0]["start"] if self.stages else None,
+            "end": self.stages[-1]["end"] if self.stages else None,
+            "resumed": self.resumed,
+            "status": "failed" if any(stage["error"] for stage in self.stages) else "done",
+            "bytes": sum(stage["bytes"] for stage in self.stages),
+            "seconds": sum(stage["seconds"] for stage in self.stages),
+            "stages": self.stages,
+        }
+
+    @classmethod
+    def append_to_log(cls, log_path, record, max_bytes, backup_count):
+        """Append record as a JSON line. A log that would grow beyond max_bytes is first renamed to
+        log_path.1 (older logs to .2, ... up to backup_count, the oldest is deleted)."""
+        line = json.dumps(record) + "\n"
+        with cls.log_lock:
+            os.makedirs(os.path.dirname(log_path), exist_ok=True)
+            if os.path.exists(log_path) and os.path.getsize(log_path) + len(line) > max_bytes:
+                for index in range(backup_count - 1, 0, -1):
+                    if os.path.exists(f"{log_path}.{index}"):
+                        os.replace(f"{log_path}.{index}", f"{log_path}.{index + 1}")
+                if backup_count > 0:
+                    os.replace(log_path, f"{log_path}.1")
+                else:
+                    os.remove(log_path)
+            with open(log_path, "a", encoding="utf-8") as file:
+                file.write(line)
 
 
 class DataModel:
@@ -842,11 +2598,57 @@ class DataModel:
         "other": "Other",
     }
 
-    def __init__(self):
+    # Options for the audio source of each paradigm
+    AUDIO_SOURCES = ["none", "headphones", "speakers"]
+
+    # Files within the .MFF directory that contain identifiers, rewritten while copying (see get_deidentify_options)
+    FILES_TO_DEIDENTIFY = [
+        "hostTimes.xml",
+        "movieSyncs1.xml",
+        "subject.xml",
+        "techNote.rtf",
+    ]
+
+    # times a session is saved to the deid log before giving up when other workstations keep changing it
+    DEID_LOG_SAVE_ATTEMPTS = 3
+
+    TRANSFER_CONFIG_DEFAULTS = {
+        # number of files of an .mff bundle copied concurrently
+        "copy_workers": 4,
+        # hashlib algorithm for the integrity manifest written next to each copied .mff
+        "hash_algorithm": "sha256",
+        # local folder for app state, e.g. journals of unfinished transfers
+        "state_dir": "~/.eeg_backup",
+        # hardlink deid files to the backup copy if both are on the same filesystem and cloning is not supported
+        "allow_hardlinks": True,
+        # file name patterns never copied to the deid folder (participant videos)
+        "deid_exclude": ["*.mov"],
+        # replace the original file name and participant id in the deid copy of each .mff (see get_deidentify_options)
+        "deidentify_mff": False,
+        # number of sessions transferred in the background at the same time
+        "max_concurrent_transfers": 1,
+        # seconds to wait for a configured path (e.g. sleeping external drive or OneDrive) to respond at startup
+        "path_probe_timeout": 10,
+        # size at which the transfer telemetry log (telemetry.jsonl in state_dir) is rotated, and rotated logs kept
+        "telemetry_max_bytes": 5 * 1024 * 1024,
+        "telemetry_backup_count": 5,
+        # read and hash .mff files in the background as soon as they are selected (see MffPrefetch). Off by default:
+        # unless they are also staged locally the transfer reads them from the USB again, and a prefetch competes
+        # for the drives with transfers running in the background
+        "prefetch_mff": False,
+        # also copy them to the local state folder while they are read, the transfer then copies from there
+        "prefetch_stage_locally": False,
+        # content-addressed store that backup and deid copies are deduplicated with (see ContentStore),
+        # must be on the drive of mff_backup_dir, null to disable
+        "dedup_store_dir": None,
+        # make store objects (and the copies linked to them) read-only, so they are not changed by accident
+        "dedup_read_only": True,
+    }
 
-        # Load file path configuration
-        self.filepath_dict = self.load_file_paths()
-        self.deid_log_filepath = self.filepath_dict["deid_log_filepath"]
+    def __init__(self, load_deid_log=True):
+
+        # (mtime, size) of the config files behind the shared state, see refresh_shared_state
+        self.source_stamps = {}
 
         # Load UI configuration containing presets
         self.config_file_path = os.path.join(
@@ -856,10 +2658,32 @@ class DataModel:
         # DO NOT CHECK FOR LOCAL BACK UP DISCREPANCIES
         # self.check_if_local_backup_matches_synced_log()
 
-        # Load UI configuration file
-        with open(self.config_file_path, "r") as f:
-            self.config_dict = json.load(f)
+        # Init deid log (used columns only, loaded by refresh_deid_log), all column names of the sheet and local mirror
+        self.deid_log = None
+        self.deid_log_columns = []
+        self.invalid_deid_rows = []
+        self.session_index = set()
+        self.deid_log_stamp = None
+
+        # Background prefetches of the selected .mff files, keyed by path
+        self.mff_prefetches = {}
+
+        # Content stores by folder, hash algorithm and read-only setting (see get_content_store)
+        self.content_stores = {}
+
+        # Load file paths, UI and transfer configuration
+        self.refresh_config()
+
+        # Check paths and load deid log, the main window does this on a background thread instead (see DeidLogLoader)
+        if load_deid_log:
+            self.check_file_paths()
+            self.refresh_deid_log()
+
+        # Init per-session state
+        self.clear_session_data()
 
+    def clear_session_data(self):
+        """Reset per-session state"""
         # Notes file path
         self.notes_file = None
 
@@ -882,13 +2706,93 @@ class DataModel:
         # List of dictionaries containing EEG file paradigm and file paths
         self.eeg_file_info = []
 
-        # Init deid log
-        self.deid_log = pd.DataFrame()
-        self.load_deid_log(self.deid_log_filepath)
-
         # DeID for current session
         self.deid = None
 
+        # Transfer stages, .mff copies and photo zip completed for current session (see TransferWorker)
+        self.completed_stages = []
+        self.completed_copies = []
+
+        # Timing of the transfer stages of the current session (staged .mff copies are read from the state folder)
+        self.telemetry = TransferTelemetry(
+            dict(
+                self.filepath_dict,
+                state_dir=os.path.expanduser(self.transfer_config["state_dir"]),
+            )
+        )
+
+        # Prefetches of a session that is not transferred are stopped
+        self.update_mff_prefetches([])
+
+    @staticmethod
+    def get_source_stamp(file_path):
+        """Identify version of a source file by modification time and size, None if it is missing"""
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def source_changed(self, file_path):
+        """Check if a source file changed since it was last loaded"""
+        return (
+            file_path not in self.source_stamps
+            or self.source_stamps[file_path] != self.get_source_stamp(file_path)
+        )
+
+    def refresh_shared_state(self):
+        """Reload file paths, configuration and deid log, but only those whose source file changed"""
+        self.refresh_config()
+        self.refresh_deid_log()
+
+    def refresh_config(self):
+        """Reload file paths, UI and transfer configuration if their config file changed"""
+        app_dir = os.path.dirname(os.path.abspath(__file__))
+        filepath_config_file_path = os.path.join(app_dir, "filepath_config.json")
+        transfer_config_file_path = os.path.join(app_dir, "transfer_config.json")
+
+        # Load file path configuration
+        if self.source_changed(filepath_config_file_path):
+            self.filepath_dict = self.load_file_paths()
+            self.deid_log_filepath = self.filepath_dict["deid_log_filepath"]
+            self.path_status = {}
+            self.source_stamps[filepath_config_file_path] = self.get_source_stamp(
+                filepath_config_file_path
+            )
+
+        # Load UI configuration file
+        if self.source_changed(self.config_file_path):
+            with open(self.config_file_path, "r") as f:
+                self.config_dict = json.load(f)
+            self.field_specs = self.compile_field_specs(self.config_dict)
+            self.source_stamps[self.config_file_path] = self.get_source_stamp(
+                self.config_file_path
+            )
+
+        # Load transfer configuration (copy engine settings)
+        if self.source_changed(transfer_config_file_path):
+            self.transfer_config = self.load_transfer_config()
+            self.deid_log_mirror = DeidLogMirror(
+                os.path.join(
+                    os.path.expanduser(self.transfer_config["state_dir"]),
+                    "deid_log_mirror.sqlite",
+                )
+            )
+            self.source_stamps[transfer_config_file_path] = self.get_source_stamp(
+                transfer_config_file_path
+            )
+
+    def refresh_deid_log(self):
+        """Reload deid log if the workbook changed since it was last loaded, also when its path changed (stamp includes the path)"""
+        if not os.path.exists(self.deid_log_filepath) or (
+            self.deid_log_stamp
+            != DeidLogMirror.get_workbook_stamp(self.deid_log_filepath)
+        ):
+            self.load_deid_log(self.deid_log_filepath)
+            self.deid_log_stamp = DeidLogMirror.get_workbook_stamp(
+                self.deid_log_filepath
+            )
+
     def load_file_paths(self):
         filepath_config_file_path = os.path.join(
             os.path.dirname(os.path.abspath(__file__)), "filepath_config.json"
@@ -897,32 +2801,103 @@ class DataModel:
             with open(filepath_config_file_path, "r") as file:
                 config = json.load(file)
 
-            for key, path in config.items():
-                expanded_path = os.path.expanduser(path)
-
-                # check if path exists
-                if not os.path.exists(expanded_path):
-                    QMessageBox.critical(
-                        None,
-                        "ERROR",
-                        f"Make sure that the following are connected:\n1. USB\n2. External drive\n3. OneDrive\n\nThe following path cannot be found:\n{expanded_path}",
-                    )
-                    sys.exit(1)
-
+            # paths are checked by check_file_paths, probing a sleeping drive can take a while
             expanded_paths = {
                 key: os.path.expanduser(path) for key, path in config.items()
             }
             return expanded_paths
 
         except FileNotFoundError:
-            QMessageBox.critical(
-                None, "Error", f"JSON file not found: {filepath_config_file_path}"
+            raise FileNotFoundError(f"JSON file not found: {filepath_config_file_path}")
+
+    @staticmethod
+    def probe_paths(paths, timeout, slow_callback=None, slow_after=1.0):
+        """Check if paths exist, concurrently and with a timeout.
+        Each path is probed on a daemon thread, so a drive that does not respond cannot block the app.
+        slow_callback is called with the paths still being probed after slow_after seconds.
+        Returns {path: "ok" | "missing" | "timeout"}"""
+        results = {}
+
+        def probe(path):
+            results[path] = "ok" if os.path.exists(path) else "missing"
+
+        threads = {
+            path: threading.Thread(target=probe, args=(path,), daemon=True)
+            for path in paths
+        }
+        deadline = time.monotonic() + timeout
+        for thread in threads.values():
+            thread.start()
+
+        if slow_callback is not None and slow_after < timeout:
+            for thread in threads.values():
+                thread.join(max(0, deadline - timeout + slow_after - time.monotonic()))
+            slow_paths = [path for path, thread in threads.items() if thread.is_alive()]
+            if slow_paths:
+                slow_callback(slow_paths)
+
+        for thread in threads.values():
+            thread.join(max(0, deadline - time.monotonic()))
+        return {path: results.get(path, "timeout") for path in paths}
+
+    def check_file_paths(self, slow_callback=None):
+        """Check that all configured paths are reachable, raise FileNotFoundError listing those that are not.
+        Reachable paths are cached for the session and not probed again."""
+        unchecked_paths = [
+            path
+            for path in self.filepath_dict.values()
+            if self.path_status.get(path) != "ok"
+        ]
+        self.path_status.update(
+            self.probe_paths(
+                unchecked_paths,
+                self.transfer_config["path_probe_timeout"],
+                slow_callback,
             )
-            sys.exit(1)
+        )
+
+        problems = [
+            path + (" (not responding)" if self.path_status[path] == "timeout" else "")
+            for path in self.filepath_dict.values()
+            if self.path_status[path] != "ok"
+        ]
+        if problems:
+            raise FileNotFoundError(
+                "Make sure that the following are connected:\n1. USB\n2. External drive\n3. OneDrive\n\n"
+                "The following paths cannot be found:\n" + "\n".join(problems)
+            )
+
+    @staticmethod
+    def compile_field_specs(config_dict):
+        """Compile validation regex of every validated (non-hidden) field of each preset once:
+        {preset: {field_name: {"pattern": compiled regex, "error_message": str}}}"""
+        return {
+            preset_name: {
+                field_name: {
+                    "pattern": re.compile(field["validation"]),
+                    "error_message": field.get("error_message", "This field is required"),
+                }
+                for field_name, field in preset.items()
+                if field["type"] != "hidden" and "validation" in field
+            }
+            for preset_name, preset in config_dict.items()
+        }
+
+    def load_transfer_config(self):
+        """Load transfer settings from transfer_config.json, falling back to defaults for missing entries"""
+        transfer_config_file_path = os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), "transfer_config.json"
+        )
+        transfer_config = dict(self.TRANSFER_CONFIG_DEFAULTS)
+        if os.path.exists(transfer_config_file_path):
+            with open(transfer_config_file_path, "r") as file:
+                transfer_config.update(json.load(file))
+        return transfer_config
 
     def clear_data(self):
-        """Reset data model"""
-        self.__init__()
+        """Reset data model for the next session, shared state is only reloaded if its source changed"""
+        self.clear_session_data()
+        self.refresh_shared_state()
 
     def get_list_of_current_paradigms(self):
         """Get list of paradigms for current study preset"""
@@ -935,30 +2910,128 @@ class DataModel:
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"Deid log {file_path} does not exist!")
 
-        # load deid log into data model
-        with open(file_path, "rb") as file:
-            self.deid_log = pd.read_excel(file, engine="openpyxl")
+        # use local mirror if the workbook has not changed since it was last parsed
+        if self.deid_log_mirror.is_current(file_path):
+            try:
+                deid_log, self.deid_log_columns = self.deid_log_mirror.load()
+                self.deid_log = self.set_deid_log_dtypes(deid_log)
+                self.build_session_index()
+                return
+            except sqlite3.Error:
+                pass  # fall back to parsing the workbook
 
-        # Filter out rows where first column is NaN (no deid available)
-        first_column = self.deid_log.columns[0]
-        self.deid_log = self.deid_log[self.deid_log[first_column].notna()]
-        self.deid_log.reset_index(drop=True, inplace=True)
+        # load deid log into data model
+        deid_log, self.deid_log_columns = self.read_deid_log_workbook(file_path)
+        self.deid_log = self.set_deid_log_dtypes(deid_log)
+        self.build_session_index()
+
+        # update local mirror for next time
+        self.deid_log_mirror.replace(self.deid_log, self.deid_log_columns, file_path)
+
+    def read_deid_log_workbook(self, file_path):
+        """Stream the deid log sheet (openpyxl read-only mode), keeping only the columns the app reads.
+        Rows without a deid in the first column are skipped.
+        Returns dataframe and the list of all column names of the sheet (needed for writing rows)."""
+        import pandas as pd
+        from openpyxl import load_workbook
+        wb = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            rows = wb.active.iter_rows(values_only=True)
+            sheet_columns = [str(value) for value in next(rows)]
+
+            # deid column plus session columns used for duplicate checks and paradigm counts
+            used_columns = {"Study", "Subject ID", "Visit Num"}
+            used_columns.update(self.PARADIGM_TO_DEID_COLUMN_NAME.values())
+            column_indices = [
+                col_idx
+                for col_idx, col_name in enumerate(sheet_columns)
+                if col_idx == 0 or col_name in used_columns
+            ]
 
-    def save_session_to_deid_log(self):
-        """Get deid and update deid log with current session information"""
+            records = []
+            for sheet_row, row in enumerate(rows, start=2):
+                if not row or row[0] is None:
+                    continue  # no deid available
+                row = tuple(row) + (None,) * (len(sheet_columns) - len(row))
+                in_use = any(value not in (None, "") for value in row[1:])
+                records.append(
+                    [row[col_idx] for col_idx in column_indices] + [in_use, sheet_row]
+                )
+        finally:
+            wb.close()
 
-        # get deid log and determine first empty row
-        df = self.deid_log.copy()
-        empty_row_index = self.get_empty_row_index_from_deid_log()
+        deid_log = pd.DataFrame.from_records(
+            records,
+            columns=[sheet_columns[col_idx] for col_idx in column_indices]
+            + ["_in_use", "_sheet_row"],
+        )
+        return deid_log, sheet_columns
+
+    def set_deid_log_dtypes(self, deid_log):
+        """Convert deid log columns to compact dtypes. Hand-edited cells never stop the log from loading:
+        columns that do not fit keep their values, rows with a deid that is not a whole number are kept in
+        invalid_deid_rows (sheet rows) and only fail once one of them is about to be used (see get_deid)."""
+        import pandas as pd
+        deid_column = deid_log.columns[0]
+        deids = pd.to_numeric(deid_log[deid_column], errors="coerce")
+        invalid_deids = deids.isna() | (deids != deids.round())
+        self.invalid_deid_rows = [int(sheet_row) for sheet_row in deid_log.loc[invalid_deids, "_sheet_row"]]
+        if not self.invalid_deid_rows:
+            deid_log[deid_column] = deids.astype("int32")
+        for col_name in ("Study", "Visit Num"):
+            if col_name in deid_log.columns:
+                deid_log[col_name] = deid_log[col_name].astype("category")
+        for col_name in set(self.PARADIGM_TO_DEID_COLUMN_NAME.values()):
+            if col_name in deid_log.columns:
+                deid_log[col_name] = self.get_compact_counts(deid_log[col_name])
+        deid_log["_in_use"] = deid_log["_in_use"].astype(bool)
+        deid_log["_sheet_row"] = deid_log["_sheet_row"].astype("int32")
+        return deid_log
+
+    @staticmethod
+    def get_compact_counts(column):
+        """Paradigm counts as Int16. Columns with text (e.g. "1 (redo)") stay object, fractions or large numbers float."""
+        import pandas as pd
+        counts = pd.to_numeric(column, errors="coerce")
+        if (counts.isna() & column.notna()).any():
+            return column
+        if (counts.isna() | ((counts == counts.round()) & (counts.abs() < 2**15))).all():
+            return counts.astype("Int16")
+        return counts.astype(float)
+
+    @staticmethod
+    def get_session_key(study, subject_id, visit_number):
+        """Key of a session in the duplicate index, with subject id normalized to a string"""
+        if isinstance(subject_id, float) and subject_id.is_integer():
+            subject_id = int(subject_id)  # numeric cells are read as float
+        return (study, str(subject_id).strip(), visit_number)
+
+    def build_session_index(self):
+        """Build set of (study, subject id, visit) of all used rows for duplicate checks"""
+        used_rows = self.deid_log[self.deid_log["_in_use"]]
+        self.session_index = {
+            self.get_session_key(study, subject_id, visit_number)
+            for study, subject_id, visit_number in zip(
+                used_rows["Study"], used_rows["Subject ID"], used_rows["Visit Num"]
+            )
+        }
 
-        # check if there's rows available
-        if empty_row_index >= len(df):
-            raise Exception("No empty rows available in the CSV")
+    def set_deid_log_value(self, row_index, col_name, value):
+        """Set a single value in the in-memory deid log"""
+        import pandas as pd
+        column = self.deid_log[col_name]
+        if isinstance(column.dtype, pd.CategoricalDtype) and value not in column.cat.categories:
+            self.deid_log[col_name] = column.cat.add_categories([value])
+        elif pd.api.types.is_numeric_dtype(column.dtype) and isinstance(value, str):
+            # e.g. subject ids entered as text into a column read as numbers
+            self.deid_log[col_name] = column.astype(object)
+        self.deid_log.at[row_index, col_name] = value
 
-        # set deid from log
-        self.deid = self.get_deid(empty_row_index)
+    def save_session_to_deid_log(self):
+        """Get deid and update deid log with current session information.
+        The log is reloaded first if the workbook changed since it was loaded (e.g. saved by another workstation)."""
 
-        # Update DataFrame with session info
+        # Session info for the row
         cur_session_data = {
             "Study": self.session_info["study"],
             "Subject ID": self.session_info["subject_id"],
@@ -969,66 +3042,167 @@ class DataModel:
             "Net Serial Number": int(self.session_info["net_serial_number"]),
             "Notes": self.session_info["other_notes"],
         }
-        for key, value in cur_session_data.items():
-            df.at[empty_row_index, key] = value
 
-        # Add paradigms
+        # Add paradigms (count of files per paradigm column, row is empty so counts start at 0)
         file_names_list = []
         for eeg_file_dict in self.eeg_file_info:
             cur_paradigm = eeg_file_dict["paradigm"]
             column_name = self.PARADIGM_TO_DEID_COLUMN_NAME.get(cur_paradigm, None)
             if column_name:
-                if pd.isna(df.at[empty_row_index, column_name]):
-                    df.at[empty_row_index, column_name] = 1
-                else:
-                    df.at[empty_row_index, column_name] += 1
+                cur_session_data[column_name] = cur_session_data.get(column_name, 0) + 1
             if "mff_file" in eeg_file_dict:
                 file_names_list.append(os.path.basename(eeg_file_dict["mff_file"]))
 
         # Join collected file names into a semicolon-separated string
-        df.at[empty_row_index, "original_file_names"] = ";".join(file_names_list)
+        cur_session_data["original_file_names"] = ";".join(file_names_list)
+
+        # Pick the first empty row of the workbook as it is now and patch it (only at that row).
+        # If the workbook changes meanwhile or the row was already filled, the log is reloaded and the row picked again.
+        for _ in range(self.DEID_LOG_SAVE_ATTEMPTS):
+            self.refresh_deid_log()
+            loaded_stamp = self.deid_log_stamp
+
+            for col_name in cur_session_data:
+                if col_name not in self.deid_log_columns:
+                    raise ValueError(f"Column '{col_name}' not found in deid log")
+
+            # determine first empty row and get deid from log
+            empty_row_index = self.get_empty_row_index_from_deid_log()
+            deid = self.get_deid(empty_row_index)
+
+            sheet_row = int(self.deid_log.at[empty_row_index, "_sheet_row"])
+            row_values = {
+                self.deid_log_columns.index(col_name) + 1: value
+                for col_name, value in cur_session_data.items()
+            }
+            number_formats = {self.deid_log_columns.index("Visit Date") + 1: "MM/DD/YYYY"}
+            start = time.perf_counter()
+            try:
+                try:
+                    workbook_data = XlsxRowPatcher.patch_row(
+                        self.deid_log_filepath, sheet_row, row_values, number_formats
+                    )
+                except XlsxPatchError:
+                    # unexpected package layout, do a full round trip with openpyxl instead
+                    workbook_data = self.render_deid_log_row_with_openpyxl(
+                        sheet_row, row_values, number_formats
+                    )
+            except XlsxRowInUseError:
+                # the mirror or the loaded log missed a row saved elsewhere, parse the workbook again
+                self.deid_log_mirror.invalidate()
+                self.deid_log_stamp = None
+                continue
+            self.telemetry.record_io(
+                "read",
+                self.deid_log_filepath,
+                os.path.getsize(self.deid_log_filepath),
+                time.perf_counter() - start,
+            )
+
+            # the patched workbook is only published if it is based on the version the row was picked from
+            if DeidLogMirror.get_workbook_stamp(self.deid_log_filepath) == loaded_stamp:
+                break
+        else:
+            raise RuntimeError(
+                "The DeID log kept changing while the session was saved (or has no usable empty row). Try again."
+            )
 
-        # Update work book (only at specified row)
+        # Publish the workbook with the updated row, then a second copy as a backup
+        for file_path in (
+            self.deid_log_filepath,
+            self.filepath_dict["deid_log_local_backup_filepath"],
+        ):
+            start = time.perf_counter()
+            self.publish_file(file_path, workbook_data)
+            self.telemetry.record_io(
+                "write", file_path, len(workbook_data), time.perf_counter() - start
+            )
+
+        # keep in-memory log and local mirror in sync with the saved row
+        cur_row_data = {
+            col_name: value
+            for col_name, value in cur_session_data.items()
+            if col_name in self.deid_log.columns
+        }
+        cur_row_data["_in_use"] = True
+        for col_name, value in cur_row_data.items():
+            self.set_deid_log_value(empty_row_index, col_name, value)
+        # the published workbook is the loaded one plus this row, so the mirror is current with it
+        self.deid_log_mirror.update_row(
+            empty_row_index, cur_row_data, self.deid_log_filepath
+        )
+        self.deid_log_stamp = DeidLogMirror.get_workbook_stamp(self.deid_log_filepath)
+        self.session_index.add(
+            self.get_session_key(
+                cur_session_data["Study"],
+                cur_session_data["Subject ID"],
+                cur_session_data["Visit Num"],
+            )
+        )
+
+        # set deid once the log has been saved
+        self.deid = deid
+
+    @staticmethod
+    def publish_file(file_path, data):
+        """Write data to a temp file next to file_path and atomically rename it into place,
+        so OneDrive never syncs a half-written file"""
+        directory, name = os.path.split(os.path.abspath(file_path))
+        # "~$" prefix and ".tmp" suffix are skipped by OneDrive sync
+        tmp_path = os.path.join(directory, f"~${name}.tmp")
+        try:
+            with open(tmp_path, "wb") as file:
+                file.write(data)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def render_deid_log_row_with_openpyxl(self, sheet_row, row_values, number_formats):
+        """Load the whole workbook, set one row and return the saved workbook as bytes"""
+        from openpyxl import load_workbook
         wb = load_workbook(self.deid_log_filepath)
         sheet = wb.active
 
         sheet.protection.disable()
 
-        for col_idx, col_name in enumerate(df.columns, start=1):
-            if col_idx == 1:
-                continue
-            cell = sheet.cell(row=empty_row_index + 2, column=col_idx)  # get cell
-            cell.value = df.at[empty_row_index, col_name]  # set cell value
-            if col_name == "Visit Date":
-                cell.number_format = "MM/DD/YYYY"
-
-        sheet.protection.enable()
+        filled = [
+            col_idx for col_idx in row_values
+            if sheet.cell(row=sheet_row, column=col_idx).value not in (None, "")
+        ]
+        if filled:
+            raise XlsxRowInUseError(f"Row {sheet_row} is not empty")
 
-        # Save the workbook with the updated row
-        wb.save(self.deid_log_filepath)
+        for col_idx, value in row_values.items():
+            cell = sheet.cell(row=sheet_row, column=col_idx)  # get cell
+            cell.value = value  # set cell value
+            if col_idx in number_formats:
+                cell.number_format = number_formats[col_idx]
 
-        # Save a second copy of the workbook as a backup
-        wb.save(self.filepath_dict["deid_log_local_backup_filepath"])
+        sheet.protection.enable()
 
+        workbook_data = io.BytesIO()
+        wb.save(workbook_data)
         wb.close()
+        return workbook_data.getvalue()
 
     def check_if_session_info_already_exists(self):
-        """Check if a row with the same session data already exists in the DataFrame"""
-
-        # Vectorized comparison for better performance
-        mask = (
-            (self.deid_log["Study"] == self.session_info["study"])
-            & (
-                self.deid_log["Subject ID"].astype(str)
-                == str(self.session_info["subject_id"])
+        """Check if a row with the same session data already exists in the deid log"""
+        return (
+            self.get_session_key(
+                self.session_info["study"],
+                self.session_info["subject_id"],
+                self.session_info["visit_number"],
             )
-            & (self.deid_log["Visit Num"] == self.session_info["visit_number"])
+            in self.session_index
         )
 
-        return mask.any()
-
     def check_if_local_backup_matches_synced_log(self):
         """Check if local copy matches synced copy to ensure there are no conflicts"""
+        import pandas as pd
 
         df1 = pd.read_excel(self.filepath_dict["deid_log_filepath"])[
             ["Study", "Subject ID", "Visit Num"]
@@ -1038,23 +3212,26 @@ class DataModel:
         ]
 
         if not df1.equals(df2):
-            QMessageBox.critical(
-                None,
-                "ERROR",
-                f"OneDrive Sync Error! Local copy does not match synced deid log. PANIC!!!",
+            raise RuntimeError(
+                "OneDrive Sync Error! Local copy does not match synced deid log. PANIC!!!"
             )
-            sys.exit(1)
 
     def get_empty_row_index_from_deid_log(self):
         """Find the index of the first completely empty row (ignoring the first column)"""
-        empty_rows = self.deid_log.loc[:, self.deid_log.columns[1:]].isna().all(axis=1)
-        if not empty_rows.any():
+        empty_row_index = self.deid_log_mirror.get_empty_row_index()
+        if empty_row_index is None:
             raise ValueError("No available rows in deid log, run out of deids.")
-        return empty_rows.idxmax()
+        return empty_row_index
 
     def get_deid(self, row):
         """Get deid from deid log, given a row index"""
-        return self.deid_log.at[row, self.deid_log.columns[0]]
+        sheet_row = int(self.deid_log.at[row, "_sheet_row"])
+        if sheet_row in self.invalid_deid_rows:
+            raise ValueError(
+                f"DeID '{self.deid_log.at[row, self.deid_log.columns[0]]}' in row {sheet_row} of the deid log "
+                "is not a number, correct it in the workbook."
+            )
+        return int(self.deid_log.at[row, self.deid_log.columns[0]])
 
     def generate_base_name(self, paradigm, audio_source="", counter=""):
         """Generate base file name with all necessary data."""
@@ -1072,68 +3249,221 @@ class DataModel:
     def check_file_exists(self, path):
         """Check if a file exists and raise an error if it does."""
         if os.path.exists(path):
-            QMessageBox.critical(
-                None,
-                "ERROR",
-                f"File '{path}' already exists. Check that you entered the session info correctly!",
+            raise FileExistsError(
+                f"File '{path}' already exists. Check that you entered the session info correctly!"
             )
-            raise FileExistsError(f"File '{path}' already exists.")
 
-    def copy_and_rename_files(self):
-        paradigm_counter = {}
-        destination_folder = self.filepath_dict["mff_backup_dir"]
-        dat = self.session_info
-
-        for cur_file_info in self.eeg_file_info:
-            src_path = cur_file_info["mff_file"]
-
-            # Skip files if paths are missing
-            if not src_path:
-                continue
-
-            paradigm = cur_file_info["paradigm"]
-
-            # update counter for paradigm
-            counter = paradigm_counter.get(paradigm, 0) + 1
-            paradigm_counter[paradigm] = counter
+    @staticmethod
+    def get_size(path, exclude=()):
+        """Get size of a file or of all files in a directory, skipping file names matching the exclude patterns"""
+        if os.path.isdir(path):
+            return sum(
+                os.path.getsize(os.path.join(dirpath, file_name))
+                for dirpath, _, file_names in os.walk(path)
+                for file_name in file_names
+                if not MffCopyEngine.is_excluded(file_name, exclude)
+            )
+        return os.path.getsize(path)
 
-            # gemerate base name
-            counter_str = "" if counter == 1 else str(counter)
-            base_name = self.generate_base_name(paradigm, cur_file_info['audio_source'], counter_str)
+    def get_mff_transfer_bytes(self, mff_file):
+        """Bytes copied for an .mff file: the full backup copy and the deid copy without excluded files"""
+        return self.get_size(mff_file) + self.get_size(
+            mff_file, self.transfer_config["deid_exclude"]
+        )
 
-            final_directory_path = os.path.join(
-                destination_folder,
-                dat["study"],
-                f"{dat['subject_id']} {dat['subject_initials']}",
-                dat["visit_number"],
+    def get_total_transfer_bytes(self):
+        """Total number of bytes copied by the transfer stages, used for progress reporting"""
+        get_size = self.get_size
+        total_bytes = 0
+        if "mff_files" not in self.completed_stages:
+            # mff files are copied to both backup and deid folders
+            total_bytes += sum(
+                self.get_mff_transfer_bytes(cur_file_info["mff_file"])
+                for cur_file_info in self.eeg_file_info
+                if cur_file_info["mff_file"]
             )
-            os.makedirs(final_directory_path, exist_ok=True)
-
-            # Create destination paths
-            dst_path = os.path.join(final_directory_path, base_name + ".mff")
+            total_bytes += get_size(self.notes_file)
+        if "deid_notes" not in self.completed_stages:
+            total_bytes += get_size(self.notes_file)
+        if "photos" not in self.completed_stages:
+            total_bytes += sum(
+                get_size(image) for image in self.net_placement_photos or []
+            )
+        return total_bytes
+
+    def copy_with_progress(self, progress_callback=None):
+        """Get copy function for shutil that reports copied bytes to the progress callback"""
+
+        def copy_function(src, dst):
+            start = time.perf_counter()
+            dst = shutil.copy2(src, dst)
+            seconds = time.perf_counter() - start
+            size = os.path.getsize(src)
+            self.telemetry.record_io("read", src, size, seconds)
+            self.telemetry.record_io("write", dst, size, seconds)
+            if progress_callback:
+                progress_callback(size)
+            return dst
+
+        return copy_function
+
+    def save_session(self):
+        """Save session to the deid log, allocating its deid, and journal it. The remaining stages are run by run_transfer."""
+        try:
+            with self.telemetry.stage("deid_log"):
+                self.save_session_to_deid_log()
+        except Exception:
+            self.save_telemetry()
+            raise
+        self.completed_stages.append("deid_log")
+        self.save_transfer_journal()
+
+    def detach_session(self):
+        """Copy of the data model holding the current session, so it can be transferred in the background
+        while this data model is reset for the next session. Shared state (paths, config, deid log) is not copied."""
+        session_model = copy.copy(self)
+        # the deid log is only used on this (the GUI) thread, the session was already saved to it (see save_session)
+        session_model.deid_log = None
+        session_model.deid_log_mirror = None
+        session_model.session_index = set()
+        session_model.deid_log_stamp = None
+        # prefetches of the .mff files now belong to the detached session
+        self.mff_prefetches = {}
+        self.clear_session_data()
+        return session_model
+
+    def run_transfer(self, stage_callback, progress_callback):
+        """Run the transfer stages of the current session that are not completed yet.
+        The session must be saved to the deid log first (see save_session), on the thread that owns the deid log;
+        run_transfer only copies files, so it can run on a worker thread.
+        stage_callback is called with the name of each stage, progress_callback with the number of bytes copied.
+        The telemetry of the session is saved once all stages are done or one of them failed."""
+        if "deid_log" not in self.completed_stages:
+            raise RuntimeError("The session must be saved to the DeID log before its files are transferred")
+
+        def stage_progress_callback(num_bytes):
+            self.telemetry.add_bytes(num_bytes)
+            progress_callback(num_bytes)
+
+        stages = [
+            (
+                "mff_files",
+                "Copying .mff files to backup and DeID folders",
+                lambda: self.copy_and_rename_files(stage_progress_callback),
+            ),
+            (
+                "deid_notes",
+                "Saving DeID notes",
+                lambda: self.save_deid_files(stage_progress_callback),
+            ),
+            (
+                "photos",
+                "Zipping net placement photos",
+                lambda: self.save_net_placement_photos(stage_progress_callback),
+            ),
+        ]
+        try:
+            for stage_key, stage_name, stage in stages:
+                # skip stages completed before the transfer was interrupted
+                if stage_key in self.completed_stages:
+                    continue
+                stage_callback(stage_name)
+                with self.telemetry.stage(stage_key):
+                    stage()
+
+                # journal progress so the transfer can be resumed after a crash
+                self.completed_stages.append(stage_key)
+                self.save_transfer_journal()
+            self.remove_transfer_journal()
+        finally:
+            self.update_mff_prefetches([])
+            self.save_telemetry()
+
+    def save_telemetry(self):
+        """Append the stage timings of the current session to the telemetry log in the local state folder.
+        Telemetry is never worth failing a transfer for, so errors are only printed."""
+        record = {
+            "deid": None if self.deid is None else int(self.deid),
+            "study": self.session_info["study"],
+            "host": platform.node(),
+            "mff_files": sum(1 for file_info in self.eeg_file_info if file_info["mff_file"]),
+            "photos": len(self.net_placement_photos or []),
+            "copy_workers": self.transfer_config["copy_workers"],
+            **self.telemetry.get_record(),
+        }
+        try:
+            TransferTelemetry.append_to_log(
+                os.path.join(
+                    os.path.expanduser(self.transfer_config["state_dir"]),
+                    "telemetry.jsonl",
+                ),
+                record,
+                self.transfer_config["telemetry_max_bytes"],
+                self.transfer_config["telemetry_backup_count"],
+            )
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Could not save transfer telemetry: {e}")
 
-            # Check if files already exist
-            self.check_file_exists(dst_path)
+    def get_backup_directory_path(self):
+        """Get session folder in the backup directory (study/subject/visit)"""
+        dat = self.session_info
+        return os.path.join(
+            self.filepath_dict["mff_backup_dir"],
+            dat["study"],
+            f"{dat['subject_id']} {dat['subject_initials']}",
+            dat["visit_number"],
+        )
 
-            # Copy files
-            shutil.copytree(src_path, dst_path)
+    def update_mff_prefetches(self, mff_files):
+        """Prefetch the selected .mff files in the background (see MffPrefetch).
+        Prefetches of files that are no longer selected are cancelled and their staged copies deleted."""
+        for mff_file in list(self.mff_prefetches):
+            if mff_file not in mff_files:
+                self.mff_prefetches.pop(mff_file).cancel()
+        if not self.transfer_config["prefetch_mff"]:
+            return
+        for mff_file in mff_files:
+            if mff_file in self.mff_prefetches:
+                continue
+            staging_path = None
+            if self.transfer_config["prefetch_stage_locally"]:
+                prefetch_dir = os.path.join(
+                    os.path.expanduser(self.transfer_config["state_dir"]), "prefetch"
+                )
+                os.makedirs(prefetch_dir, exist_ok=True)
+                staging_path = os.path.join(
+                    tempfile.mkdtemp(dir=prefetch_dir), os.path.basename(mff_file)
+                )
+            self.mff_prefetches[mff_file] = MffPrefetch(
+                mff_file, self.transfer_config["hash_algorithm"], staging_path
+            )
 
-        # Save notes file
-        new_notes_file_name = (
-            f"{dat['study']}_{dat['visit_number']}_{dat['subject_id']}_{dat['subject_initials']}_{dat['date']}"
-            + os.path.splitext(self.notes_file)[1]
-        )
-        shutil.copy2(
-            self.notes_file, os.path.join(final_directory_path, new_notes_file_name)
+    def get_content_store(self):
+        """Content store the copies are deduplicated with, None if dedup_store_dir is not configured"""
+        if not self.transfer_config["dedup_store_dir"]:
+            return None
+        store_dir = os.path.expanduser(self.transfer_config["dedup_store_dir"])
+        key = (store_dir, self.transfer_config["hash_algorithm"], self.transfer_config["dedup_read_only"])
+        # one store (and lock) for all sessions, also those transferred in the background (see detach_session)
+        if key not in self.content_stores:
+            self.content_stores.setdefault(key, ContentStore(*key))
+        return self.content_stores[key]
+
+    def remove_prefetch_staging(self):
+        """Delete staged copies left behind by prefetches of an earlier run of the app"""
+        shutil.rmtree(
+            os.path.join(os.path.expanduser(self.transfer_config["state_dir"]), "prefetch"),
+            ignore_errors=True,
         )
 
-    def save_deid_files(self):
-        destination_folder = self.filepath_dict["mff_deid_dir"]
+    def get_mff_transfer_plan(self):
+        """Get source and destination paths (backup and deid) for every .mff file in the session"""
         paradigm_counter = {}
+        transfer_plan = []
 
         for cur_file_info in self.eeg_file_info:
             src_path = cur_file_info["mff_file"]
-            audio_source = cur_file_info['audio_source']
+            audio_source = cur_file_info["audio_source"]
 
             # Skip files if paths are missing
             if not src_path:
@@ -1144,113 +3474,351 @@ class DataModel:
             # update counter for paradigm
             counter = paradigm_counter.get(paradigm, 0) + 1
             paradigm_counter[paradigm] = counter
-
-            # generate base name
             counter_str = "" if counter == 1 else str(counter)
-            base_name = f"{self.deid:04}_{paradigm}{counter_str}"
 
+            # generate backup base name
+            base_name = self.generate_base_name(paradigm, audio_source, counter_str)
+
+            # generate deid base name
+            deid_base_name = f"{self.deid:04}_{paradigm}{counter_str}"
             if self.session_info.get("cap_type") == "babycap":
-                base_name += "_babycap"
+                deid_base_name += "_babycap"
             if audio_source == "speakers":
-                base_name += "_speakers"
+                deid_base_name += "_speakers"
 
-            dst_path_deid = os.path.join(
-                destination_folder, paradigm, base_name + ".mff"
+            transfer_plan.append(
+                {
+                    "mff_file": src_path,
+                    "backup_path": os.path.join(
+                        self.get_backup_directory_path(), base_name + ".mff"
+                    ),
+                    "deid_path": os.path.join(
+                        self.filepath_dict["mff_deid_dir"],
+                        paradigm,
+                        deid_base_name + ".mff",
+                    ),
+                    "deid_base_name": deid_base_name,
+                }
             )
 
-            # check that you're not overwriting any files
-            self.check_file_exists(dst_path_deid)
+        return transfer_plan
 
-            # copy deidentified files
-            shutil.copytree(src_path, dst_path_deid)
+    def copy_and_rename_files(self, progress_callback=None):
+        """Copy every .mff file to the backup and deid folders, reading each source file only once"""
+        dat = self.session_info
+        transfer_plan = self.get_mff_transfer_plan()
+
+        # Skip copies completed before the transfer was interrupted
+        remaining_transfers = []
+        for transfer in transfer_plan:
+            if transfer["backup_path"] in self.completed_copies:
+                # journals are left behind if the transfer was interrupted right after recording the copy
+                MffCopyEngine.remove_journal(transfer["backup_path"])
+                MffCopyEngine.remove_journal(transfer["deid_path"])
+                if progress_callback:
+                    progress_callback(self.get_mff_transfer_bytes(transfer["mff_file"]))
+            else:
+                remaining_transfers.append(transfer)
 
-            # deidentify mff files (remove video and original file name)
+        # Check that you're not overwriting any files before copying anything
+        # (partial copies left by an interrupted transfer are resumed)
+        for transfer in remaining_transfers:
+            for dst_path in (transfer["backup_path"], transfer["deid_path"]):
+                if not MffCopyEngine.is_partial(dst_path):
+                    self.check_file_exists(dst_path)
+                    self.check_file_exists(MffCopyEngine.get_manifest_path(dst_path))
 
-            # try:
-            #     self.deidentify_mff(
-            #         mff_file_path = dst_path_deid,
-            #         original_filename = os.path.splitext(os.path.basename(src_path))[0],
-            #         new_filename = base_name
-            #     )
-            # except Exception as error:
-            #     print("PANIC")
+        final_directory_path = self.get_backup_directory_path()
+        os.makedirs(final_directory_path, exist_ok=True)
+
+        # Use finished prefetches, stop the others so they do not compete with the copies for the drive
+        prefetches = {}
+        for mff_file, prefetch in list(self.mff_prefetches.items()):
+            if prefetch.is_ready():
+                prefetches[mff_file] = prefetch
+            else:
+                self.mff_prefetches.pop(mff_file).cancel()
+
+        # Deduplicate destinations on the filesystem of the content store
+        store = self.get_content_store()
+
+        def get_store_options(dst_path):
+            return {"store": store} if store and store.can_link(dst_path) else {}
+
+        # Copy files to all destinations
+        copy_engine = MffCopyEngine(
+            progress_callback,
+            max_workers=self.transfer_config["copy_workers"],
+            hash_algorithm=self.transfer_config["hash_algorithm"],
+            io_callback=self.telemetry.record_io,
+        )
+        for transfer in remaining_transfers:
+            src_dir = transfer["mff_file"]
+            known_digests = None
+            prefetch = prefetches.get(transfer["mff_file"])
+            if prefetch and prefetch.hash_algorithm == self.transfer_config["hash_algorithm"]:
+                # the bundle did not change since it was hashed, the staged copy holds exactly the hashed bytes
+                known_digests = prefetch.get_digests()
+                if prefetch.staged:
+                    src_dir = prefetch.staging_path
+            copy_engine.copy_tree(
+                src_dir,
+                [transfer["backup_path"], transfer["deid_path"]],
+                dst_options={
+                    transfer["backup_path"]: get_store_options(transfer["backup_path"]),
+                    # participant videos are never copied to the deid folder
+                    transfer["deid_path"]: {
+                        **get_store_options(transfer["deid_path"]),
+                        "allow_hardlinks": self.transfer_config["allow_hardlinks"],
+                        "exclude": self.transfer_config["deid_exclude"],
+                        **(
+                            self.get_deidentify_options(transfer)
+                            if self.transfer_config["deidentify_mff"]
+                            else {}
+                        ),
+                    }
+                },
+                known_digests=known_digests,
+                keep_journals=True,
+            )
+            # the destinations stay resumable until the session journal records the copy
+            self.completed_copies.append(transfer["backup_path"])
+            self.save_transfer_journal()
+            MffCopyEngine.remove_journal(transfer["backup_path"])
+            MffCopyEngine.remove_journal(transfer["deid_path"])
+
+        # Save notes file
+        new_notes_file_name = (
+            f"{dat['study']}_{dat['visit_number']}_{dat['subject_id']}_{dat['subject_initials']}_{dat['date']}"
+            + os.path.splitext(self.notes_file)[1]
+        )
+        self.copy_with_progress(progress_callback)(
+            self.notes_file, os.path.join(final_directory_path, new_notes_file_name)
+        )
+
+    def save_deid_files(self, progress_callback=None):
+        """Save deid notes file. The .mff files are copied to the deid folder by copy_and_rename_files"""
+        destination_folder = self.filepath_dict["mff_deid_dir"]
+
+        # mff files are deidentified while they are copied (see get_deidentify_options)
 
         # Save notes file
         new_notes_file_name = (
             f"{self.deid:04}_notes" + os.path.splitext(self.notes_file)[1]
         )
-        shutil.copy2(
+        self.copy_with_progress(progress_callback)(
             self.notes_file, os.path.join(destination_folder, new_notes_file_name)
         )
 
-    def save_net_placement_photos(self):
+    def save_net_placement_photos(self, progress_callback=None):
         if not self.net_placement_photos:
             return
 
-        destination_folder = self.filepath_dict["net_placement_photo_dir"]
-        dat = self.session_info
-        paradigm = "netplacementphotos"
+        dst_path_zip = self.get_photo_zip_path()
+
+        # zip is written under a temporary name so an interrupted transfer never leaves a partial zip
+        partial_path_zip = dst_path_zip + ".partial"
 
-        base_name = self.generate_base_name(paradigm)
-        dst_path_zip = os.path.join(destination_folder, base_name + ".zip")
+        # zip completed before the transfer was interrupted, possibly before it got its final name
+        if dst_path_zip in self.completed_copies:
+            if os.path.exists(partial_path_zip):
+                os.replace(partial_path_zip, dst_path_zip)
+            if os.path.exists(dst_path_zip):
+                return
 
         self.check_file_exists(dst_path_zip)
 
         try:
-            with ZipFile(dst_path_zip, "w") as zip_file:
-                for image in self.net_placement_photos:
-                    zip_file.write(image, os.path.basename(image))
+            PhotoZipPacker(
+                progress_callback,
+                max_workers=self.transfer_config["copy_workers"],
+                io_callback=self.telemetry.record_io,
+            ).pack(self.net_placement_photos, partial_path_zip)
+            # the zip is journaled before it gets its final name, so a resumed transfer finds it complete
+            if dst_path_zip not in self.completed_copies:
+                self.completed_copies.append(dst_path_zip)
+            self.save_transfer_journal()
+            os.replace(partial_path_zip, dst_path_zip)
         except Exception as e:
-            QMessageBox.critical(
-                None, "ERROR", f"Error zipping net placement photos:\n{str(e)}"
-            )
-            sys.exit(1)
+            raise RuntimeError(f"Error zipping net placement photos:\n{str(e)}") from e
 
-    def deidentify_mff(mff_file_path, original_filename, new_filename):
+    def get_photo_zip_path(self):
+        """Get path of the net placement photo zip for the current session"""
+        base_name = self.generate_base_name("netplacementphotos")
+        return os.path.join(
+            self.filepath_dict["net_placement_photo_dir"], base_name + ".zip"
+        )
 
-        # List of files to deidentify within the .MFF directory
-        files_to_deidentify = [
-            "hostTimes.xml",
-            "movieSyncs1.xml",
-            "subject.xml",
-            "techNote.rtf",
-        ]
-        # Loop through each file and apply deidentification
-        for file_name in files_to_deidentify:
-            file_path = os.path.join(mff_file_path, file_name)
+    #################################################
+    ############### TRANSFER JOURNAL ################
+    #################################################
 
-            # Check if file exists
-            if not os.path.exists(file_path):
-                print(f"File not found: {file_path}")
-                return
+    def get_transfer_journal_path(self, deid=None):
+        """Journal of the current (or given) session's transfer, saved in the local state folder"""
+        if deid is None:
+            deid = self.deid
+        return os.path.join(
+            os.path.expanduser(self.transfer_config["state_dir"]),
+            "pending_transfers",
+            f"{int(deid):04}.json",
+        )
 
-            # Read the file as text
-            with open(file_path, "r", encoding="utf-8") as file:
-                file_content = file.read()
-            # Replace old file name with the deidentified file name
-            file_content = file_content.replace(original_filename, new_filename)
-            # Replace old ID with deidentified ID
-            original_id = original_filename.rsplit("_", 2)[0]
-            file_content = file_content.replace(original_id, new_filename)
-            # Write the deidentified content back to the file
-            with open(file_path, "w", encoding="utf-8") as file:
-                file.write(file_content)
-
-        # Loop through files
-        for cur_file in os.listdir(mff_file_path):
-
-            # Remove participant video .mov files
-            if cur_file.endswith(".mov"):
-                movie_file_path = os.path.join(mff_file_path, cur_file)
-                os.remove(movie_file_path)
-            # Rename log file
-            if original_filename in cur_file and cur_file.endswith(".txt"):
-                os.rename(
-                    os.path.join(mff_file_path, cur_file),
-                    os.path.join(
-                        mff_file_path, cur_file.replace(original_filename, new_filename)
-                    ),
-                )
+    def save_transfer_journal(self):
+        """Record session information and completed transfer stages so an interrupted transfer can be resumed"""
+        journal = {
+            "deid": int(self.deid),
+            "session_info": self.session_info,
+            "eeg_file_info": self.eeg_file_info,
+            "notes_file": self.notes_file,
+            "net_placement_photos": self.net_placement_photos,
+            "completed_stages": self.completed_stages,
+            "completed_copies": self.completed_copies,
+            "transfer_plan": self.get_mff_transfer_plan(),
+            "photo_zip_path": (
+                self.get_photo_zip_path() if self.net_placement_photos else None
+            ),
+            "updated": datetime.now().isoformat(),
+        }
+        journal_path = self.get_transfer_journal_path()
+        os.makedirs(os.path.dirname(journal_path), exist_ok=True)
+        with open(journal_path + ".tmp", "w") as outfile:
+            json.dump(journal, outfile, indent=4)
+        os.replace(journal_path + ".tmp", journal_path)
+
+    def remove_transfer_journal(self):
+        """Remove the journal once the current session's transfer is complete"""
+        journal_path = self.get_transfer_journal_path()
+        if os.path.exists(journal_path):
+            os.remove(journal_path)
+
+    def load_pending_transfers(self):
+        """Get journals of transfers that were interrupted before completing"""
+        journal_dir = os.path.join(
+            os.path.expanduser(self.transfer_config["state_dir"]), "pending_transfers"
+        )
+        if not os.path.isdir(journal_dir):
+            return []
+        pending_transfers = []
+        for file_name in sorted(os.listdir(journal_dir)):
+            if file_name.endswith(".json"):
+                with open(os.path.join(journal_dir, file_name), "r") as file:
+                    pending_transfers.append(json.load(file))
+        return pending_transfers
+
+    def restore_pending_transfer(self, journal):
+        """Load session from a transfer journal so the remaining transfer stages can be resumed"""
+        self.deid = journal["deid"]
+        self.session_info = journal["session_info"]
+        self.eeg_file_info = journal["eeg_file_info"]
+        self.notes_file = journal["notes_file"]
+        self.net_placement_photos = journal["net_placement_photos"]
+        self.completed_stages = journal["completed_stages"]
+        self.completed_copies = journal["completed_copies"]
+        self.telemetry.resumed = True
+
+    def load_session(self, session):
+        """Load session and file information given outside the GUI (see BatchIngest).
+        Session fields that are not given get the value the session form starts with."""
+        study = str(session["session_info"].get("study", ""))
+        preset = self.config_dict.get(study, {})
+        for key in self.session_info:
+            value = session["session_info"].get(key)
+            if value in (None, "") and key in preset:
+                if preset[key]["type"] == "combo":
+                    value = preset[key]["options"][0]
+                else:
+                    value = preset[key].get("default", "")
+            self.session_info[key] = "" if value is None else str(value)
+        self.eeg_file_info = [
+            {
+                "paradigm": file_info.get("paradigm", ""),
+                "audio_source": file_info.get("audio_source", "none"),
+                "mff_file": file_info.get("mff_file"),
+            }
+            for file_info in session["eeg_file_info"]
+        ]
+        self.notes_file = session.get("notes_file")
+        self.net_placement_photos = session.get("net_placement_photos") or []
+
+    def validate_session(self):
+        """Check session and file information against ui_config.json and the file system, like the GUI forms do.
+        Raises ValueError listing all problems."""
+        problems = []
+        study = self.session_info["study"]
+        if study not in self.config_dict:
+            raise ValueError(f"Unknown study preset: {study!r}")
+
+        # session fields, same checks as SessionInfoForm
+        preset = self.config_dict[study]
+        for field_name, field_spec in self.field_specs[study].items():
+            value = self.session_info.get(field_name, "")
+            if field_spec["pattern"].match(value) is None:
+                problems.append(f"{field_name} {value!r}: {field_spec['error_message']}")
+            elif preset[field_name]["type"] == "combo" and value not in preset[field_name]["options"]:
+                problems.append(f"{field_name} {value!r} is not one of the options")
+            elif preset[field_name]["type"] == "date":
+                try:
+                    datetime.strptime(value, "%m-%d-%Y")
+                except ValueError:
+                    problems.append(f"{field_name} {value!r} is not a valid MM-DD-YYYY date")
+
+        # files, same checks as FileInputForm
+        if not self.eeg_file_info:
+            problems.append("No .mff files given")
+        paradigms = self.get_list_of_current_paradigms()[1:]  # first option is the empty placeholder
+        for file_info in self.eeg_file_info:
+            if file_info["paradigm"] not in paradigms:
+                problems.append(f"Unknown paradigm {file_info['paradigm']!r}")
+            if file_info["audio_source"] not in self.AUDIO_SOURCES:
+                problems.append(f"Unknown audio source {file_info['audio_source']!r}")
+            mff_file = file_info["mff_file"]
+            if not mff_file or not mff_file.endswith(".mff") or not os.path.isdir(mff_file):
+                problems.append(f"Not a .mff folder: {mff_file}")
+        if not self.notes_file or not os.path.isfile(self.notes_file):
+            problems.append(f"Notes file not found: {self.notes_file}")
+        for photo in self.net_placement_photos:
+            if not os.path.isfile(photo):
+                problems.append(f"Photo not found: {photo}")
+
+        if problems:
+            raise ValueError("\n".join(problems))
+
+    def discard_pending_transfer(self, journal):
+        """Remove partial copies left by an interrupted transfer and forget it. Completed copies are kept."""
+        for transfer in journal["transfer_plan"]:
+            MffCopyEngine.remove_partial(transfer["backup_path"])
+            MffCopyEngine.remove_partial(transfer["deid_path"])
+        if journal["photo_zip_path"] and os.path.exists(
+            journal["photo_zip_path"] + ".partial"
+        ):
+            if journal["photo_zip_path"] in journal["completed_copies"]:
+                os.replace(journal["photo_zip_path"] + ".partial", journal["photo_zip_path"])
+            else:
+                os.remove(journal["photo_zip_path"] + ".partial")
+        os.remove(self.get_transfer_journal_path(journal["deid"]))
+
+    def get_deidentify_options(self, transfer):
+        """Copy options (see MffCopyEngine.copy_tree) that deidentify the deid copy of an .mff file while it is copied.
+        Original file name and participant id are replaced by the deid base name in FILES_TO_DEIDENTIFY
+        (files that are missing are skipped) and log files named after the original file are renamed."""
+        original_filename = os.path.splitext(
+            os.path.basename(os.path.normpath(transfer["mff_file"]))
+        )[0]
+        new_filename = transfer["deid_base_name"]
+        original_id = original_filename.rsplit("_", 2)[0]
+        return {
+            "rewrite_files": self.FILES_TO_DEIDENTIFY,
+            "replacements": {
+                old: new_filename for old in (original_filename, original_id) if old
+            },
+            "renamed_files": {
+                file_name: file_name.replace(original_filename, new_filename)
+                for file_name in os.listdir(transfer["mff_file"])
+                if original_filename
+                and original_filename in file_name
+                and file_name.endswith(".txt")
+            },
+        }
 
     #################################################
     ############## SAVING SIDECAR JSON ##############
@@ -1258,6 +3826,7 @@ class DataModel:
 
     def save_sidecar_files(self):
         """Save session and file info in json sidecar file"""
+        import ulid
 
         # make copy of session info
         dat = self.session_info.copy()
@@ -1304,8 +3873,193 @@ class DataModel:
             json.dump(sidecar_dict, outfile, indent=4)
 
 
+class BatchIngest:
+    """Run the transfer of many sessions without the GUI, from a JSON or CSV manifest.
+
+    JSON: list of sessions, each with "session_info" (fields of the session form), "eeg_file_info"
+    (list of {"paradigm", "audio_source", "mff_file"}), "notes_file" and "net_placement_photos" (list).
+    CSV: one row per .mff file with the session form fields, paradigm, audio_source, mff_file, notes_file
+    and net_placement_photos (separated by ";") as columns. Consecutive rows of the same session are combined.
+    """
+
+    SESSION_COLUMNS = [
+        "study",
+        "visit_number",
+        "subject_id",
+        "subject_initials",
+        "date",
+        "location",
+        "net_serial_number",
+        "cap_type",
+        "other_notes",
+        "notes_file",
+        "net_placement_photos",
+    ]
+
+    def __init__(self, manifest_path, dry_run=False):
+        self.manifest_path = manifest_path
+        self.dry_run = dry_run
+
+    def load_manifest(self):
+        """Read sessions from the manifest file"""
+        with open(self.manifest_path, "r", newline="") as file:
+            if self.manifest_path.lower().endswith(".json"):
+                return json.load(file)
+            rows = list(csv.DictReader(file))
+
+        sessions = []
+        prev_key = None
+        for row in rows:
+            row = {key: (value or "").strip() for key, value in row.items() if key}
+            key = tuple(row.get(column, "") for column in self.SESSION_COLUMNS)
+            if key != prev_key:
+                sessions.append(
+                    {
+                        "session_info": {
+                            column: row.get(column, "")
+                            for column in self.SESSION_COLUMNS[:-2]
+                        },
+                        "eeg_file_info": [],
+                        "notes_file": row.get("notes_file") or None,
+                        "net_placement_photos": [
+                            photo.strip()
+                            for photo in row.get("net_placement_photos", "").split(";")
+                            if photo.strip()
+                        ],
+                    }
+                )
+                prev_key = key
+            sessions[-1]["eeg_file_info"].append(
+                {
+                    "paradigm": row.get("paradigm", ""),
+                    "audio_source": row.get("audio_source") or "none",
+                    "mff_file": row.get("mff_file") or None,
+                }
+            )
+        return sessions
+
+    @staticmethod
+    def describe(data_model):
+        dat = data_model.session_info
+        return f"{dat['study']} {dat['subject_id']} {dat['subject_initials']} {dat['visit_number']}"
+
+    def validate(self, data_model, sessions):
+        """Validate all sessions before anything is transferred, returns list of problems"""
+        problems = []
+        session_keys = set()
+        for i, session in enumerate(sessions, 1):
+            data_model.clear_session_data()
+            try:
+                data_model.load_session(session)
+                data_model.validate_session()
+                if data_model.check_if_session_info_already_exists():
+                    raise ValueError("Session already exists in the DeID log")
+                session_key = data_model.get_session_key(
+                    data_model.session_info["study"],
+                    data_model.session_info["subject_id"],
+                    data_model.session_info["visit_number"],
+                )
+                if session_key in session_keys:
+                    raise ValueError("Session is in the manifest more than once")
+                session_keys.add(session_key)
+            except (KeyError, TypeError, ValueError) as e:
+                problems.append(f"Session {i} ({self.describe(data_model)}):\n{e}")
+        return problems
+
+    def run(self):
+        """Validate and transfer all sessions of the manifest, returns process exit code"""
+        try:
+            data_model = DataModel()
+            sessions = self.load_manifest()
+        except (OSError, ValueError) as e:
+            print(f"ERROR: {e}", file=sys.stderr)
+            return 1
+
+        problems = self.validate(data_model, sessions)
+        if problems:
+            print("ERROR: nothing was transferred, fix the manifest first\n", file=sys.stderr)
+            print("\n\n".join(problems), file=sys.stderr)
+            return 1
+        print(f"{len(sessions)} sessions are valid")
+        if self.dry_run:
+            return 0
+
+        failed = 0
+        for i, session in enumerate(sessions, 1):
+            data_model.clear_data()
+            data_model.load_session(session)
+            print(f"Session {i}/{len(sessions)}: {self.describe(data_model)}")
+            try:
+                print("  Saving session to DeID log")
+                data_model.save_session()
+                data_model.run_transfer(
+                    lambda stage_name: print(f"  {stage_name}"),
+                    lambda num_bytes: None,
+                )
+            except Exception as e:
+                failed += 1
+                print(f"  FAILED: {e}", file=sys.stderr)
+                if data_model.deid is not None:
+                    print(
+                        f"  DeID {int(data_model.deid):04} was allocated, resume the transfer in the app",
+                        file=sys.stderr,
+                    )
+                continue
+            print(f"  DeID: {int(data_model.deid):04}")
+
+        print(f"{len(sessions) - failed} of {len(sessions)} sessions transferred")
+        return 1 if failed else 0
+
+
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
-    main_window = MainWindow()
+    parser = argparse.ArgumentParser(description="EEG file backup and deidentification")
+    parser.add_argument(
+        "--batch",
+        metavar="MANIFEST",
+        help="transfer the sessions of a JSON or CSV manifest without the GUI (see BatchIngest)",
+    )
+    parser.add_argument(
+        "--collect-garbage",
+        action="store_true",
+        help="delete content store objects no longer used by any copy (see ContentStore)",
+    )
+    parser.add_argument(
+        "--min-age-hours",
+        type=float,
+        default=24,
+        help="with --collect-garbage: keep objects whose links changed more recently",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="with --batch: only validate the manifest, with --collect-garbage: only report what would be deleted",
+    )
+    args, qt_args = parser.parse_known_args()
+
+    if args.batch:
+        sys.exit(BatchIngest(args.batch, args.dry_run).run())
+
+    if args.collect_garbage:
+        store = DataModel(load_deid_log=False).get_content_store()
+        if store is None:
+            sys.exit("dedup_store_dir is not set in transfer_config.json")
+        removed, freed_bytes = store.collect_garbage(args.min_age_hours * 3600, args.dry_run)
+        print(
+            f"{'Would delete' if args.dry_run else 'Deleted'} {removed} unused objects "
+            f"({freed_bytes / 1024 ** 2:,.1f} MB)"
+        )
+        stats = store.get_stats()
+        print(
+            f"Store: {stats['objects']} objects, {stats['stored_bytes'] / 1024 ** 2:,.1f} MB stored, "
+            f"{stats['saved_bytes'] / 1024 ** 2:,.1f} MB saved by deduplication"
+        )
+        sys.exit(0)
+
+    app = QApplication(sys.argv[:1] + qt_args)
+    try:
+        main_window = MainWindow()
+    except (OSError, ValueError) as e:
+        QMessageBox.critical(None, "ERROR", str(e))
+        sys.exit(1)
     main_window.show()
     sys.exit(app.exec_())
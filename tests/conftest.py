@@ -0,0 +1,78 @@
+import os
+import sys
+
+import pytest
+
+# eeg_backup.py is a script in the repository root, not an installed package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from eeg_backup import DataModel  # noqa: E402
+
+DEID_LOG_COLUMNS = (
+    ["DeID", "Study", "Subject ID", "Visit Num", "Visit Date", "Initials", "Location", "Net Serial Number", "Notes"]
+    + list(dict.fromkeys(DataModel.PARADIGM_TO_DEID_COLUMN_NAME.values()))
+    + ["original_file_names"]
+)
+
+
+def write_deid_log(path, rows, protect_from=None):
+    """Save a DeID log workbook with the given rows (lists, missing cells are empty) below the header.
+    With protect_from, the sheet is protected and cells of that sheet row and below are unlocked, like the lab's log."""
+    from openpyxl import Workbook
+    from openpyxl.styles import Protection
+
+    wb = Workbook()
+    sheet = wb.active
+    sheet.title = "DeID Log"
+    sheet.append(DEID_LOG_COLUMNS)
+    for row in rows:
+        sheet.append(list(row) + [None] * (len(DEID_LOG_COLUMNS) - len(row)))
+    if protect_from:
+        sheet.protection.sheet = True
+        for sheet_row in range(protect_from, len(rows) + 2):
+            for col_idx in range(2, len(DEID_LOG_COLUMNS) + 1):
+                sheet.cell(sheet_row, col_idx).protection = Protection(locked=False)
+    wb.create_sheet("Notes").append(["keep", "me"])
+    wb.save(path)
+    return path
+
+
+class LocalDataModel(DataModel):
+    """DataModel with file paths under a test folder and its own state folder instead of the lab configuration"""
+
+    def __init__(self, root, **transfer_overrides):
+        self.root = str(root)
+        self.transfer_overrides = transfer_overrides
+        super().__init__(load_deid_log=False)
+
+    def load_file_paths(self):
+        filepath_dict = {
+            "usb_input_dir": os.path.join(self.root, "usb"),
+            "mff_backup_dir": os.path.join(self.root, "backup"),
+            "mff_deid_dir": os.path.join(self.root, "deid"),
+            "net_placement_photo_dir": os.path.join(self.root, "photos"),
+            "deid_log_filepath": os.path.join(self.root, "onedrive", "deid_log.xlsx"),
+            "deid_log_local_backup_filepath": os.path.join(self.root, "local", "deid_log_backup.xlsx"),
+        }
+        for key, path in filepath_dict.items():
+            os.makedirs(os.path.dirname(path) if key.endswith("filepath") else path, exist_ok=True)
+        return filepath_dict
+
+    def load_transfer_config(self):
+        transfer_config = super().load_transfer_config()
+        transfer_config.update(self.transfer_overrides)
+        transfer_config["state_dir"] = os.path.join(self.root, "state")
+        return transfer_config
+
+
+@pytest.fixture
+def make_data_model(tmp_path):
+    """Create a LocalDataModel under tmp_path with a DeID log of the given rows, loaded like the app does"""
+
+    def make_data_model(rows, protect_from=None, **transfer_overrides):
+        data_model = LocalDataModel(tmp_path, **transfer_overrides)
+        write_deid_log(data_model.deid_log_filepath, rows, protect_from)
+        data_model.refresh_deid_log()
+        return data_model
+
+    return make_data_model
@@ -0,0 +1,192 @@
+"""Transferring sessions from a manifest without the GUI (BatchIngest)"""
+
+import csv
+import glob
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+import eeg_backup  # noqa: E402
+from eeg_backup import BatchIngest  # noqa: E402
+from synthetic_data import make_environment  # noqa: E402
+
+SESSION_INFO = {
+    "study": "BIO",
+    "visit_number": "v1",
+    "subject_id": "99999",
+    "subject_initials": "AB",
+    "date": "01-02-2026",
+    "location": "T19",
+    "net_serial_number": "4001",
+    "cap_type": "adult",
+}
+
+
+class EnvDataModel(eeg_backup.DataModel):
+    """DataModel that uses the synthetic environment and its own state folder instead of the lab configuration"""
+
+    def __init__(self, filepath_dict, state_dir):
+        self.env_filepath_dict = filepath_dict
+        self.env_state_dir = state_dir
+        super().__init__()
+
+    def load_file_paths(self):
+        return dict(self.env_filepath_dict)
+
+    def load_transfer_config(self):
+        transfer_config = super().load_transfer_config()
+        transfer_config["state_dir"] = self.env_state_dir
+        return transfer_config
+
+
+@pytest.fixture
+def environment(tmp_path, monkeypatch):
+    """Small synthetic environment, BatchIngest creates its data model there. Returns file paths and session inputs."""
+    filepath_dict, session_files = make_environment(
+        str(tmp_path / "env"), rows=20, used_rows=5, signal_bytes=256 * 1024, mov_bytes=64 * 1024,
+        photos=3, photo_bytes=16 * 1024,
+    )
+    monkeypatch.setattr(
+        eeg_backup, "DataModel", lambda: EnvDataModel(filepath_dict, str(tmp_path / "state"))
+    )
+    return filepath_dict, session_files
+
+
+def make_session(session_files, **session_info):
+    return {
+        "session_info": dict(SESSION_INFO, **session_info),
+        "eeg_file_info": [
+            {"paradigm": os.path.basename(mff_file).split("_")[2], "audio_source": "none", "mff_file": mff_file}
+            for mff_file in session_files["mff_files"]
+        ],
+        "notes_file": session_files["notes_file"],
+        "net_placement_photos": session_files["net_placement_photos"],
+    }
+
+
+def write_manifest(path, sessions):
+    with open(path, "w") as file:
+        json.dump(sessions, file)
+    return str(path)
+
+
+def test_invalid_manifest_transfers_nothing(tmp_path, environment, capsys):
+    filepath_dict, session_files = environment
+    sessions = [
+        make_session(session_files),
+        make_session(session_files, subject_id="123", date="2026-01-02"),
+        make_session(session_files),
+        dict(make_session(session_files, subject_id="99998"), notes_file=str(tmp_path / "missing.txt")),
+    ]
+    manifest_path = write_manifest(tmp_path / "manifest.json", sessions)
+
+    assert BatchIngest(manifest_path).run() == 1
+    err = capsys.readouterr().err
+    assert "nothing was transferred" in err
+    assert "Session 1 " not in err
+    assert "Session 2 (BIO 123 AB v1)" in err
+    assert "subject_id '123'" in err and "date '2026-01-02'" in err
+    assert "Session 3 (BIO 99999 AB v1):\nSession is in the manifest more than once" in err
+    assert "Session 4 (BIO 99998 AB v1):\nNotes file not found" in err
+    assert os.listdir(filepath_dict["mff_backup_dir"]) == []
+    assert os.listdir(filepath_dict["mff_deid_dir"]) == []
+
+
+def test_unreadable_manifest_is_an_error(tmp_path, environment, capsys):
+    manifest_path = tmp_path / "manifest.json"
+    manifest_path.write_text("[{")
+    assert BatchIngest(str(manifest_path)).run() == 1
+    assert capsys.readouterr().err.startswith("ERROR: ")
+    assert BatchIngest(str(tmp_path / "missing.json")).run() == 1
+
+
+def test_dry_run_only_validates(tmp_path, environment, capsys):
+    filepath_dict, session_files = environment
+    manifest_path = write_manifest(tmp_path / "manifest.json", [make_session(session_files)])
+    assert BatchIngest(manifest_path, dry_run=True).run() == 0
+    assert "1 sessions are valid" in capsys.readouterr().out
+    assert os.listdir(filepath_dict["mff_backup_dir"]) == []
+
+
+def test_csv_rows_of_a_session_are_combined(tmp_path, environment):
+    _, session_files = environment
+    manifest_path = str(tmp_path / "manifest.csv")
+    session = make_session(session_files)
+    with open(manifest_path, "w", newline="") as file:
+        writer = csv.DictWriter(file, BatchIngest.SESSION_COLUMNS + ["paradigm", "audio_source", "mff_file"])
+        writer.writeheader()
+        for file_info in session["eeg_file_info"]:
+            writer.writerow(
+                dict(
+                    session["session_info"],
+                    other_notes="",
+                    notes_file=session["notes_file"],
+                    net_placement_photos=";".join(session["net_placement_photos"]),
+                    **file_info,
+                )
+            )
+
+    (loaded,) = BatchIngest(manifest_path).load_manifest()
+    assert loaded["eeg_file_info"] == session["eeg_file_info"]
+    assert loaded["net_placement_photos"] == session["net_placement_photos"]
+    assert loaded["notes_file"] == session["notes_file"]
+    assert loaded["session_info"] == dict(session["session_info"], other_notes="")
+
+
+def test_sessions_are_transferred(tmp_path, environment, capsys):
+    filepath_dict, session_files = environment
+    sessions = [make_session(session_files), make_session(session_files, subject_id="99998", visit_number="v2")]
+    manifest_path = write_manifest(tmp_path / "manifest.json", sessions)
+
+    assert BatchIngest(manifest_path).run() == 0
+    out = capsys.readouterr().out
+    assert "DeID: 0006" in out and "DeID: 0007" in out
+    assert "2 of 2 sessions transferred" in out
+
+    # a backup and a deid copy of every .mff file of each session
+    mff_file = session_files["mff_files"][0]
+    paradigm = os.path.basename(mff_file).split("_")[2]
+    for deid, (subject, visit) in ((6, ("99999 AB", "v1")), (7, ("99998 AB", "v2"))):
+        backup_dir = os.path.join(filepath_dict["mff_backup_dir"], "BIO", subject, visit)
+        assert len(glob.glob(os.path.join(backup_dir, "*.mff"))) == len(session_files["mff_files"])
+        assert len(glob.glob(os.path.join(filepath_dict["mff_deid_dir"], "*", f"{deid:04}_*.mff"))) == len(
+            session_files["mff_files"]
+        )
+    (backup_path,) = glob.glob(
+        os.path.join(filepath_dict["mff_backup_dir"], "BIO", "99999 AB", "v1", f"BIO_v1_{paradigm}_*.mff")
+    )
+    deid_path = os.path.join(filepath_dict["mff_deid_dir"], paradigm, f"0006_{paradigm}.mff")
+    with open(os.path.join(mff_file, "signal1.bin"), "rb") as file:
+        signal = file.read()
+    for path in (backup_path, deid_path):
+        with open(os.path.join(path, "signal1.bin"), "rb") as file:
+            assert file.read() == signal
+
+    # both sessions are in the DeID log, a second run finds them
+    data_model = eeg_backup.DataModel()
+    assert {("BIO", "99999", "v1"), ("BIO", "99998", "v2")} <= data_model.session_index
+    assert BatchIngest(manifest_path).run() == 1
+    assert "Session already exists in the DeID log" in capsys.readouterr().err
+
+
+def test_deid_log_stays_on_the_calling_thread(environment):
+    _, session_files = environment
+    data_model = eeg_backup.DataModel()
+    data_model.load_session(make_session(session_files))
+    with pytest.raises(RuntimeError, match="saved to the DeID log"):
+        data_model.run_transfer(lambda stage_name: None, lambda num_bytes: None)
+
+    # the detached session that is transferred on a worker thread shares nothing of the deid log
+    data_model.save_session()
+    session_model = data_model.detach_session()
+    assert session_model.deid == 6
+    assert session_model.deid_log is None and session_model.deid_log_mirror is None
+    assert session_model.session_index == set()
+    assert ("BIO", "99999", "v1") in data_model.session_index
+    stages = []
+    session_model.run_transfer(stages.append, lambda num_bytes: None)
+    assert len(stages) == 3 and not any("DeID log" in stage_name for stage_name in stages)
@@ -0,0 +1,209 @@
+"""ContentStore: deduplicated copies and garbage collection"""
+
+import hashlib
+import os
+import stat
+
+import pytest
+
+import eeg_backup
+from conftest import LocalDataModel
+from eeg_backup import ContentStore, MffCopyEngine
+
+SIGNAL = os.urandom(200000)
+INFO = b"<info>recording</info>"
+
+
+@pytest.fixture
+def src_dir(tmp_path):
+    src_dir = tmp_path / "usb" / "rec.mff"
+    src_dir.mkdir(parents=True)
+    (src_dir / "signal1.bin").write_bytes(SIGNAL)
+    (src_dir / "info.xml").write_bytes(INFO)
+    return str(src_dir)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ContentStore(str(tmp_path / "store"))
+
+
+def backup(src_dir, dst_dir, store, known_digests=None):
+    """Copy src_dir with deduplication, returns the source files that were read"""
+    engine = MffCopyEngine()
+    copied = []
+    copy_file = engine.copy_file
+
+    def recording_copy_file(src, *args, **kwargs):
+        copied.append(os.path.basename(src))
+        return copy_file(src, *args, **kwargs)
+
+    engine.copy_file = recording_copy_file
+    engine.copy_tree(src_dir, [dst_dir], dst_options={dst_dir: {"store": store}}, known_digests=known_digests)
+    return copied
+
+
+def digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def test_same_content_is_stored_once(tmp_path, src_dir, store):
+    first, second = str(tmp_path / "s1" / "rec.mff"), str(tmp_path / "s2" / "rec.mff")
+    backup(src_dir, first, store)
+    backup(src_dir, second, store)
+
+    object_path = store.get_object_path(digest(SIGNAL))
+    for dst_dir in (first, second):
+        assert os.path.samefile(os.path.join(dst_dir, "signal1.bin"), object_path)
+    assert os.stat(object_path).st_nlink == 3
+    # objects and the copies linked to them are read-only
+    assert not os.stat(object_path).st_mode & (stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH)
+    assert store.get_stats() == {
+        "objects": 2,
+        "unused_objects": 0,
+        "stored_bytes": len(SIGNAL) + len(INFO),
+        "saved_bytes": len(SIGNAL) + len(INFO),
+    }
+
+
+def test_known_digests_are_linked_without_copying(tmp_path, src_dir, store):
+    backup(src_dir, str(tmp_path / "s1" / "rec.mff"), store)
+    known_digests = {"signal1.bin": digest(SIGNAL), "info.xml": digest(INFO)}
+    dst_dir = str(tmp_path / "s2" / "rec.mff")
+    assert backup(src_dir, dst_dir, store, known_digests) == []
+    assert os.path.samefile(os.path.join(dst_dir, "signal1.bin"), store.get_object_path(digest(SIGNAL)))
+
+
+def test_changed_object_is_not_linked(tmp_path, src_dir, store):
+    first = str(tmp_path / "s1" / "rec.mff")
+    backup(src_dir, first, store)
+    # someone edits a backed up copy, which changes the object linked to it
+    changed_copy = os.path.join(first, "signal1.bin")
+    os.chmod(changed_copy, 0o644)
+    with open(changed_copy, "r+b") as file:
+        file.write(b"edited")
+
+    # later backups get the content of their source, with or without a digest known in advance
+    for session, known_digests in (("s2", {"signal1.bin": digest(SIGNAL)}), ("s3", None)):
+        dst_dir = str(tmp_path / session / "rec.mff")
+        assert "signal1.bin" in backup(src_dir, dst_dir, store, known_digests)
+        with open(os.path.join(dst_dir, "signal1.bin"), "rb") as file:
+            assert file.read() == SIGNAL
+
+    # the object was replaced by a verified copy, the edited copy keeps its own content
+    object_path = store.get_object_path(digest(SIGNAL))
+    assert store.verify(object_path, len(SIGNAL), digest(SIGNAL))
+    assert not os.path.samefile(changed_copy, object_path)
+    assert os.path.samefile(os.path.join(str(tmp_path / "s3" / "rec.mff"), "signal1.bin"), object_path)
+
+
+def test_object_with_other_size_is_not_linked(tmp_path, store):
+    path = tmp_path / "file.bin"
+    path.write_bytes(b"content")
+    store.add(str(path), digest(b"content"))
+    assert not store.link(digest(b"content"), str(tmp_path / "other.bin"), len(b"content") + 1)
+    assert not os.path.exists(tmp_path / "other.bin")
+    assert store.link(digest(b"content"), str(tmp_path / "other.bin"), len(b"content"))
+
+
+def test_recopy_does_not_write_into_object(tmp_path, src_dir, store):
+    # a file left by an interrupted copy after it was linked to the store is replaced, not overwritten
+    dst = str(tmp_path / "dst.bin")
+    (tmp_path / "old.bin").write_bytes(b"old content")
+    store.add(str(tmp_path / "old.bin"), digest(b"old content"))
+    store.link(digest(b"old content"), dst, len(b"old content"))
+
+    MffCopyEngine().copy_file(os.path.join(src_dir, "info.xml"), [dst])
+    with open(store.get_object_path(digest(b"old content")), "rb") as file:
+        assert file.read() == b"old content"
+    with open(dst, "rb") as file:
+        assert file.read() == INFO
+
+
+def test_objects_are_hashed_once(tmp_path, src_dir, store, monkeypatch):
+    backup(src_dir, str(tmp_path / "s1" / "rec.mff"), store)
+    hashed = []
+    new = hashlib.new
+    monkeypatch.setattr(eeg_backup.hashlib, "new", lambda *args: hashed.append(args) or new(*args))
+    # objects added by the store were hashed while they were copied
+    assert store.link(digest(SIGNAL), str(tmp_path / "a.bin"), len(SIGNAL))
+    assert hashed == []
+
+    # a store that did not add them hashes them the first time only
+    other_store = ContentStore(store.store_dir)
+    assert other_store.link(digest(SIGNAL), str(tmp_path / "b.bin"), len(SIGNAL))
+    assert other_store.link(digest(SIGNAL), str(tmp_path / "c.bin"), len(SIGNAL))
+    assert len(hashed) == 1
+
+    # once its modification time changed, an object is hashed again
+    object_path = store.get_object_path(digest(SIGNAL))
+    os.utime(object_path, ns=(0, 0))
+    assert other_store.link(digest(SIGNAL), str(tmp_path / "d.bin"), len(SIGNAL))
+    assert len(hashed) == 2
+
+
+def test_object_deleted_meanwhile_keeps_the_copy(tmp_path, store, monkeypatch):
+    copy = tmp_path / "copy.bin"
+    copy.write_bytes(b"content")
+    (tmp_path / "old.bin").write_bytes(b"content")
+    store.add(str(tmp_path / "old.bin"), digest(b"content"))
+    object_path = store.get_object_path(digest(b"content"))
+
+    # collect_garbage deletes the object after it was verified
+    verify = store.verify
+
+    def verify_then_collect(*args):
+        result = verify(*args)
+        MffCopyEngine.remove_file(object_path)
+        return result
+
+    monkeypatch.setattr(store, "verify", verify_then_collect)
+    assert not store.link(digest(b"content"), str(tmp_path / "linked.bin"), len(b"content"))
+    assert not os.path.exists(tmp_path / "linked.bin")
+
+    # the copy is kept and becomes the object
+    store.add(str(tmp_path / "old.bin"), digest(b"content"))
+    store.add(str(copy), digest(b"content"))
+    assert copy.read_bytes() == b"content"
+    assert os.path.samefile(copy, object_path)
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".tmp")] == []
+
+
+def test_objects_can_stay_writable(tmp_path, src_dir):
+    store = ContentStore(str(tmp_path / "store"), read_only=False)
+    backup(src_dir, str(tmp_path / "s1" / "rec.mff"), store)
+    backup(src_dir, str(tmp_path / "s2" / "rec.mff"), store)
+    assert os.stat(store.get_object_path(digest(SIGNAL))).st_mode & stat.S_IWUSR
+
+
+def test_sessions_share_one_store(tmp_path):
+    data_model = LocalDataModel(tmp_path, dedup_store_dir=str(tmp_path / "store"))
+    store = data_model.get_content_store()
+    assert data_model.get_content_store() is store
+    assert data_model.detach_session().get_content_store() is store
+    assert LocalDataModel(tmp_path).get_content_store() is None
+
+
+def test_collect_garbage(tmp_path, src_dir, store):
+    first, second = str(tmp_path / "s1" / "rec.mff"), str(tmp_path / "s2" / "rec.mff")
+    backup(src_dir, first, store)
+    backup(src_dir, second, store)
+
+    MffCopyEngine.remove_partial(first)  # complete copies are never removed by it
+    assert store.collect_garbage(min_age=0) == (0, 0)
+
+    for dst_dir in (first, second):
+        for name in os.listdir(dst_dir):
+            MffCopyEngine.remove_file(os.path.join(dst_dir, name))
+    assert store.get_stats()["unused_objects"] == 2
+
+    # recently added objects are kept, a dry run only reports
+    assert store.collect_garbage() == (0, 0)
+    assert store.collect_garbage(min_age=0, dry_run=True) == (2, len(SIGNAL) + len(INFO))
+    assert store.get_stats()["objects"] == 2
+    assert store.collect_garbage(min_age=0) == (2, len(SIGNAL) + len(INFO))
+    assert store.get_stats()["objects"] == 0
+
+    # content removed by garbage collection is copied again
+    known_digests = {"signal1.bin": digest(SIGNAL)}
+    assert "signal1.bin" in backup(src_dir, str(tmp_path / "s3" / "rec.mff"), store, known_digests)
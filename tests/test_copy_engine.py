@@ -0,0 +1,161 @@
+"""MffCopyEngine: manifests, interrupted copies and resuming them"""
+
+import hashlib
+import json
+import os
+
+import pytest
+
+from eeg_backup import MffCopyEngine
+
+
+def make_tree(root):
+    """Small .mff-like tree with a large file, small files and a subfolder, returns {relative path: content}"""
+    files = {
+        "signal1.bin": os.urandom(3 * 1024 * 1024 + 17),
+        "info.xml": b"<info>participant</info>",
+        "video1.mov": os.urandom(4096),
+        os.path.join("sub", "log.txt"): b"log line\n" * 50,
+    }
+    for rel_path, content in files.items():
+        path = os.path.join(root, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as file:
+            file.write(content)
+    return files
+
+
+def read_manifest(dst_dir):
+    with open(MffCopyEngine.get_manifest_path(dst_dir)) as file:
+        return json.load(file)
+
+
+def interrupt_after(engine, num_files):
+    """Make copy_file of engine fail after num_files files were copied"""
+    copy_file = engine.copy_file
+    copied = []
+
+    def failing_copy_file(*args, **kwargs):
+        if len(copied) >= num_files:
+            raise OSError("drive disconnected")
+        copied.append(args[0])
+        return copy_file(*args, **kwargs)
+
+    engine.copy_file = failing_copy_file
+    return copied
+
+
+@pytest.fixture
+def src(tmp_path):
+    src_dir = str(tmp_path / "src.mff")
+    return src_dir, make_tree(src_dir)
+
+
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_copy_tree_writes_manifest_with_digests(tmp_path, src, max_workers):
+    src_dir, files = src
+    dst_dirs = [str(tmp_path / "backup" / "a.mff"), str(tmp_path / "deid" / "b.mff")]
+    MffCopyEngine(max_workers=max_workers).copy_tree(
+        src_dir, dst_dirs, dst_options={dst_dirs[1]: {"exclude": ["*.MOV"]}}
+    )
+
+    for dst_dir in dst_dirs:
+        manifest = read_manifest(dst_dir)
+        assert manifest["mff_file"] == os.path.basename(dst_dir)
+        assert manifest["hash_algorithm"] == "sha256"
+        assert not MffCopyEngine.is_partial(dst_dir)
+        expected = {
+            rel_path.replace(os.sep, "/"): (len(content), hashlib.sha256(content).hexdigest())
+            for rel_path, content in files.items()
+            if dst_dir == dst_dirs[0] or not rel_path.endswith(".mov")
+        }
+        assert {entry["path"]: (entry["size"], entry["digest"]) for entry in manifest["files"]} == expected
+        for rel_path in expected:
+            with open(os.path.join(dst_dir, rel_path), "rb") as file:
+                assert file.read() == files[os.path.normpath(rel_path)]
+    assert not os.path.exists(os.path.join(dst_dirs[1], "video1.mov"))
+
+
+def test_copy_tree_refuses_existing_destination(tmp_path, src):
+    dst_dir = str(tmp_path / "a.mff")
+    os.makedirs(dst_dir)
+    with pytest.raises(FileExistsError):
+        MffCopyEngine().copy_tree(src[0], [dst_dir])
+
+
+def test_interrupted_copy_is_resumed(tmp_path, src):
+    src_dir, files = src
+    dst_dirs = [str(tmp_path / "a.mff"), str(tmp_path / "b.mff")]
+    engine = MffCopyEngine()
+    interrupt_after(engine, 2)
+    with pytest.raises(OSError, match="drive disconnected"):
+        engine.copy_tree(src_dir, dst_dirs)
+    for dst_dir in dst_dirs:
+        assert MffCopyEngine.is_partial(dst_dir)
+        assert not os.path.exists(MffCopyEngine.get_manifest_path(dst_dir))
+
+    # files completed before the interruption are not copied again
+    engine = MffCopyEngine()
+    copied = interrupt_after(engine, len(files))
+    engine.copy_tree(src_dir, dst_dirs)
+    assert len(copied) == len(files) - 2
+
+    for dst_dir in dst_dirs:
+        assert not MffCopyEngine.is_partial(dst_dir)
+        manifest_files = {entry["path"]: entry["digest"] for entry in read_manifest(dst_dir)["files"]}
+        assert manifest_files == {
+            rel_path.replace(os.sep, "/"): hashlib.sha256(content).hexdigest() for rel_path, content in files.items()
+        }
+
+
+def test_partial_file_with_wrong_size_is_copied_again(tmp_path, src):
+    src_dir, files = src
+    dst_dir = str(tmp_path / "a.mff")
+    engine = MffCopyEngine()
+    interrupt_after(engine, 1)
+    with pytest.raises(OSError):
+        engine.copy_tree(src_dir, [dst_dir])
+    # the largest file is copied first, damage it as a crash during writing would
+    with open(os.path.join(dst_dir, "signal1.bin"), "r+b") as file:
+        file.truncate(10)
+
+    engine = MffCopyEngine()
+    copied = interrupt_after(engine, len(files))
+    engine.copy_tree(src_dir, [dst_dir])
+    assert len(copied) == len(files)
+    with open(os.path.join(dst_dir, "signal1.bin"), "rb") as file:
+        assert file.read() == files["signal1.bin"]
+
+
+def test_kept_journal_resumes_without_copying(tmp_path, src):
+    src_dir, files = src
+    dst_dir = str(tmp_path / "a.mff")
+    MffCopyEngine().copy_tree(src_dir, [dst_dir], keep_journals=True)
+    # complete but not recorded yet by the caller, e.g. a crash right after the copy
+    assert MffCopyEngine.is_partial(dst_dir)
+    assert os.path.exists(MffCopyEngine.get_manifest_path(dst_dir))
+
+    engine = MffCopyEngine()
+    copied = interrupt_after(engine, 0)
+    engine.copy_tree(src_dir, [dst_dir])
+    assert copied == []
+    assert not MffCopyEngine.is_partial(dst_dir)
+    assert len(read_manifest(dst_dir)["files"]) == len(files)
+
+
+def test_remove_partial_keeps_complete_destinations(tmp_path, src):
+    src_dir, _ = src
+    partial_dir = str(tmp_path / "partial.mff")
+    engine = MffCopyEngine()
+    interrupt_after(engine, 1)
+    with pytest.raises(OSError):
+        engine.copy_tree(src_dir, [partial_dir])
+    complete_dir = str(tmp_path / "complete.mff")
+    MffCopyEngine().copy_tree(src_dir, [complete_dir], keep_journals=True)
+
+    MffCopyEngine.remove_partial(partial_dir)
+    MffCopyEngine.remove_partial(complete_dir)
+    assert not os.path.exists(partial_dir)
+    assert not MffCopyEngine.is_partial(partial_dir)
+    assert os.path.exists(os.path.join(complete_dir, "signal1.bin"))
+    assert not MffCopyEngine.is_partial(complete_dir)
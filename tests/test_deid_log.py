@@ -0,0 +1,53 @@
+"""Loading the DeID log into the data model"""
+
+import pytest
+
+
+def used_row(deid, subject_id, **paradigms):
+    return [deid, "BIO", subject_id, "v1", "01-01-2024", "AB", "T19", 4001, ""] + [
+        paradigms.get(name) for name in ("Resting", "Chirp")
+    ]
+
+
+def test_counts_and_deids_get_compact_dtypes(make_data_model):
+    data_model = make_data_model([used_row(1, 101, Resting=1), used_row(2, 102, Chirp=2), [3], [4]])
+    deid_log = data_model.deid_log
+    assert str(deid_log["DeID"].dtype) == "int32"
+    assert str(deid_log["Resting"].dtype) == "Int16"
+    assert str(deid_log["Chirp"].dtype) == "Int16"
+    assert data_model.invalid_deid_rows == []
+    assert data_model.get_deid(2) == 3
+
+
+@pytest.mark.parametrize(
+    "cell, dtype",
+    [("1 (redo)", "object"), (1.5, "float64"), (40000, "float64")],
+)
+def test_hand_edited_counts_are_kept(make_data_model, cell, dtype):
+    data_model = make_data_model([used_row(1, 101, Resting=cell), used_row(2, 102, Resting=1), [3]])
+    assert str(data_model.deid_log["Resting"].dtype) == dtype
+    assert data_model.deid_log.at[0, "Resting"] == cell
+    assert data_model.deid_log.at[1, "Resting"] == 1
+
+
+def test_invalid_deid_is_reported_when_used(make_data_model):
+    data_model = make_data_model([used_row(1, 101, Resting=1), ["D0007"], [8]])
+    # sheet row 3 holds the second deid
+    assert data_model.invalid_deid_rows == [3]
+    assert data_model.get_deid(2) == 8
+    with pytest.raises(ValueError, match="row 3"):
+        data_model.get_deid(1)
+
+
+def test_invalid_deid_survives_the_mirror(make_data_model):
+    data_model = make_data_model([used_row(1, 101, Resting=1), ["D0007"], [8]])
+    data_model.load_deid_log(data_model.deid_log_filepath)  # loaded from the local mirror
+    assert data_model.invalid_deid_rows == [3]
+    assert data_model.get_deid(2) == 8
+
+
+def test_text_subject_id_in_numeric_column(make_data_model):
+    data_model = make_data_model([used_row(1, 101, Resting=1), [2]])
+    data_model.set_deid_log_value(1, "Subject ID", "A-102")
+    assert data_model.deid_log.at[1, "Subject ID"] == "A-102"
+    assert data_model.deid_log.at[0, "Subject ID"] == 101
@@ -0,0 +1,63 @@
+"""PhotoZipPacker: net placement photos packed into one zip archive"""
+
+import os
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile
+
+import pytest
+
+from eeg_backup import PhotoZipPacker
+
+JPEG_HEADER = b"\xff\xd8\xff\xe0\x00\x10JFIF\x00"
+PNG_HEADER = b"\x89PNG\r\n\x1a\n"
+
+
+@pytest.fixture
+def photos(tmp_path):
+    """JPEG and PNG photos, some larger than the packer's chunk size. Returns {path: bytes} in upload order."""
+    photo_dir = tmp_path / "usb" / "photos"
+    photo_dir.mkdir(parents=True)
+    chunk_size = PhotoZipPacker.CHUNK_SIZE
+    contents = {
+        "IMG_1002.jpg": JPEG_HEADER + os.urandom(2 * chunk_size + 17),
+        "net_front.png": PNG_HEADER + b"\x00\x01\x02\x03" * chunk_size,
+        "IMG_1001.JPEG": JPEG_HEADER + os.urandom(1000),
+        "empty.png": b"",
+        "net_back.png": PNG_HEADER + os.urandom(300) * 500,
+    }
+    for name, data in contents.items():
+        (photo_dir / name).write_bytes(data)
+    return {str(photo_dir / name): data for name, data in contents.items()}
+
+
+@pytest.mark.parametrize("max_workers", [1, 3])
+def test_zip_holds_photos_in_order(tmp_path, photos, max_workers):
+    progress = []
+    io_calls = []
+    zip_path = str(tmp_path / "photos.zip")
+    PhotoZipPacker(progress.append, max_workers, lambda *args: io_calls.append(args)).pack(list(photos), zip_path)
+
+    with ZipFile(zip_path) as zip_file:
+        assert zip_file.testzip() is None
+        infos = zip_file.infolist()
+        assert [info.filename for info in infos] == [os.path.basename(photo) for photo in photos]
+        for info, (photo, data) in zip(infos, photos.items()):
+            assert zip_file.read(info) == data
+            # JPEGs are already compressed and stored as they are
+            expected = ZIP_STORED if photo.lower().endswith((".jpg", ".jpeg")) else ZIP_DEFLATED
+            assert info.compress_type == expected
+    assert sum(progress) == sum(len(data) for data in photos.values())
+
+    # every photo is read once, each entry written reports its compressed size
+    reads = {path: size for operation, path, size, seconds in io_calls if operation == "read"}
+    assert reads == {photo: len(data) for photo, data in photos.items()}
+    with ZipFile(zip_path) as zip_file:
+        compressed_sizes = [info.compress_size for info in zip_file.infolist()]
+    assert [args[2] for args in io_calls if args[0] == "write"] == compressed_sizes
+    assert compressed_sizes[1] < len(photos[list(photos)[1]]) // 100
+
+
+def test_unreadable_photo_fails_packing(tmp_path, photos):
+    missing = str(tmp_path / "usb" / "photos" / "missing.jpg")
+    paths = list(photos)
+    with pytest.raises(FileNotFoundError):
+        PhotoZipPacker(max_workers=2).pack(paths[:2] + [missing] + paths[2:], str(tmp_path / "photos.zip"))
@@ -0,0 +1,125 @@
+"""MffPrefetch: reading and hashing .mff files ahead of their transfer"""
+
+import hashlib
+import json
+import os
+
+import pytest
+
+from eeg_backup import MffCopyEngine, MffPrefetch
+
+
+@pytest.fixture
+def mff_dir(tmp_path):
+    """Small .mff bundle on the "USB", returns its path and {relative path: content}"""
+    mff_dir = tmp_path / "usb" / "rec.mff"
+    files = {
+        "signal1.bin": os.urandom(2 * MffPrefetch.CHUNK_SIZE + 5),
+        "info.xml": b"<info>participant</info>",
+        os.path.join("sub", "log.txt"): b"log line\n" * 50,
+    }
+    for rel_path, content in files.items():
+        (mff_dir / rel_path).parent.mkdir(parents=True, exist_ok=True)
+        (mff_dir / rel_path).write_bytes(content)
+    return str(mff_dir), files
+
+
+def prefetch(mff_path, staging_path=None):
+    prefetch = MffPrefetch(mff_path, "sha256", staging_path)
+    prefetch.future.result(timeout=30)
+    assert prefetch.error is None
+    return prefetch
+
+
+def read_manifest(dst_dir):
+    with open(MffCopyEngine.get_manifest_path(dst_dir)) as file:
+        return {entry["path"]: entry["digest"] for entry in json.load(file)["files"]}
+
+
+def change_keeping_stat(path, content):
+    """Rewrite a file with content of the same size and restore its modification time, like a tool that does"""
+    st = os.stat(path)
+    with open(path, "r+b") as file:
+        file.write(content)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+
+@pytest.mark.parametrize("staged", [False, True])
+def test_digests_are_handed_to_the_copy(tmp_path, mff_dir, staged):
+    mff_path, files = mff_dir
+    staging_path = None
+    if staged:
+        # the staging folder is created for the prefetch (see DataModel.update_mff_prefetches)
+        (tmp_path / "state" / "prefetch" / "1").mkdir(parents=True)
+        staging_path = str(tmp_path / "state" / "prefetch" / "1" / "rec.mff")
+    result = prefetch(mff_path, staging_path)
+    assert result.is_ready()
+    assert result.staged is staged
+    digests = {rel_path: hashlib.sha256(content).hexdigest() for rel_path, content in files.items()}
+    assert result.get_digests() == digests
+
+    dst_dir = str(tmp_path / "backup" / "rec.mff")
+    MffCopyEngine().copy_tree(staging_path if staged else mff_path, [dst_dir], known_digests=result.get_digests())
+    assert read_manifest(dst_dir) == {rel_path.replace(os.sep, "/"): digest for rel_path, digest in digests.items()}
+    for rel_path, content in files.items():
+        with open(os.path.join(dst_dir, rel_path), "rb") as file:
+            assert file.read() == content
+
+    result.cancel()
+    if staged:
+        assert not os.path.exists(os.path.dirname(staging_path))
+
+
+def test_changed_source_is_not_ready(tmp_path, mff_dir):
+    mff_path, _ = mff_dir
+    result = prefetch(mff_path)
+    with open(os.path.join(mff_path, "info.xml"), "ab") as file:
+        file.write(b"<!-- edited -->")
+    assert not result.is_ready()
+
+    result = prefetch(mff_path)
+    (tmp_path / "usb" / "rec.mff" / "new.xml").write_bytes(b"<new/>")
+    assert not result.is_ready()
+
+
+def test_source_changed_unnoticed_fails_the_copy(tmp_path, mff_dir):
+    mff_path, files = mff_dir
+    result = prefetch(mff_path)
+    signal = os.path.join(mff_path, "signal1.bin")
+    changed = os.urandom(len(files["signal1.bin"]))
+    change_keeping_stat(signal, changed)
+    # size and modification time are all the prefetch checks, the copy hashes what it reads
+    assert result.is_ready()
+
+    dst_dir = str(tmp_path / "backup" / "rec.mff")
+    with pytest.raises(OSError, match="changed since it was prefetched"):
+        MffCopyEngine().copy_tree(mff_path, [dst_dir], known_digests=result.get_digests())
+    assert not os.path.exists(MffCopyEngine.get_manifest_path(dst_dir))
+
+    # without the stale digests the copy is resumed and records the digest of what it copied
+    MffCopyEngine().copy_tree(mff_path, [dst_dir])
+    assert read_manifest(dst_dir)["signal1.bin"] == hashlib.sha256(changed).hexdigest()
+
+
+def test_copy_file_checks_the_given_digest(tmp_path, mff_dir):
+    mff_path, files = mff_dir
+    src = os.path.join(mff_path, "info.xml")
+    dst = str(tmp_path / "info.xml")
+    digest = hashlib.sha256(files["info.xml"]).hexdigest()
+    assert MffCopyEngine().copy_file(src, [dst], digest=digest)[:2] == (len(files["info.xml"]), digest)
+    with pytest.raises(OSError):
+        MffCopyEngine().copy_file(src, [dst], digest=hashlib.sha256(b"other").hexdigest())
+
+
+def test_prefetch_is_opt_in(make_data_model, mff_dir):
+    mff_path, _ = mff_dir
+    data_model = make_data_model([[1]])
+    data_model.update_mff_prefetches([mff_path])
+    assert data_model.mff_prefetches == {}
+
+    data_model = make_data_model([[1]], prefetch_mff=True)
+    data_model.update_mff_prefetches([mff_path])
+    data_model.mff_prefetches[mff_path].future.result(timeout=30)
+    assert data_model.mff_prefetches[mff_path].is_ready()
+    data_model.update_mff_prefetches([])
+    assert data_model.mff_prefetches == {}
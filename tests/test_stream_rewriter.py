@@ -0,0 +1,110 @@
+"""StreamRewriter and deidentifying .mff files while they are copied"""
+
+import hashlib
+import json
+import os
+import re
+
+import pytest
+
+from eeg_backup import MffCopyEngine, StreamRewriter
+
+FILE_NAME = "BIO_v1_rest_12345_AB_20240101_120000"
+PARTICIPANT_ID = "BIO_v1_rest_12345"
+REPLACEMENTS = {FILE_NAME: "0026_rest", PARTICIPANT_ID: "0026_rest"}
+
+
+def rewrite_in_chunks(data, chunk_size, replacements=REPLACEMENTS):
+    rewriter = StreamRewriter(replacements)
+    parts = [rewriter.feed(data[pos : pos + chunk_size]) for pos in range(0, len(data), chunk_size)]
+    parts.append(rewriter.flush())
+    return b"".join(parts)
+
+
+def rewrite_at_once(data, replacements=REPLACEMENTS):
+    olds = sorted(replacements, key=len, reverse=True)
+    pattern = re.compile("|".join(re.escape(old) for old in olds).encode("utf-8"))
+    return pattern.sub(lambda match: replacements[match.group().decode("utf-8")].encode("utf-8"), data)
+
+
+SAMPLE = (
+    f"<name>{FILE_NAME}</name>\n<id>{PARTICIPANT_ID}</id>{PARTICIPANT_ID}{FILE_NAME}"
+    f"{PARTICIPANT_ID}_AB trailing {PARTICIPANT_ID}"
+).encode("utf-8")
+
+
+@pytest.mark.parametrize("chunk_size", list(range(1, len(FILE_NAME) + 3)) + [64, len(SAMPLE)])
+def test_matches_across_chunk_boundaries(chunk_size):
+    rewritten = rewrite_in_chunks(SAMPLE, chunk_size)
+    assert rewritten == rewrite_at_once(SAMPLE)
+    assert PARTICIPANT_ID.encode("utf-8") not in rewritten
+    assert rewritten.count(b"0026_rest") == 6
+
+
+def test_every_split_point():
+    # a single match split at every possible position between two chunks
+    data = b"xx" + FILE_NAME.encode("utf-8") + b"yy"
+    for split in range(len(data) + 1):
+        rewriter = StreamRewriter(REPLACEMENTS)
+        rewritten = rewriter.feed(data[:split]) + rewriter.feed(data[split:]) + rewriter.flush()
+        assert rewritten == b"xx0026_restyy", split
+
+
+def test_longest_replacement_wins():
+    # the file name starts with the participant id, it is replaced as a whole
+    assert rewrite_in_chunks(FILE_NAME.encode("utf-8"), 5) == b"0026_rest"
+
+
+def test_empty_chunks_and_no_matches():
+    rewriter = StreamRewriter(REPLACEMENTS)
+    assert rewriter.feed(b"") + rewriter.feed(b"abc") + rewriter.feed(b"") + rewriter.flush() == b"abc"
+    data = os.urandom(5000)
+    assert rewrite_in_chunks(data, 7) == data
+
+
+def test_random_data_with_matches():
+    parts = [os.urandom(size) for size in (0, 1, 17, 300, 4096)]
+    data = FILE_NAME.encode("utf-8").join(parts) + PARTICIPANT_ID.encode("utf-8").join(parts)
+    for chunk_size in (3, 16, 1000):
+        assert rewrite_in_chunks(data, chunk_size) == rewrite_at_once(data)
+
+
+def test_copy_tree_deidentifies_deid_copy(tmp_path, monkeypatch):
+    # small chunks so matches cross the chunks read from the source
+    monkeypatch.setattr(MffCopyEngine, "CHUNK_SIZE", 7)
+    src_dir = tmp_path / f"{FILE_NAME}.mff"
+    src_dir.mkdir()
+    (src_dir / "subject.xml").write_bytes(SAMPLE)
+    (src_dir / "signal1.bin").write_bytes(SAMPLE)
+    (src_dir / f"{FILE_NAME}_log.txt").write_text("log")
+    backup_dir, deid_dir = str(tmp_path / "backup.mff"), str(tmp_path / "0026_rest.mff")
+
+    MffCopyEngine().copy_tree(
+        str(src_dir),
+        [backup_dir, deid_dir],
+        dst_options={
+            deid_dir: {
+                "allow_hardlinks": True,
+                "rewrite_files": ["subject.xml"],
+                "replacements": REPLACEMENTS,
+                "renamed_files": {f"{FILE_NAME}_log.txt": "0026_rest_log.txt"},
+            }
+        },
+    )
+
+    with open(os.path.join(deid_dir, "subject.xml"), "rb") as file:
+        rewritten = file.read()
+    assert rewritten == rewrite_at_once(SAMPLE)
+    with open(os.path.join(backup_dir, "subject.xml"), "rb") as file:
+        assert file.read() == SAMPLE
+    # only the listed files are rewritten
+    with open(os.path.join(deid_dir, "signal1.bin"), "rb") as file:
+        assert file.read() == SAMPLE
+    assert sorted(os.listdir(deid_dir)) == ["0026_rest_log.txt", "signal1.bin", "subject.xml"]
+
+    # the manifest has the digest of the bytes written, not of the source
+    with open(MffCopyEngine.get_manifest_path(deid_dir)) as file:
+        manifest = {entry["path"]: entry for entry in json.load(file)["files"]}
+    assert manifest["subject.xml"]["digest"] == hashlib.sha256(rewritten).hexdigest()
+    assert manifest["subject.xml"]["size"] == len(rewritten)
+    assert "0026_rest_log.txt" in manifest
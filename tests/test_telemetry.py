@@ -0,0 +1,106 @@
+"""TransferTelemetry: stage timings and the rotating telemetry log"""
+
+import json
+import os
+
+import pytest
+
+from eeg_backup import TransferTelemetry
+
+
+def read_log(path):
+    with open(path, encoding="utf-8") as file:
+        return [json.loads(line) for line in file]
+
+
+@pytest.fixture
+def telemetry(tmp_path):
+    return TransferTelemetry(
+        {
+            "usb_input_dir": str(tmp_path / "usb"),
+            "mff_backup_dir": str(tmp_path / "backup"),
+            "mff_deid_dir": str(tmp_path / "backup" / "deid"),
+            "deid_log_filepath": "",
+        }
+    )
+
+
+def test_stages_are_recorded(tmp_path, telemetry):
+    with telemetry.stage("mff_files"):
+        telemetry.add_bytes(3 * 1024**2)
+        telemetry.record_io("read", str(tmp_path / "usb" / "rec.mff" / "signal1.bin"), 2 * 1024**2, 0.5)
+        telemetry.record_io("read", str(tmp_path / "usb" / "rec.mff" / "info.xml"), 1024**2, 0.5)
+        telemetry.record_io("write", str(tmp_path / "backup" / "rec.mff" / "signal1.bin"), 3 * 1024**2, 1.0)
+        # the longest configured folder wins, so the deid folder inside the backup folder gets its own label
+        telemetry.record_io("link", str(tmp_path / "backup" / "deid" / "rec.mff" / "signal1.bin"), 3 * 1024**2, 0)
+        telemetry.record_io("write", str(tmp_path / "elsewhere" / "notes.txt"), 10, 0.0)
+    with pytest.raises(OSError):
+        with telemetry.stage("photos"):
+            raise OSError("USB removed")
+    # outside a stage nothing is recorded
+    telemetry.add_bytes(100)
+    telemetry.record_io("read", str(tmp_path / "usb" / "photo.jpg"), 100, 1.0)
+    telemetry.resumed = True
+
+    record = json.loads(json.dumps(telemetry.get_record()))
+    assert record["status"] == "failed"
+    assert record["resumed"] is True
+    assert record["bytes"] == 3 * 1024**2
+    assert record["start"] == record["stages"][0]["start"]
+    assert record["end"] == record["stages"][1]["end"]
+    mff_stage, photo_stage = record["stages"]
+    assert mff_stage["stage"] == "mff_files" and mff_stage["error"] is None
+    assert mff_stage["files"] == 3
+    io = {(entry["operation"], entry["path"]): entry for entry in mff_stage["io"]}
+    assert set(io) == {
+        ("read", "usb_input_dir"),
+        ("write", "mff_backup_dir"),
+        ("link", "mff_deid_dir"),
+        ("write", "other"),
+    }
+    assert io["read", "usb_input_dir"]["files"] == 2
+    assert io["read", "usb_input_dir"]["mb_per_s"] == 3.0
+    assert io["link", "mff_deid_dir"]["mb_per_s"] is None
+    assert photo_stage["error"] == {"type": "OSError", "message": "USB removed"}
+    assert photo_stage["bytes"] == 0 and photo_stage["io"] == []
+    assert TransferTelemetry({}).get_record() == {
+        "start": None, "end": None, "resumed": False, "status": "done", "bytes": 0, "seconds": 0, "stages": [],
+    }
+
+
+def test_log_is_rotated(tmp_path):
+    log_path = str(tmp_path / "state" / "telemetry.jsonl")
+    records = [{"deid": deid, "padding": "x" * 80} for deid in range(10, 40)]
+    line_size = len(json.dumps(records[0])) + 1
+    # four records fit in each file
+    max_bytes = 4 * line_size + 3
+    for record in records:
+        TransferTelemetry.append_to_log(log_path, record, max_bytes, 2)
+
+    assert sorted(os.listdir(tmp_path / "state")) == ["telemetry.jsonl", "telemetry.jsonl.1", "telemetry.jsonl.2"]
+    for path in (log_path, log_path + ".1", log_path + ".2"):
+        assert os.path.getsize(path) <= max_bytes
+    # oldest file first, every file holds complete records and the newest ones are kept in order
+    kept = read_log(log_path + ".2") + read_log(log_path + ".1") + read_log(log_path)
+    assert kept == records[-len(kept):]
+    assert [len(read_log(path)) for path in (log_path + ".2", log_path + ".1")] == [4, 4]
+
+
+def test_log_without_backups_is_replaced(tmp_path):
+    log_path = str(tmp_path / "telemetry.jsonl")
+    for deid in range(3):
+        TransferTelemetry.append_to_log(log_path, {"deid": deid}, 20, 0)
+    assert os.listdir(tmp_path) == ["telemetry.jsonl"]
+    assert read_log(log_path) == [{"deid": 2}]
+
+
+def test_transfer_saves_telemetry(tmp_path, make_data_model):
+    data_model = make_data_model([[1], [2]], telemetry_max_bytes=1024**2, telemetry_backup_count=1)
+    data_model.session_info.update(study="BIO")
+    data_model.deid = 2
+    with data_model.telemetry.stage("deid_log"):
+        pass
+    data_model.save_telemetry()
+    (record,) = read_log(tmp_path / "state" / "telemetry.jsonl")
+    assert record["deid"] == 2 and record["study"] == "BIO"
+    assert [stage["stage"] for stage in record["stages"]] == ["deid_log"]
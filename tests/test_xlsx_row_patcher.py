@@ -0,0 +1,195 @@
+"""XlsxRowPatcher and saving sessions to the DeID log"""
+
+import io
+import os
+from zipfile import ZipFile
+
+import pytest
+from openpyxl import load_workbook
+
+from conftest import DEID_LOG_COLUMNS, write_deid_log
+from eeg_backup import XlsxPatchError, XlsxRowInUseError, XlsxRowPatcher
+
+VISIT_DATE = DEID_LOG_COLUMNS.index("Visit Date") + 1
+
+
+def used_row(deid):
+    return [deid, "BIO", 100 + deid, "v1", "01-01-2024", "AB", "T19", 4001, "", 1]
+
+
+@pytest.fixture
+def deid_log(tmp_path):
+    # rows 2-3 are in use and locked, rows 4-6 are free and unlocked
+    return write_deid_log(str(tmp_path / "deid_log.xlsx"), [used_row(1), used_row(2), [3], [4], [5]], protect_from=4)
+
+
+def load_patched(data):
+    return load_workbook(io.BytesIO(data))
+
+
+def test_patch_row_sets_values(deid_log):
+    row_values = {2: "BIO", 3: "A<&>\"102", 4: "v2", 6: " padded ", 8: 4002, 10: 2, 11: 1.5, 12: True}
+    wb = load_patched(XlsxRowPatcher.patch_row(deid_log, 4, row_values))
+    sheet = wb["DeID Log"]
+    assert [sheet.cell(4, col_idx).value for col_idx in row_values] == list(row_values.values())
+    assert sheet.cell(4, 1).value == 3
+    assert sheet.cell(4, 5).value is None
+
+
+def test_patch_row_keeps_other_rows_and_sheets(deid_log):
+    wb = load_patched(XlsxRowPatcher.patch_row(deid_log, 5, {2: "BIO", 3: 104}))
+    original = load_workbook(deid_log)
+    for sheet_row in (1, 2, 3, 4, 6):
+        assert [cell.value for cell in wb["DeID Log"][sheet_row]] == [
+            cell.value for cell in original["DeID Log"][sheet_row]
+        ]
+    assert [cell.value for cell in wb["Notes"][1]] == ["keep", "me"]
+
+
+def test_patch_row_keeps_protection(deid_log):
+    sheet = load_patched(XlsxRowPatcher.patch_row(deid_log, 4, {2: "BIO", 3: 103}))["DeID Log"]
+    assert sheet.protection.sheet
+    # the patched row stays editable, rows in use stay locked
+    assert not sheet.cell(4, 2).protection.locked
+    assert not sheet.cell(4, 3).protection.locked
+    assert sheet.cell(2, 2).protection.locked
+
+
+def test_patch_row_adds_number_format_once(deid_log):
+    data = XlsxRowPatcher.patch_row(deid_log, 4, {VISIT_DATE: 45000}, {VISIT_DATE: "MM/DD/YYYY"})
+    sheet = load_patched(data)["DeID Log"]
+    assert sheet.cell(4, VISIT_DATE).number_format == "MM/DD/YYYY"
+    assert not sheet.cell(4, VISIT_DATE).protection.locked
+    assert sheet.cell(5, VISIT_DATE).number_format == "General"
+
+    # the format and cell style added for the first row are reused for the next one
+    patched_path = deid_log + ".patched.xlsx"
+    with open(patched_path, "wb") as file:
+        file.write(data)
+    data = XlsxRowPatcher.patch_row(patched_path, 5, {VISIT_DATE: 45001}, {VISIT_DATE: "MM/DD/YYYY"})
+    with ZipFile(io.BytesIO(data)) as zin:
+        styles_xml = zin.read("xl/styles.xml").decode("utf-8")
+    assert styles_xml.count('formatCode="MM/DD/YYYY"') == 1
+    sheet = load_patched(data)["DeID Log"]
+    assert sheet.cell(4, VISIT_DATE).style_id == sheet.cell(5, VISIT_DATE).style_id
+
+
+def test_patch_row_uses_active_sheet(tmp_path):
+    path = write_deid_log(str(tmp_path / "deid_log.xlsx"), [[1], [2]])
+    wb = load_workbook(path)
+    wb.active = wb["Notes"]
+    wb.save(path)
+    wb = load_patched(XlsxRowPatcher.patch_row(path, 1, {3: "patched"}))
+    assert [cell.value for cell in wb["Notes"][1]] == ["keep", "me", "patched"]
+    assert wb["DeID Log"].cell(1, 2).value == "Study"
+
+
+def test_patch_row_refuses_filled_cells(deid_log):
+    with pytest.raises(XlsxRowInUseError, match="column B, C"):
+        XlsxRowPatcher.patch_row(deid_log, 3, {2: "BIO", 3: 103, 5: "10-17-2026"})
+    # cells that only have a style (unlocked) are empty
+    XlsxRowPatcher.patch_row(deid_log, 4, {2: "BIO"})
+
+
+def test_patch_missing_row_fails(deid_log):
+    with pytest.raises(XlsxPatchError):
+        XlsxRowPatcher.patch_row(deid_log, 50, {2: "BIO"})
+
+
+def fail_patch(*args, **kwargs):
+    raise XlsxPatchError("unexpected layout")
+
+
+def save_session(data_model, subject_id):
+    data_model.clear_session_data()
+    data_model.session_info.update(
+        study="BIO", visit_number="v2", subject_id=subject_id, subject_initials="CD", date="10-17-2026",
+        location="T19", net_serial_number="4002", cap_type="adult", other_notes="",
+    )
+    data_model.eeg_file_info = [
+        {"paradigm": "rest", "audio_source": "none", "mff_file": "/usb/BIO_v2_rest_1.mff"},
+        {"paradigm": "chirp", "audio_source": "none", "mff_file": "/usb/BIO_v2_chirp_1.mff"},
+        {"paradigm": "chirp", "audio_source": "none", "mff_file": "/usb/BIO_v2_chirp_2.mff"},
+    ]
+    data_model.save_session_to_deid_log()
+
+
+def check_saved_row(path, sheet_row, deid):
+    sheet = load_workbook(path)["DeID Log"]
+    row = {column: cell for column, cell in zip(DEID_LOG_COLUMNS, sheet[sheet_row])}
+    assert row["DeID"].value == deid
+    assert row["Subject ID"].value == "S-1"
+    assert row["Net Serial Number"].value == 4002
+    assert row["Resting"].value == 1
+    assert row["Chirp"].value == 2
+    assert row["original_file_names"].value == "BIO_v2_rest_1.mff;BIO_v2_chirp_1.mff;BIO_v2_chirp_2.mff"
+    assert row["Visit Date"].number_format == "MM/DD/YYYY"
+    assert not row["Study"].protection.locked
+    assert sheet.protection.sheet
+    assert load_workbook(path)["Notes"]["A1"].value == "keep"
+
+
+@pytest.mark.parametrize("patcher_fails", [False, True])
+def test_save_session_to_deid_log(make_data_model, monkeypatch, patcher_fails):
+    data_model = make_data_model([used_row(1), used_row(2), [3], [4]], protect_from=4)
+    if patcher_fails:
+        # unexpected package layout, the row is written with an openpyxl round trip instead
+        monkeypatch.setattr(XlsxRowPatcher, "get_active_sheet_part", staticmethod(fail_patch))
+
+    save_session(data_model, "S-1")
+    assert data_model.deid == 3
+    for path in (data_model.deid_log_filepath, data_model.filepath_dict["deid_log_local_backup_filepath"]):
+        check_saved_row(path, 4, 3)
+    assert not [name for name in os.listdir(os.path.dirname(data_model.deid_log_filepath)) if "tmp" in name]
+
+    # the next session gets the next row, also after reloading the log from the workbook
+    data_model.deid_log_mirror.mirror_path += ".removed"
+    data_model.load_deid_log(data_model.deid_log_filepath)
+    assert data_model.check_if_session_info_already_exists()
+    save_session(data_model, "S-1")
+    assert data_model.deid == 4
+    check_saved_row(data_model.deid_log_filepath, 5, 4)
+
+
+def fill_row_elsewhere(path, sheet_row, subject_id):
+    """Another workstation saves a session into a row of the workbook"""
+    wb = load_workbook(path)
+    for col_idx, value in enumerate(used_row(0)[1:], start=2):
+        wb["DeID Log"].cell(sheet_row, col_idx).value = value
+    wb["DeID Log"].cell(sheet_row, 3).value = subject_id
+    wb.save(path)
+
+
+@pytest.mark.parametrize("patcher_fails", [False, True])
+def test_reset_after_external_edit_allocates_fresh_row(make_data_model, monkeypatch, patcher_fails):
+    data_model = make_data_model([used_row(1), [2], [3], [4], [5]])
+    if patcher_fails:
+        monkeypatch.setattr(XlsxRowPatcher, "get_active_sheet_part", staticmethod(fail_patch))
+    fill_row_elsewhere(data_model.deid_log_filepath, 4, 555)
+
+    save_session(data_model, "S-1")
+    assert data_model.deid == 2
+
+    # reset for the next session like MainWindow.reset_app (the loader thread runs refresh_deid_log)
+    data_model.clear_session_data()
+    data_model.refresh_config()
+    data_model.refresh_deid_log()
+    assert ("BIO", "555", "v1") in data_model.session_index
+    save_session(data_model, "S-1")
+    assert data_model.deid == 4
+
+    sheet = load_workbook(data_model.deid_log_filepath)["DeID Log"]
+    assert [sheet.cell(sheet_row, 3).value for sheet_row in (3, 4, 5)] == ["S-1", 555, "S-1"]
+
+
+def test_stale_mirror_is_detected(make_data_model):
+    data_model = make_data_model([used_row(1), [2], [3]])
+    fill_row_elsewhere(data_model.deid_log_filepath, 3, 555)
+    # a mirror stamped with the changed workbook without its rows, as an older version could leave behind
+    data_model.deid_log_mirror.update_row(0, {"Study": "BIO"}, data_model.deid_log_filepath)
+    data_model.deid_log_stamp = None
+
+    save_session(data_model, "S-1")
+    assert data_model.deid == 3
+    sheet = load_workbook(data_model.deid_log_filepath)["DeID Log"]
+    assert [sheet.cell(sheet_row, 3).value for sheet_row in (3, 4)] == [555, "S-1"]